@@ -0,0 +1,152 @@
+"""Make a shifted function's calls for whole columns of arguments at once."""
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+from typing import TypeVar
+
+from .bulk import get_many
+from .bulk import set_many
+from .context import _handlers
+from .context import _null_stack
+from .failure import Failure
+from .typing import BulkCallHandler
+from .typing import CallKey
+
+V = TypeVar("V", bound=Callable[..., Any])
+
+Rows = List[Tuple[Tuple[Any, ...], Dict[str, Any]]]
+
+
+def vectorize(func: Callable[..., Any]) -> Callable[[V], V]:
+    """Register an implementation that makes many calls of a function at once.
+
+    The implementation takes the same arguments as the function, but each
+    one is a column of values, and returns a sequence of results.
+
+    Example:
+        >>> from snake.shifter import shift
+        >>> @shift
+        ... def f(a, b):
+        ...     return a + b
+        >>> @vectorize(f)
+        ... def f_many(a, b):
+        ...     return [x + y for x, y in zip(a, b)]
+        >>> f.batch([1, 2], [3, 4])
+        [4, 6]
+
+    Args:
+        func: the shifted function
+
+    Returns:
+        a decorator, that registers the implementation and returns it
+    """
+
+    def _register(impl: V) -> V:
+        func.__vectorized__ = impl  # type: ignore
+        return impl
+
+    return _register
+
+
+def _rows(
+    columns: Sequence[Sequence[Any]], kwcolumns: Dict[str, Sequence[Any]]
+) -> Rows:
+    """Split columns of arguments into the arguments of each call."""
+    lengths = {len(column) for column in (*columns, *kwcolumns.values())}
+    if len(lengths) != 1:
+        raise ValueError("batch needs columns of arguments of the same length")
+    (length,) = lengths
+
+    names = list(kwcolumns.keys())
+    kwargs = [dict(zip(names, values)) for values in zip(*kwcolumns.values())]
+    return list(
+        zip(zip(*columns) if columns else [()] * length, kwargs or [{}] * length)
+    )
+
+
+def _vectorized(
+    vectorized: Callable[..., Any], misses: Rows, names: Sequence[str]
+) -> List[Any]:
+    """Make the missing calls at once, from columns of their arguments."""
+    args = list(zip(*(args for args, _ in misses)))
+    kwargs = {name: [kwargs[name] for _, kwargs in misses] for name in names}
+    return list(vectorized(*args, **kwargs))
+
+
+def batch(func: Callable[..., Any], *columns: Any, **kwcolumns: Any) -> List[Any]:
+    """Make a call of a shifted function for each row of columns of arguments.
+
+    When the handler is a `BulkCallHandler`, such as a cache or a chain of
+    handlers, or a dict, all the keys are built and looked up at once,
+    and only the calls that are missing are made, by the vectorized
+    implementation if there is one. Otherwise each call is made through the
+    shifted function in turn, as checking a call may have side effects.
+
+    Example:
+        >>> from snake.shifter import shift
+        >>> @shift
+        ... def f(a, b=0):
+        ...     return a + b
+        >>> f.batch([1, 2, 3], b=[10, 20, 30])
+        [11, 22, 33]
+
+    Args:
+        func: the shifted function
+        columns: a sequence of values for each positional argument
+        kwcolumns: a sequence of values for each keyword argument
+
+    Returns:
+        the result of each call
+
+    Raises:
+        Exception: the first failure of a call, or of the vectorized call
+
+    # noqa: DAR401 error
+    # noqa: DAR402 Exception
+    """
+    rows = _rows(columns, kwcolumns)
+
+    vectorized = getattr(func, "__vectorized__", None)
+
+    stack = _handlers.get()
+    if stack is _null_stack:
+        if vectorized is not None:
+            return list(vectorized(*columns, **kwcolumns))
+        return [func(*args, **kwargs) for args, kwargs in rows]
+
+    handler = stack[0]
+    # checking a call in a dict has no side effects, so dicts are looked up
+    # by the bulk fallbacks, a key at a time
+    if not isinstance(handler, (dict, BulkCallHandler)):
+        return [func(*args, **kwargs) for args, kwargs in rows]
+
+    from_call = func.__key__.from_call  # type: ignore
+    keys: List[CallKey] = [from_call(*args, **kwargs) for args, kwargs in rows]
+    values = dict(get_many(handler, keys))
+
+    # the arguments of each missing call, once for each key
+    missing = {key: row for key, row in zip(keys, rows) if key not in values}
+    if missing and vectorized is not None:
+        computed = dict(
+            zip(
+                missing,
+                _vectorized(vectorized, list(missing.values()), list(kwcolumns)),
+            )
+        )
+        set_many(handler, computed)
+        values.update(computed)
+    else:
+        # the shifted function stores the results itself
+        for key, (args, kwargs) in missing.items():
+            values[key] = func(*args, **kwargs)
+
+    results = []
+    for key in keys:
+        value = values[key]
+        if type(value) is Failure:
+            raise value.error()
+        results.append(value)
+    return results
@@ -0,0 +1,76 @@
+"""Check, retrieve and store many calls at once, on any handler.
+
+Handlers that implement `BulkCallHandler` are used directly, so they can
+answer many calls in a single round trip. Otherwise the single call
+methods are used for each call in turn, which is only right for handlers
+such as a dict, where checking a call has no side effects.
+"""
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Mapping
+from typing import Set
+
+from .typing import CallHandler
+from .typing import CallKey
+
+
+def contains_many(handler: CallHandler, keys: Iterable[CallKey]) -> Set[CallKey]:
+    """Return the calls the handler has values for.
+
+    Example:
+        >>> contains_many({"a": 1}, ["a", "b"])
+        {'a'}
+
+    Args:
+        handler: the handler to check
+        keys: the calls to check for
+
+    Returns:
+        the calls with values
+    """
+    method = getattr(handler, "contains_many", None)
+    if method is not None:
+        return method(keys)  # type: ignore
+    return {key for key in keys if key in handler}
+
+
+def get_many(handler: CallHandler, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+    """Return the values the handler has for some calls.
+
+    Example:
+        >>> get_many({"a": 1}, ["a", "b"])
+        {'a': 1}
+
+    Args:
+        handler: the handler to retrieve from
+        keys: the calls to retrieve
+
+    Returns:
+        the values of the calls that have them
+    """
+    method = getattr(handler, "get_many", None)
+    if method is not None:
+        return method(keys)  # type: ignore
+    return {key: handler[key] for key in keys if key in handler}
+
+
+def set_many(handler: CallHandler, values: Mapping[CallKey, Any]) -> None:
+    """Store the values of many calls in the handler.
+
+    Example:
+        >>> handler = {}
+        >>> set_many(handler, {"a": 1})
+        >>> handler
+        {'a': 1}
+
+    Args:
+        handler: the handler to store in
+        values: the values to store, by call
+    """
+    method = getattr(handler, "set_many", None)
+    if method is not None:
+        method(values)
+        return
+    for key, value in values.items():
+        handler[key] = value
@@ -0,0 +1,222 @@
+"""Memoizing handlers with bounded size."""
+import sys
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Set
+
+from .failure import Failure
+from .typing import CallKey
+
+
+class CacheHandler:
+    """Memoize call results, evicting the least recently used entries.
+
+    The cache can be bounded by number of entries, by an estimate of the
+    size of the cached values in bytes, or both.
+
+    Example:
+        >>> cache = CacheHandler(max_entries=2)
+        >>> cache["a"] = 1
+        >>> cache["b"] = 2
+        >>> "a" in cache
+        True
+        >>> cache["c"] = 3
+        >>> "b" in cache
+        False
+        >>> cache.hits, cache.misses, cache.evictions
+        (1, 1, 1)
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    nbytes: int
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        cache_exceptions: bool = True,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: the maximum number of calls to hold results for
+            max_bytes: the maximum estimated size of the held results
+            sizeof: estimate the size of a single result in bytes
+            cache_exceptions: hold failed calls, rather than calling again
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.cache_exceptions = cache_exceptions
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+
+        self._values: "OrderedDict[CallKey, Any]" = OrderedDict()
+        self._sizes: Dict[CallKey, int] = dict()
+
+    def __len__(self) -> int:
+        """Return the number of cached results."""
+        return len(self._values)
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Check for a cached result, marking it as recently used."""
+        try:
+            self._values.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return a cached result."""
+        return self._values[key]
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Cache the result of a call, evicting others to make room."""
+        if type(value) is Failure and not self.cache_exceptions:
+            return
+
+        if key in self._values:
+            self._discard(key)
+
+        size = 0
+        if self.max_bytes is not None:
+            # the size of a failure is the size of the exception it stores
+            size = self.sizeof(value.exception if type(value) is Failure else value)
+            if size > self.max_bytes:
+                return
+            self._sizes[key] = size
+
+        self._evict(size)
+        self._insert(key, value)
+        self.nbytes += size
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Return the calls with cached results, marking them as used."""
+        return {key for key in keys if key in self}
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Return the cached results of the calls that have them."""
+        return {key: self._values[key] for key in keys if key in self}
+
+    def set_many(self, values: Mapping[CallKey, Any]) -> None:
+        """Cache the results of many calls."""
+        for key, value in values.items():
+            self[key] = value
+
+    def _insert(self, key: CallKey, value: Any) -> None:
+        """Add a new entry to the cache."""
+        self._values[key] = value
+
+    def _discard(self, key: CallKey) -> None:
+        """Remove an entry from the cache."""
+        del self._values[key]
+        self.nbytes -= self._sizes.pop(key, 0)
+
+    def _victim(self) -> CallKey:
+        """Choose the entry to evict next."""
+        return next(iter(self._values))
+
+    def _evict(self, size: int) -> None:
+        """Evict entries until there is room for one more of the given size."""
+        while self._values and (
+            (self.max_entries is not None and len(self._values) >= self.max_entries)
+            or (self.max_bytes is not None and self.nbytes + size > self.max_bytes)
+        ):
+            self._discard(self._victim())
+            self.evictions += 1
+
+
+class LFUCacheHandler(CacheHandler):
+    """Memoize call results, evicting the least frequently used entries.
+
+    Entries used equally often are evicted least recently used first.
+
+    Example:
+        >>> cache = LFUCacheHandler(max_entries=2)
+        >>> cache["a"] = 1
+        >>> cache["b"] = 2
+        >>> "a" in cache
+        True
+        >>> cache["c"] = 3
+        >>> "a" in cache, "b" in cache, "c" in cache
+        (True, False, True)
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+        cache_exceptions: bool = True,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries: the maximum number of calls to hold results for
+            max_bytes: the maximum estimated size of the held results
+            sizeof: estimate the size of a single result in bytes
+            cache_exceptions: hold failed calls, rather than calling again
+        """
+        super().__init__(max_entries, max_bytes, sizeof, cache_exceptions)
+
+        # use count of each entry, and the entries with each count in lru order
+        self._counts: Dict[CallKey, int] = dict()
+        self._buckets: Dict[int, "OrderedDict[CallKey, None]"] = dict()
+        self._min_count = 0
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Check for a cached result, counting the use."""
+        try:
+            count = self._counts[key]
+        except KeyError:
+            self.misses += 1
+            return False
+
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+
+        self._counts[key] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+
+        self.hits += 1
+        return True
+
+    def _insert(self, key: CallKey, value: Any) -> None:
+        """Add a new entry to the cache, with a single use."""
+        self._values[key] = value
+        self._counts[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_count = 1
+
+    def _discard(self, key: CallKey) -> None:
+        """Remove an entry from the cache."""
+        super()._discard(key)
+
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count and self._buckets:
+                self._min_count = min(self._buckets)
+
+    def _victim(self) -> CallKey:
+        """Choose the least recently used of the least used entries."""
+        return next(iter(self._buckets[self._min_count]))
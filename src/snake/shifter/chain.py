@@ -0,0 +1,278 @@
+"""Combine handlers into layers, each consulted in turn."""
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Set
+from typing import Tuple
+from typing import Type
+
+from .bulk import contains_many
+from .bulk import get_many
+from .bulk import set_many
+from .context import NullHandler
+from .typing import CallHandler
+from .typing import CallKey
+
+_MISSING = object()
+
+# chain classes with their methods generated, by the types of their layers
+_dispatch: Dict[Tuple[Type[Any], ...], Type["ChainHandler"]] = dict()
+
+
+def _flatten(handlers: Tuple[CallHandler, ...]) -> List[CallHandler]:
+    """List the layers of some handlers, expanding any chains among them."""
+    layers: List[CallHandler] = []
+    for handler in handlers:
+        if isinstance(handler, ChainHandler):
+            layers.extend(handler.layers)
+        else:
+            layers.append(handler)
+    return layers
+
+
+def _dispatch_source(finds: Tuple[int, ...], stores: Tuple[int, ...]) -> str:
+    """Write the methods of a chain, unrolling the loops over its layers."""
+    lines = ["def __contains__(self, key):"]
+    for index in finds:
+        lines.append(f"    if key in self._layer{index}:")
+        # calls found in the first layer are read from it without a record
+        if index != finds[0]:
+            lines.append("        self._found_key = key")
+            lines.append(f"        self._found_in = {index}")
+        lines.append("        return True")
+    lines.append("    return False")
+
+    lines.append("def __getitem__(self, key):")
+    lines.append("    if self._found_key is key:")
+    lines.append("        self._found_key = MISSING")
+    for index in finds[1:]:
+        indent = "        "
+        # the last layer is the only one left to have found the call
+        if index != finds[-1]:
+            lines.append(f"        if self._found_in == {index}:")
+            indent += "    "
+        lines.append(f"{indent}value = self._layer{index}[key]")
+        for store in stores:
+            if store < index:
+                lines.append(f"{indent}self._layer{store}[key] = value")
+        lines.append(f"{indent}return value")
+    for index in finds:
+        lines.append("    try:")
+        lines.append(f"        return self._layer{index}[key]")
+        lines.append("    except KeyError:")
+        lines.append("        pass")
+    lines.append("    raise KeyError(key)")
+
+    lines.append("def __setitem__(self, key, value):")
+    for index in stores:
+        lines.append(f"    self._layer{index}[key] = value")
+    lines.append("    pass")
+
+    lines.append("def _bind(self, layers):")
+    for index in sorted(set(finds + stores)):
+        lines.append(f"    self._layer{index} = layers[{index}]")
+    lines.append("    pass")
+    return "\n".join(lines) + "\n"
+
+
+def _reduce(self: "ChainHandler") -> Tuple[Any, ...]:
+    """Pickle a chain as the layers it combines."""
+    return ChainHandler, tuple(self.layers)
+
+
+def _dispatch_class(types: Tuple[Type[Any], ...]) -> Type["ChainHandler"]:
+    """Return the chain class with methods generated for layers of some types."""
+    cls = _dispatch.get(types)
+    if cls is not None:
+        return cls
+
+    finds = tuple(
+        index
+        for index, layer_type in enumerate(types)
+        if layer_type.__contains__ is not NullHandler.__contains__
+    )
+    stores = tuple(
+        index
+        for index, layer_type in reversed(list(enumerate(types)))
+        if layer_type.__setitem__ is not NullHandler.__setitem__
+    )
+
+    namespace: Dict[str, Any] = {"MISSING": _MISSING}
+    exec(_dispatch_source(finds, stores), namespace)  # noqa: S102
+    attributes: Dict[str, Any] = {
+        "_finds": finds,
+        "_stores": stores,
+        "_bind": namespace["_bind"],
+    }
+    for name in ("__contains__", "__getitem__", "__setitem__"):
+        method = attributes[name] = namespace[name]
+        method.__doc__ = getattr(ChainHandler, name).__doc__
+        method.__qualname__ = f"{ChainHandler.__qualname__}.{name}"
+    attributes["__reduce__"] = _reduce
+    attributes["__module__"] = ChainHandler.__module__
+
+    cls = type(ChainHandler.__name__, (ChainHandler,), attributes)
+    return _dispatch.setdefault(types, cls)
+
+
+class ChainHandler:
+    """Consult layers of handlers in turn, from the first to the last.
+
+    A call is looked for in each layer in turn. When a layer has it, the
+    layers before it that were asked for the call are given its value, so
+    a cache in front of a persistent handler fills up as values are read.
+    When no layer has it, every layer is given the value once it is made.
+
+    Layers that use the `NullHandler` methods are skipped entirely, for
+    looking up calls, storing values, or both. Chains within chains are
+    flattened into one. Many calls are looked up or stored at once in each
+    layer, by its bulk methods where it has them.
+
+    The methods of a chain are generated for the types of its layers, with
+    the loops over them unrolled, so a chain is as fast as a handler
+    written by hand to delegate to its layers.
+
+    Handlers that wrap another, such as profiling or single flight handlers,
+    see every call made through a chain when they wrap it, rather than being
+    one of its layers.
+
+    Example:
+        >>> front, back = dict(), dict()
+        >>> handler = ChainHandler(front, back)
+        >>> back["a"] = 1
+        >>> "a" in handler, handler["a"], front
+        (True, 1, {'a': 1})
+        >>> "b" in handler
+        False
+        >>> handler["b"] = 2
+        >>> front, back
+        ({'a': 1, 'b': 2}, {'a': 1, 'b': 2})
+    """
+
+    layers: List[CallHandler]
+    # the call found by __contains__, and the layer it was found in
+    _found_key: Any
+    _found_in: int
+    # the layers that can find calls, and those that store values, from the
+    # last layer to the first
+    _finds: Tuple[int, ...]
+    _stores: Tuple[int, ...]
+    # give the generated methods each layer as an attribute of its own
+    _bind: Callable[["ChainHandler", List[CallHandler]], None]
+
+    def __new__(cls, *handlers: CallHandler) -> "ChainHandler":
+        """Combine handlers, from the first to be consulted to the last.
+
+        Args:
+            handlers: the handlers, or chains of handlers, to combine
+
+        Returns:
+            a chain of the class generated for the types of its layers, or
+            of this class if it is a subclass
+        """
+        layers = _flatten(handlers)
+        dispatch = _dispatch_class(tuple(map(type, layers)))
+
+        self = object.__new__(dispatch if cls is ChainHandler else cls)
+        self.layers = layers
+        self._found_key = _MISSING
+        self._found_in = -1
+
+        if cls is ChainHandler:
+            dispatch._bind(self, layers)
+        else:
+            # subclasses may override the methods, so keep the loops
+            self._finds = dispatch._finds
+            self._stores = dispatch._stores
+        return self
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Look for the call in each layer in turn."""
+        for index in self._finds:
+            if key in self.layers[index]:
+                self._found_key = key
+                self._found_in = index
+                return True
+        return False
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return the value found, giving it to the layers before its layer."""
+        if self._found_key is key:
+            self._found_key = _MISSING
+            found_in = self._found_in
+            value = self.layers[found_in][key]
+            for index in self._stores:
+                if index < found_in:
+                    self.layers[index][key] = value
+            return value
+
+        for index in self._finds:
+            try:
+                return self.layers[index][key]
+            except KeyError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store the value in every layer."""
+        for index in self._stores:
+            self.layers[index][key] = value
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Look for many calls in each layer in turn."""
+        missing = list(keys)
+        found: Set[CallKey] = set()
+        for index in self._finds:
+            if not missing:
+                break
+            found |= contains_many(self.layers[index], missing)
+            missing = [key for key in missing if key not in found]
+        return found
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Return the values found, giving them to the layers before theirs."""
+        missing = list(keys)
+        values: Dict[CallKey, Any] = dict()
+        for found_in in self._finds:
+            if not missing:
+                break
+            found = get_many(self.layers[found_in], missing)
+            if found:
+                for index in self._stores:
+                    if index < found_in:
+                        set_many(self.layers[index], found)
+                values.update(found)
+                missing = [key for key in missing if key not in found]
+        return values
+
+    def set_many(self, values: Mapping[CallKey, Any]) -> None:
+        """Store the values in every layer."""
+        for index in self._stores:
+            set_many(self.layers[index], values)
+
+
+def chain(*handlers: CallHandler) -> CallHandler:
+    """Combine handlers into one, avoiding a chain where it isn't needed.
+
+    Example:
+        >>> handler = dict()
+        >>> chain(NullHandler(), handler) is handler
+        True
+
+    Args:
+        handlers: the handlers, or chains of handlers, to combine
+
+    Returns:
+        the only handler that does anything, or a chain of them
+    """
+    layers = [
+        layer for layer in _flatten(handlers) if not isinstance(layer, NullHandler)
+    ]
+    if not layers:
+        return NullHandler()
+    if len(layers) == 1:
+        return layers[0]
+    return ChainHandler(*layers)
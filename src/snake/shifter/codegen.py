@@ -0,0 +1,111 @@
+"""Implementation of call tracker using a wrapper generated for each signature.
+
+The wrapper has the same parameters as the function it wraps, so the key
+is built directly from its locals, and the function is called with the
+arguments laid out as they were received, without packing them into a
+tuple and dict on the way in and unpacking them on the way out.
+"""
+import functools
+import inspect
+from typing import cast
+
+from .batch import batch
+from .context import _handlers
+from .context import _null_stack
+from .failure import Failure
+from .key_type import _PREFIX
+from .key_type import make_key_type
+from .key_type import signature_source
+from .typing import F
+
+_TEMPLATE = """\
+def {p}wrapper({params}):
+    {p}stack = {p}get_stack()
+
+    # with no context entered the null handler would ignore the call,
+    # so skip building a key and call straight through.
+    if {p}stack is {p}null_stack:
+        return {p}func({call})
+
+    {p}handler = {p}stack[0]
+    {p}key = {p}new({p}key_type, ({values}{p}func,))
+
+    if {p}key in {p}handler:
+        {p}value = {p}handler[{p}key]
+        if {p}type({p}value) is {p}Failure:
+            raise {p}value.error()
+
+        return {p}value
+    try:
+        {p}retval = {p}func({call})
+        {p}handler[{p}key] = {p}retval
+        return {p}retval
+    except {p}Exception as {p}exc:
+        {p}handler[{p}key] = {p}failed({p}exc)
+        raise
+"""
+
+
+def shift(func: F) -> F:
+    """Wrap a function with calls to a handler, generating the wrapper.
+
+    Coroutine functions, and signatures that can't be written in this
+    version of python, are wrapped by `snake.shifter.wrapper.shift`.
+
+    Example:
+        >>> from snake.shifter import Context, key
+        >>> from snake.shifter.codegen import shift
+        >>> @shift
+        ... def f(a, b=2, *args, c=3):
+        ...     return a + b + sum(args) + c
+        >>> with Context(dict()) as d:
+        ...     f(1, c=4)
+        7
+        >>> d[key(f, 1, c=4)]
+        7
+
+    Args:
+        func: the function to modify
+
+    Returns:
+        the modified function
+    """
+    from .wrapper import shift as shift_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        return shift_wrapper(func)
+
+    key_type = make_key_type(func)
+    source = signature_source(inspect.signature(func))
+
+    # everything the wrapper refers to is prefixed, so can't clash with the
+    # names of its parameters
+    namespace = dict(source.namespace)
+    namespace.update(
+        {
+            _PREFIX + "get_stack": _handlers.get,
+            _PREFIX + "null_stack": _null_stack,
+            _PREFIX + "new": tuple.__new__,
+            _PREFIX + "key_type": key_type,
+            _PREFIX + "func": func,
+            _PREFIX + "type": type,
+            _PREFIX + "Exception": Exception,
+            _PREFIX + "Failure": Failure,
+            _PREFIX + "failed": Failure.of,
+        }
+    )
+
+    code = _TEMPLATE.format(
+        p=_PREFIX, params=source.params, call=source.call, values=source.values
+    )
+    try:
+        exec(code, namespace)  # noqa: S102
+    except SyntaxError:  # pragma: no cover
+        # positional only parameters can't be expressed before python 3.8
+        return shift_wrapper(func)
+
+    _func = functools.wraps(func)(namespace[_PREFIX + "wrapper"])
+    _func.__key__ = key_type  # type: ignore
+    _func.batch = functools.partial(batch, _func)  # type: ignore
+
+    return cast(F, _func)
@@ -1,8 +1,9 @@
 """Context manager and empty handler."""
+from contextvars import ContextVar
 from types import TracebackType
 from typing import Any
-from typing import List
 from typing import Optional
+from typing import Tuple
 from typing import Type
 
 from .typing import CallHandler
@@ -31,22 +32,33 @@ class NullHandler:
         pass
 
 
+# the stack of handlers is a linked list of (handler, parent) pairs, so the
+# active handler is always the head, and exiting restores the exact parent.
+HandlerStack = Tuple[CallHandler, Any]
+
+# the default stack, active in any thread or task that hasn't entered a context
+_null_stack: HandlerStack = (NullHandler(), None)
+
+# each thread, and each asyncio task, sees its own copy of the stack
+_handlers: ContextVar[HandlerStack] = ContextVar("handlers", default=_null_stack)
+
+
 class Context(object):
-    """Context handler that maintains a stack of handlers."""
+    """Context handler that maintains a stack of handlers.
 
-    # global stack of handlers, tail element is used for t
-    # the active handler.
-    # TODO make this thread/coroutine safe
-    _handlers: List[CallHandler] = [NullHandler()]
+    The stack is held in a context variable, so handlers pushed in one thread
+    or asyncio task are not seen by any other. New threads start with an
+    empty stack, use `contextvars.copy_context().run` to evaluate in a worker
+    with the handlers of the submitting thread.
+    """
 
     def __init__(self, handler: CallHandler):
         """Initialize context with a handler instance."""
         self.handler = handler
 
     def __enter__(self) -> CallHandler:
-        """Push the handler onto the global stack."""
-        global _handlers
-        Context._handlers.append(self.handler)
+        """Push the handler onto the stack for the current context."""
+        _handlers.set((self.handler, _handlers.get()))
         return self.handler
 
     def __exit__(  # type: ignore
@@ -55,11 +67,11 @@ class Context(object):
         exc_value: Optional[BaseException],
         traceback: Optional[TracebackType],
     ) -> Optional[bool]:
-        """Remove handler from the global stack."""
-        Context._handlers.pop(-1)
+        """Remove handler from the stack for the current context."""
+        _handlers.set(_handlers.get()[1])
         return False
 
 
 def get_handler() -> CallHandler:
     """Return the active handler at the top of the stack."""
-    return Context._handlers[-1]
+    return _handlers.get()[0]
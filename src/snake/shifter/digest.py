@@ -0,0 +1,135 @@
+"""Stable digests of call keys, that are the same in every process."""
+import hashlib
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+
+from .typing import CallKey
+
+
+def _sized(tag: bytes, data: bytes) -> bytes:
+    """Encode data with its length, so adjacent values can't run together."""
+    return tag + str(len(data)).encode() + b":" + data
+
+
+def _sequence(tag: bytes, items: List[bytes]) -> bytes:
+    """Encode a sequence of already encoded items."""
+    return tag + str(len(items)).encode() + b":" + b"".join(items)
+
+
+def _number(value: Any) -> bytes:
+    """Encode a number, with equal ints, bools and floats encoded alike."""
+    if type(value) is float and not value.is_integer():
+        return _sized(b"f", value.hex().encode())
+    return _sized(b"i", str(int(value)).encode())
+
+
+def _key(key: Any) -> bytes:
+    """Encode a call key, by the function it calls and its arguments."""
+    func = key.__func__
+    name = func.__module__ + "." + func.__qualname__
+    return _sequence(b"k" + _sized(b"", name.encode()), [_encode(v) for v in key[:-1]])
+
+
+_ENCODERS: Dict[type, Callable[[Any], bytes]] = {
+    type(None): lambda value: b"N",
+    bool: _number,
+    int: _number,
+    float: _number,
+    str: lambda value: _sized(b"s", value.encode("utf-8", "surrogatepass")),
+    bytes: lambda value: _sized(b"b", value),
+    tuple: lambda value: _sequence(b"t", [_encode(v) for v in value]),
+    list: lambda value: _sequence(b"l", [_encode(v) for v in value]),
+    dict: lambda value: _sequence(
+        b"d", sorted(_encode(k) + _encode(v) for k, v in value.items())
+    ),
+    set: lambda value: _sequence(b"S", sorted(_encode(v) for v in value)),
+    frozenset: lambda value: _sequence(b"S", sorted(_encode(v) for v in value)),
+}
+
+
+def _encode(value: Any) -> bytes:
+    """Encode a value canonically, so equal values give equal bytes."""
+    encoder = _ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+
+    if hasattr(value, "func__"):
+        return _sized(b"k", digest(value).encode())
+
+    method = getattr(type(value), "__digest__", None)
+    if method is not None:
+        name = type(value).__module__ + "." + type(value).__qualname__
+        return _sized(b"o", name.encode()) + _encode(method(value))
+
+    raise TypeError(f"can't digest {type(value).__qualname__} {value!r}")
+
+
+def digest(key: CallKey) -> str:
+    """Return a digest of a call key that is the same in every process.
+
+    Unlike `hash`, the digest doesn't depend on the identity of the function
+    or on string hash randomisation, so can be used to find calls across
+    processes and machines. Arguments may be None, bool, int, float, str,
+    bytes, tuples, lists, dicts and sets of these, other keys, or objects
+    with a `__digest__` method that returns one of these. Keys that are
+    equal have equal digests, so numbers that are equal, such as `1`, `1.0`
+    and `True`, are digested alike.
+
+    Example:
+        >>> from snake.shifter import key, shift
+        >>> @shift
+        ... def f(a, b):
+        ...     return a + b
+        >>> digest(key(f, 1, 2)) == digest(key(f, 1, b=2))
+        True
+        >>> digest(key(f, 1, 2)) == digest(key(f, 2, 1))
+        False
+
+    Args:
+        key: the key to digest
+
+    Returns:
+        a hex digest of the function's name and the call's arguments
+
+    Raises:
+        TypeError: if an argument can't be digested
+    """
+    # memoized in the key's __dict__, or the slot of a compact key
+    try:
+        return key.digest__  # type: ignore
+    except AttributeError:
+        pass
+
+    try:
+        data = _key(key)
+    except TypeError as exc:
+        raise TypeError(f"can't digest {key!r}: {exc}") from None
+
+    result = hashlib.blake2b(data, digest_size=16).hexdigest()
+    key.digest__ = result  # type: ignore
+    return result
+
+
+def shard(key: CallKey, n: int) -> int:
+    """Choose one of n shards for a key, the same choice in every process.
+
+    Example:
+        >>> from snake.shifter import key, shift
+        >>> @shift
+        ... def f(a):
+        ...     return a
+        >>> shard(key(f, 1), 4) == shard(key(f, 1), 4)
+        True
+        >>> 0 <= shard(key(f, 1), 4) < 4
+        True
+
+    Args:
+        key: the key to place
+        n: the number of shards
+
+    Returns:
+        the index of the shard
+    """
+    return int(digest(key), 16) % n
@@ -0,0 +1,159 @@
+"""Failed calls, as stored by handlers in place of the values returned."""
+import copy
+import traceback
+from typing import Any
+from typing import Optional
+from typing import Tuple
+
+# what a failure holds on to of the traceback of the exception it stores
+KEEP = "keep"
+CLEAR = "clear"
+SUMMARY = "summary"
+
+_POLICIES = (KEEP, CLEAR, SUMMARY)
+
+_policy = KEEP
+
+# the name of the failure an exception was stored as, set on the exception
+_ATTR = "failure__"
+
+
+class StoredTraceback(Exception):
+    """The traceback of a failed call, summarised when it was stored."""
+
+
+class Failure:
+    """A failed call, stored by a handler in place of the value it returns.
+
+    Shifted functions check for a stored failure with `type(value) is
+    Failure`, and raise its `error()`. A failure is made once, when the
+    exception is first raised, and the calls that the exception propagates
+    through store the same failure.
+
+    Under the `keep` policy the exception itself is stored, and raised again
+    each time, with its traceback and the frames it refers to. Its traceback
+    is reset to the one it had when stored before each raise, so it doesn't
+    grow with the frames of every call that raises it again. Under `clear`
+    only a copy of the exception without a traceback is stored, and under
+    `summary` the copy is raised from a `StoredTraceback`, of the traceback
+    as text. Each raise is then of a new copy, so the traceback it gathers
+    is released once it is handled. Exceptions that can't be copied are kept.
+
+    Example:
+        >>> failure = Failure.of(ValueError(1))
+        >>> type(failure) is Failure, failure
+        (True, Failure(ValueError(1)))
+        >>> Failure.of(failure.error()) is failure
+        True
+    """
+
+    __slots__ = ("exception", "summary", "_copied", "_traceback")
+
+    def __init__(
+        self,
+        exception: BaseException,
+        summary: Optional[str] = None,
+        copied: bool = False,
+    ) -> None:
+        """Store an exception, or a copy of one without its traceback.
+
+        Args:
+            exception: the exception raised by the call
+            summary: the traceback of the exception, as text
+            copied: the exception is a copy to raise copies of
+        """
+        self.exception = exception
+        self.summary = summary
+        self._copied = copied
+        self._traceback = exception.__traceback__
+
+    @classmethod
+    def of(cls, exception: BaseException) -> "Failure":
+        """Return the failure an exception was stored as, or make one.
+
+        Args:
+            exception: the exception raised by a call
+
+        Returns:
+            the failure, made under the current traceback policy
+        """
+        failure = getattr(exception, _ATTR, None)
+        if type(failure) is cls:
+            return failure
+
+        failure = cls(exception)
+        if _policy != KEEP:
+            try:
+                copied = copy.copy(exception)
+            except Exception:  # noqa: S110
+                # keep exceptions whose arguments don't rebuild them
+                pass
+            else:
+                copied.__traceback__ = None
+                failure = cls(copied, _summarise(exception), copied=True)
+
+        setattr(exception, _ATTR, failure)
+        return failure
+
+    def error(self) -> BaseException:
+        """Return the exception to raise for the failed call.
+
+        Returns:
+            the stored exception, or a new copy of it
+        """
+        if not self._copied:
+            return self.exception.with_traceback(self._traceback)
+
+        exception = copy.copy(self.exception)
+        setattr(exception, _ATTR, self)
+        if self.summary is not None:
+            exception.__cause__ = StoredTraceback(self.summary)
+        return exception
+
+    def __repr__(self) -> str:
+        """Show the stored exception."""
+        return f"{type(self).__name__}({self.exception!r})"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """Pickle the exception, which loses its traceback."""
+        return type(self), (self.exception, self.summary, True)
+
+
+def _summarise(exception: BaseException) -> Optional[str]:
+    """Format the traceback of an exception, under the summary policy."""
+    if _policy != SUMMARY:
+        return None
+    return "".join(
+        traceback.TracebackException.from_exception(exception).format()
+    ).rstrip()
+
+
+def set_traceback_policy(policy: str) -> str:
+    """Choose what failures made from now on hold of their tracebacks.
+
+    Example:
+        >>> previous = set_traceback_policy(CLEAR)
+        >>> try:
+        ...     raise ValueError(1)
+        ... except ValueError as exc:
+        ...     failure = Failure.of(exc)
+        >>> failure.exception.__traceback__ is None
+        True
+        >>> set_traceback_policy(previous)
+        'clear'
+
+    Args:
+        policy: one of `KEEP`, `CLEAR` or `SUMMARY`
+
+    Returns:
+        the policy in use before
+
+    Raises:
+        ValueError: if the policy isn't one of these
+    """
+    global _policy
+
+    if policy not in _POLICIES:
+        raise ValueError(f"traceback policy must be one of {_POLICIES}")
+    previous, _policy = _policy, policy
+    return previous
@@ -0,0 +1,468 @@
+"""Record the dependency graph between calls, and bump values through it."""
+import itertools
+from typing import AbstractSet
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+from .interning import KeyTable
+from .typing import CallKey
+from .wrapper import call
+
+# no entry in a layer, so look through to its base
+_ABSENT = object()
+
+# the entry was removed in a layer, masking any value in its base
+_MISSING = object()
+
+_NO_EDGES: AbstractSet[int] = frozenset()
+_NO_CALLS: Sequence[int] = ()
+
+# when values change and are checked, in order across all handlers
+_revisions = itertools.count(1)
+
+# the revision of calls whose stale values can't be kept
+_UNCHECKED = -1
+
+
+def equal(a: Any, b: Any) -> bool:
+    """Compare two values, elementwise if they are arrays.
+
+    Values of different types are never equal. Arrays compare equal when
+    they have the same shape and all of their elements are equal, and
+    tuples, lists and dicts when their items are equal in the same way, so
+    they can hold arrays.
+
+    Example:
+        >>> equal(1, 1), equal(1, 1.0), equal([1], [2]), equal((1, [2]), (1, [2]))
+        (True, False, False, True)
+
+    Args:
+        a: a value
+        b: the value to compare it with
+
+    Returns:
+        whether the values are the same
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+
+    # compare the items of containers, which may be arrays, one by one
+    if type(a) is tuple or type(a) is list:
+        return len(a) == len(b) and all(equal(x, y) for x, y in zip(a, b))
+    if type(a) is dict:
+        return a.keys() == b.keys() and all(equal(a[k], b[k]) for k in a)
+
+    # arrays such as numpy's compare to an array of elementwise results, and
+    # may refuse to compare arrays of different shapes
+    if getattr(a, "shape", None) != getattr(b, "shape", None):
+        return False
+    result = a == b
+    if type(result) is bool:
+        return result
+    return bool(result.all())
+
+
+class GraphHandler:
+    """Record the calls each call makes, so dependents can be invalidated.
+
+    Each distinct call is numbered by a `KeyTable` as it is first seen, and
+    values and edges are held against those numbers. Bumping a value forks
+    the handler, the fork holds only the values and edges it changes, and
+    reads through to the handler it was forked from for everything else. So
+    forks are cheap, but a handler should not be modified once forked.
+
+    With an `equal` function the handler cuts off recalculation early.
+    Invalidated calls keep the values they had, and when one is called
+    again, the calls it made last time are brought up to date first, in
+    the order they were first made. If none of their values has changed
+    by `equal` since the call's value was worked out, that value is kept,
+    rather than calling the function again.
+
+    Not safe to share between threads.
+
+    Example:
+        >>> from snake.shifter import Context, key, shift
+        >>> @shift
+        ... def f(x):
+        ...     return x
+        >>> @shift
+        ... def g(x, y):
+        ...     return f(x) + f(y)
+        >>> with Context(GraphHandler()) as graph:
+        ...     g(1, 2)
+        3
+        >>> with Context(graph.bump({key(f, 1): 10})):
+        ...     g(1, 2)
+        12
+    """
+
+    def __init__(
+        self,
+        base: Optional["GraphHandler"] = None,
+        equal: Optional[Callable[[Any, Any], bool]] = None,
+    ):
+        """Create an empty handler, or fork an existing one.
+
+        Args:
+            base: the handler to read through to for unchanged values
+            equal: compare values to cut off recalculation, unless forking
+        """
+        self._base = base
+        self._equal: Optional[Callable[[Any, Any], bool]] = (
+            equal if base is None else base._equal
+        )
+
+        # number the calls, shared between the base and all its forks
+        self._table: KeyTable = KeyTable() if base is None else base._table
+
+        self._values: Dict[int, Any] = dict()
+        self._children: Dict[int, AbstractSet[int]] = dict()
+        self._parents: Dict[int, AbstractSet[int]] = dict()
+        self._stack: List[int] = []
+
+        # the children of each call again, in the order it first made them
+        self._calls: Dict[int, Sequence[int]] = dict()
+
+        # invalidated calls awaiting a new value, with the children they had
+        # in the order they were made
+        self._dirty: Dict[int, Sequence[int]] = (
+            dict() if base is None else dict(base._dirty)
+        )
+
+        # with an equal function, the values invalidated calls had, and
+        # when the value of each call last changed and was last worked out
+        self._stale: Dict[int, Any] = dict() if base is None else dict(base._stale)
+        self._changed: Dict[int, int] = dict()
+        self._checked: Dict[int, int] = dict()
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Register call with the parent, push onto stack if not cached."""
+        node = self._table[key]
+
+        if self._stack:
+            self._link(self._stack[-1], node)
+
+        if self._value(node) is not _MISSING:
+            return True
+        if node in self._stale and self._verify(node):
+            return True
+
+        self._stack.append(node)
+        return False
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return value from the cache."""
+        node = self._table.get(key)
+        value = _MISSING if node is None else self._value(node)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store the value, and pop the call from the stack."""
+        try:
+            node = self._table[key]
+            self._values[node] = value
+            self._dirty.pop(node, None)
+            if self._equal is not None:
+                self._compare(node, value)
+        finally:
+            self._stack.pop()
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Return the calls that have values, without recording any calls."""
+        found = set()
+        for key in keys:
+            node = self._table.get(key)
+            if node is not None and self._value(node) is not _MISSING:
+                found.add(key)
+        return found
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Return values of the calls that have them, as children of the top."""
+        parent = self._stack[-1] if self._stack else None
+        values = dict()
+        for key in keys:
+            node = self._table[key]
+            value = self._value(node)
+            if value is not _MISSING:
+                if parent is not None:
+                    self._link(parent, node)
+                values[key] = value
+        return values
+
+    def set_many(self, values: Mapping[CallKey, Any]) -> None:
+        """Store values of calls made together, as children of the top."""
+        parent = self._stack[-1] if self._stack else None
+        for key, value in values.items():
+            node = self._table[key]
+            if parent is not None:
+                self._link(parent, node)
+            self._store(node, value)
+
+    def fork(self) -> "GraphHandler":
+        """Create a handler that reads through to this one."""
+        return type(self)(self)
+
+    def bump(self, changes: Mapping[CallKey, Any]) -> "GraphHandler":
+        """Fork a handler with some return values overridden.
+
+        Args:
+            changes: the values to override, by call
+
+        Returns:
+            the forked handler, with the dependents of the changes invalidated
+        """
+        handler = self.fork()
+        handler.invalidate(changes.keys())
+        for key, value in changes.items():
+            handler._store(handler._table[key], value)
+        return handler
+
+    def bump_many(
+        self, changes: Sequence[Mapping[CallKey, Any]]
+    ) -> Iterator["GraphHandler"]:
+        """Fork a handler for each of many sets of overridden values.
+
+        The calls depending on any of the changes are found once, for all
+        the forks, and each fork then invalidates only the calls depending
+        on its own changes. The forks share the values of the calls that
+        none of their changes affect, and are made as they are iterated
+        over, so each can be dropped once it has been used.
+
+        Example:
+            >>> from snake.shifter import Context, key, shift
+            >>> @shift
+            ... def f(x):
+            ...     return x
+            >>> @shift
+            ... def g(x, y):
+            ...     return f(x) + f(y)
+            >>> with Context(GraphHandler()) as graph:
+            ...     g(1, 2)
+            3
+            >>> up, down = graph.bump_many([{key(f, 1): 2}, {key(f, 2): 1}])
+            >>> with Context(up):
+            ...     g(1, 2)
+            4
+            >>> with Context(down):
+            ...     g(1, 2)
+            2
+
+        Args:
+            changes: the values to override in each fork, by call
+
+        Yields:
+            the forked handlers, in the order of the changes
+        """
+        # the callers of every changed call, up to the top of the graph
+        nodes = [self._table[key] for change in changes for key in change]
+        parents: Dict[int, AbstractSet[int]] = {}
+        for node in nodes:
+            if node not in parents:
+                parents[node] = self._edges("_parents", node)
+                nodes.extend(parents[node])
+
+        for change in changes:
+            handler = self.fork()
+            nodes = [self._table[key] for key in change]
+            dirty = set(nodes)
+            for node in nodes:
+                for parent in parents[node]:
+                    if parent not in dirty:
+                        dirty.add(parent)
+                        nodes.append(parent)
+            handler._invalidate(dirty)
+
+            for key, value in change.items():
+                handler._store(handler._table[key], value)
+            yield handler
+
+    def invalidate(self, keys: Iterable[CallKey]) -> None:
+        """Remove values for some calls, and all the calls that depend on them.
+
+        Args:
+            keys: the calls to remove
+        """
+        nodes = [self._table[key] for key in keys if key in self._table]
+        roots = list(nodes)
+        dirty = set(nodes)
+        for node in nodes:
+            for parent in self._edges("_parents", node):
+                if parent not in dirty:
+                    dirty.add(parent)
+                    nodes.append(parent)
+        self._invalidate(dirty)
+
+        # calls invalidated themselves are called again, whatever they call
+        if self._equal is not None:
+            for node in roots:
+                self._checked[node] = _UNCHECKED
+
+    def _invalidate(self, dirty: AbstractSet[int]) -> None:
+        """Remove values for calls, given all the calls that depend on them."""
+        # dirty calls will record their children again when they are called
+        for node in dirty:
+            for child in self._edges("_children", node):
+                if child not in dirty:
+                    self._writable("_parents", child).discard(node)
+            self._dirty.setdefault(node, self._ordered(node))
+
+            if self._equal is not None:
+                value = self._value(node)
+                if value is not _MISSING:
+                    self._stale[node] = value
+
+            if self._base is None:
+                self._values.pop(node, None)
+                self._children.pop(node, None)
+                self._parents.pop(node, None)
+                self._calls.pop(node, None)
+            else:
+                self._values[node] = _MISSING
+                self._children[node] = _NO_EDGES
+                self._parents[node] = _NO_EDGES
+                self._calls[node] = _NO_CALLS
+
+    def parents(self, key: CallKey) -> Set[CallKey]:
+        """Return the calls that have called the given call."""
+        nodes = self._edges("_parents", self._table[key])
+        return {self._table.key(node) for node in nodes}
+
+    def children(self, key: CallKey) -> Set[CallKey]:
+        """Return the calls that the given call has made."""
+        nodes = self._edges("_children", self._table[key])
+        return {self._table.key(node) for node in nodes}
+
+    def dirty(self) -> Set[CallKey]:
+        """Return the invalidated calls that have not been called again."""
+        return {self._table.key(node) for node in self._dirty}
+
+    def items(self) -> Iterator[Tuple[CallKey, Any]]:
+        """Iterate over the calls with values, and their values."""
+        for key, node in self._table.items():
+            value = self._value(node)
+            if value is not _MISSING:
+                yield key, value
+
+    def _store(self, node: int, value: Any) -> None:
+        """Store the value of a call, outside of the call stack."""
+        self._values[node] = value
+        self._dirty.pop(node, None)
+        if self._equal is not None:
+            self._compare(node, value)
+
+    def _compare(self, node: int, value: Any) -> None:
+        """Record whether a new value of a call changed from its stale value."""
+        revision = next(_revisions)
+        stale = self._stale.pop(node, _MISSING)
+        try:
+            changed = stale is _MISSING or not self._equal(stale, value)  # type: ignore
+        except Exception:
+            # values that can't be compared are taken to have changed
+            changed = True
+        if changed:
+            self._changed[node] = revision
+        self._checked[node] = revision
+
+    def _verify(self, node: int) -> bool:
+        """Keep the stale value of a call, if none of its children changed.
+
+        Args:
+            node: an invalidated call with the value it had
+
+        Returns:
+            whether the stale value is up to date again
+        """
+        checked = self._stamp("_checked", node)
+        if checked == _UNCHECKED:
+            return False
+
+        # make the calls, as children of this call, until one has changed
+        self._stack.append(node)
+        try:
+            for child in self._dirty[node]:
+                try:
+                    call(self._table.key(child))
+                except Exception:  # noqa: S110
+                    # the failure is stored as the value of the child
+                    pass
+                if self._stamp("_changed", child) > checked:
+                    return False
+        finally:
+            self._stack.pop()
+
+        self._values[node] = self._stale.pop(node)
+        self._dirty.pop(node)
+        self._checked[node] = next(_revisions)
+        return True
+
+    def _value(self, node: int) -> Any:
+        """Look up the value of a call through the layers of forks."""
+        layer: Optional[GraphHandler] = self
+        while layer is not None:
+            value = layer._values.get(node, _ABSENT)
+            if value is not _ABSENT:
+                return value
+            layer = layer._base
+        return _MISSING
+
+    def _stamp(self, name: str, node: int) -> int:
+        """Look up a revision of a call through the layers of forks."""
+        layer: Optional[GraphHandler] = self
+        while layer is not None:
+            revision = getattr(layer, name).get(node)
+            if revision is not None:
+                return revision  # type: ignore
+            layer = layer._base
+        return 0
+
+    def _edges(self, name: str, node: int) -> AbstractSet[int]:
+        """Look up the edges of a call through the layers of forks."""
+        layer: Optional[GraphHandler] = self
+        while layer is not None:
+            edges = getattr(layer, name).get(node)
+            if edges is not None:
+                return edges  # type: ignore
+            layer = layer._base
+        return _NO_EDGES
+
+    def _ordered(self, node: int) -> Sequence[int]:
+        """Look up the children of a call in order through the layers of forks."""
+        layer: Optional[GraphHandler] = self
+        while layer is not None:
+            calls = layer._calls.get(node)
+            if calls is not None:
+                return calls
+            layer = layer._base
+        return _NO_CALLS
+
+    def _writable(self, name: str, node: int) -> Set[int]:
+        """Return edges of a call held by this layer, copying them if needed."""
+        edges = getattr(self, name).get(node)
+        if type(edges) is not set:
+            edges = getattr(self, name)[node] = set(self._edges(name, node))
+        return edges  # type: ignore
+
+    def _link(self, parent: int, child: int) -> None:
+        """Record that a call was made by another."""
+        if child in self._edges("_children", parent):
+            return
+        self._writable("_children", parent).add(child)
+        self._writable("_parents", child).add(parent)
+
+        calls = self._calls.get(parent)
+        if type(calls) is not list:
+            calls = self._calls[parent] = list(self._ordered(parent))
+        calls.append(child)
@@ -0,0 +1,185 @@
+"""Shift the functions of whole modules as they are imported.
+
+With the default `shift`, the key type of each function is only built when
+the function is first called, or its key type first used, so importing a
+large module doesn't pay for inspecting the signature of every function.
+"""
+import inspect
+import sys
+from importlib.abc import Loader
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any
+from typing import Iterable
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .typing import Decorator
+from .wrapper import shift
+
+
+def _shiftable(func: Any) -> bool:
+    """Check a function can be shifted, without inspecting its signature.
+
+    Args:
+        func: the function to check
+
+    Returns:
+        whether the function returns its result, rather than yielding, and
+        has parameters that can all be fields of its key type
+    """
+    if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+        return False
+
+    # the parameters are the first names of the code, as in the signature
+    code = inspect.unwrap(func).__code__
+    count = code.co_argcount + code.co_kwonlyargcount
+    count += bool(code.co_flags & inspect.CO_VARARGS)
+    count += bool(code.co_flags & inspect.CO_VARKEYWORDS)
+    return not any(
+        name.startswith("_") or name == "func__" for name in code.co_varnames[:count]
+    )
+
+
+def shift_module(module: ModuleType, decorator: Decorator = shift) -> None:
+    """Shift the functions defined by a module.
+
+    Only functions defined at the top level of the module itself, that
+    aren't already shifted, are replaced. Generator functions, and those
+    with parameters that can't be fields of a key type, such as names
+    starting with an underscore, are left as they are.
+
+    Example:
+        >>> import types
+        >>> from snake.shifter import Context
+        >>> from snake.shifter.importer import shift_module
+        >>> module = types.ModuleType("example")
+        >>> exec("def f(x): return x", module.__dict__)
+        >>> shift_module(module)
+        >>> with Context(dict()) as d:
+        ...     module.f(1)
+        1
+        >>> list(d.values()), hasattr(module.f, "__key__")
+        ([1], True)
+
+    Args:
+        module: the module to modify
+        decorator: the decorator to shift functions with
+    """
+    for name, value in list(vars(module).items()):
+        if (
+            inspect.isfunction(value)
+            and value.__module__ == module.__name__
+            and value.__qualname__ == name
+            and not hasattr(value, "__key__")
+            and _shiftable(value)
+        ):
+            setattr(module, name, decorator(value))
+
+
+class _ShiftLoader(Loader):
+    """Load a module with another loader, then shift its functions."""
+
+    def __init__(self, loader: Loader, decorator: Decorator) -> None:
+        """Wrap the loader found for a module."""
+        self.loader = loader
+        self.decorator = decorator
+
+    def create_module(self, spec: ModuleSpec) -> Optional[ModuleType]:
+        """Create the module with the wrapped loader."""
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        """Execute the module with the wrapped loader, and shift it."""
+        self.loader.exec_module(module)
+        shift_module(module, self.decorator)
+
+    def __getattr__(self, name: str) -> Any:
+        """Look up anything else, such as `get_source`, on the wrapped loader."""
+        return getattr(self.loader, name)
+
+
+class ShiftFinder(MetaPathFinder):
+    """Find modules with the other finders, and shift them when loaded.
+
+    A module is shifted when its name, or the name of a package containing
+    it, is one of those given. Modules imported before the finder was
+    installed are not affected.
+
+    Example:
+        >>> finder = ShiftFinder(["json"])
+        >>> finder.matches("json.decoder"), finder.matches("jsonschema")
+        (True, False)
+    """
+
+    def __init__(self, names: Iterable[str], decorator: Decorator = shift) -> None:
+        """Select the modules to shift.
+
+        Args:
+            names: the names of modules and packages to shift
+            decorator: the decorator to shift functions with
+        """
+        self.names: Tuple[str, ...] = tuple(names)
+        self.decorator = decorator
+
+    def matches(self, fullname: str) -> bool:
+        """Check whether a module is one to shift.
+
+        Args:
+            fullname: the full name of the module
+
+        Returns:
+            whether the module, or a package containing it, was selected
+        """
+        return any(
+            fullname == name or fullname.startswith(name + ".") for name in self.names
+        )
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Optional[Sequence[str]],
+        target: Optional[ModuleType] = None,
+    ) -> Optional[ModuleSpec]:
+        """Find a selected module with the finders after this one."""
+        if not self.matches(fullname):
+            return None
+
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec: Optional[ModuleSpec] = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                # namespace packages may have no loader, and have no functions
+                if spec.loader is not None:
+                    spec.loader = _ShiftLoader(spec.loader, self.decorator)
+                return spec
+        return None
+
+
+def install(names: Iterable[str], decorator: Decorator = shift) -> ShiftFinder:
+    """Shift selected modules when they are imported from now on.
+
+    Args:
+        names: the names of modules and packages to shift
+        decorator: the decorator to shift functions with
+
+    Returns:
+        the finder added to `sys.meta_path`, to pass to `uninstall`
+    """
+    finder = ShiftFinder(names, decorator)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall(finder: ShiftFinder) -> None:
+    """Stop shifting the modules selected by a finder.
+
+    Modules already imported stay shifted.
+
+    Args:
+        finder: the finder returned by `install`
+    """
+    sys.meta_path.remove(finder)
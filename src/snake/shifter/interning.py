@@ -0,0 +1,72 @@
+"""Number call keys densely, so handlers can refer to calls by integer."""
+import threading
+from typing import Dict
+from typing import Iterable
+from typing import List
+
+from .typing import CallKey
+
+
+class KeyTable(Dict[CallKey, int]):
+    """Map each distinct call key to an integer, in the order first seen.
+
+    Looking up a key that hasn't been seen numbers it, so the lookup of
+    existing keys is a plain dict lookup. Use `in` or `get` to look up a
+    key without numbering it, and `key` for the reverse lookup. Keys are
+    numbered in insertion order, so iteration is in the order of numbering.
+
+    Example:
+        >>> table = KeyTable()
+        >>> table["a"], table["b"], table["a"]
+        (0, 1, 0)
+        >>> table.key(1)
+        'b'
+        >>> "c" in table
+        False
+        >>> table
+        KeyTable(['a', 'b'])
+    """
+
+    def __init__(self) -> None:
+        """Create an empty table."""
+        super().__init__()
+        self._keys: List[CallKey] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[CallKey]) -> "KeyTable":
+        """Create a table numbering distinct keys in the order given.
+
+        Example:
+            >>> KeyTable.from_keys(["a", "b"])["b"]
+            1
+
+        Args:
+            keys: the keys to number, repeated keys keeping their first number
+
+        Returns:
+            a table of the keys
+        """
+        table = cls()
+        for key in keys:
+            table[key]
+        return table
+
+    def __missing__(self, key: CallKey) -> int:
+        """Assign the next number to a key that hasn't been seen before."""
+        with self._lock:
+            # another thread may have numbered it while we waited
+            node = self.get(key)
+            if node is None:
+                node = len(self._keys)
+                self._keys.append(key)
+                self[key] = node
+            return node
+
+    def __repr__(self) -> str:
+        """Show the keys in the order they were numbered."""
+        return f"{type(self).__name__}({self._keys!r})"
+
+    def key(self, node: int) -> CallKey:
+        """Return the key with the given number."""
+        return self._keys[node]
@@ -1,24 +1,278 @@
 """Build a type to represent a function signature."""
+import importlib
 import inspect
+import operator
+import threading
 from collections import namedtuple
 from typing import Any
 from typing import Callable
 from typing import cast
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
 from typing import Type
 
 from .typing import CallKey
 
+# prefix for names used by generated code, namedtuple field names can't
+# start with an underscore so these never clash with parameters
+_PREFIX = "_shifter_"
+
+
+class CompactKey:
+    """Base of key types holding their values in slots, with a cached hash.
+
+    Keys are hashed many times in a call, as they are looked up and stored
+    by handlers, so the hash is worked out once, when the key is made. Keys
+    compare by identity before comparing their values. Otherwise they behave
+    as the namedtuple keys do, for field access, indexing and `func__`.
+    """
+
+    __slots__ = ("_values", "_hash", "digest__")
+
+    _fields: Tuple[str, ...] = ()
+    _values: Tuple[Any, ...]
+    _hash: int
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare by identity, then by the hash and values."""
+        if self is other:
+            return True
+        if not isinstance(other, CompactKey):
+            return NotImplemented
+        return self._hash == other._hash and self._values == other._values
+
+    def __hash__(self) -> int:
+        """Return the hash of the values, worked out when the key was made."""
+        return self._hash
+
+    def __len__(self) -> int:
+        """Return the number of values, including the function."""
+        return len(self._values)
+
+    def __getitem__(self, index: Any) -> Any:
+        """Return a value, or a tuple of values for a slice."""
+        return self._values[index]
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over the values, ending with the function."""
+        return iter(self._values)
+
+
+def _new_compact(cls: Any, values: Tuple[Any, ...]) -> CompactKey:
+    """Build a compact key from all its values, as `tuple.__new__` does."""
+    key = object.__new__(cls)
+    key._values = values
+    key._hash = hash(values)
+    return cast(CompactKey, key)
+
+
+def key_new(key_type: Any) -> Callable[[Any, Tuple[Any, ...]], CallKey]:
+    """Return the function that builds a key of a type from all its values.
+
+    Example:
+        >>> def f(a):
+        ...     pass
+        >>> key_type = make_key_type(f)
+        >>> key_new(key_type)(key_type, (1, f)) == key_type.from_call(1)
+        True
+
+    Args:
+        key_type: the key type
+
+    Returns:
+        a function taking the key type and a tuple of values
+    """
+    if issubclass(key_type, CompactKey):
+        return _new_compact  # type: ignore
+    return tuple.__new__
+
 
 def _from_call(cls: Any, *args: Any, **kwargs: Any) -> CallKey:
     """Build a call key by unpacking functionc all arguments."""
     bound = cls.__signature__.bind(*args, **kwargs)
     bound.apply_defaults()
-    return cast(CallKey, cls(*bound.arguments.values()))
+    return key_new(cls)(cls, tuple(bound.arguments.values()) + (cls.__func__,))
+
+
+class SignatureSource(NamedTuple):
+    """Python source fragments that reproduce a signature in generated code."""
+
+    # the parameter list, as it appears in a def statement
+    params: str
+    # the parameter values in signature order, with a trailing comma
+    values: str
+    # the arguments that forward the parameters to a call of the function
+    call: str
+    # the default values referenced by name from the parameter list
+    namespace: Dict[str, Any]
+
+
+def signature_source(sig: inspect.Signature) -> SignatureSource:
+    """Generate source fragments for a def matching the signature.
+
+    Example:
+        >>> def f(a, b=2, *args, c, **kwargs):
+        ...     pass
+        >>> source = signature_source(inspect.signature(f))
+        >>> source.params
+        'a, b=_shifter_default_1, *args, c, **kwargs'
+        >>> source.values
+        'a, b, args, c, kwargs, '
+        >>> source.call
+        'a, b, *args, c=c, **kwargs'
+
+    Args:
+        sig: the signature to reproduce
+
+    Returns:
+        the source fragments, and namespace holding the default values
+    """
+    params: List[str] = []
+    call: List[str] = []
+    namespace: Dict[str, Any] = {}
+    positional_only = False
+    keyword_only = False
+
+    for index, (name, param) in enumerate(sig.parameters.items()):
+        if param.kind is param.POSITIONAL_ONLY:
+            positional_only = True
+        elif positional_only:
+            params.append("/")
+            positional_only = False
+
+        if param.kind is param.KEYWORD_ONLY and not keyword_only:
+            params.append("*")
+            keyword_only = True
+
+        if param.kind is param.VAR_POSITIONAL:
+            params.append("*" + name)
+            call.append("*" + name)
+            keyword_only = True
+        elif param.kind is param.VAR_KEYWORD:
+            params.append("**" + name)
+            call.append("**" + name)
+        else:
+            if param.default is param.empty:
+                params.append(name)
+            else:
+                default = f"{_PREFIX}default_{index}"
+                namespace[default] = param.default
+                params.append(f"{name}={default}")
+            call.append(f"{name}={name}" if keyword_only else name)
+
+    if positional_only:
+        params.append("/")
+
+    return SignatureSource(
+        params=", ".join(params),
+        values="".join(name + ", " for name in sig.parameters.keys()),
+        call=", ".join(call),
+        namespace=namespace,
+    )
+
+
+def _compile_from_call(
+    func: Callable[..., Any], sig: inspect.Signature, compact: bool
+) -> Any:
+    """Generate a from_call specialised to the signature, avoiding bind."""
+    source = signature_source(sig)
+
+    namespace = dict(source.namespace)
+    namespace[_PREFIX + "func"] = func
 
+    values = f"({source.values}{_PREFIX}func,)"
+    if compact:
+        # build the key in place, rather than calling _new_compact
+        namespace[_PREFIX + "new"] = object.__new__
+        namespace[_PREFIX + "hash"] = hash
+        body = (
+            f"    {_PREFIX}key = {_PREFIX}new({_PREFIX}cls)\n"
+            f"    {_PREFIX}key._values = {_PREFIX}values = {values}\n"
+            f"    {_PREFIX}key._hash = {_PREFIX}hash({_PREFIX}values)\n"
+            f"    return {_PREFIX}key\n"
+        )
+    else:
+        namespace[_PREFIX + "new"] = tuple.__new__
+        body = f"    return {_PREFIX}new({_PREFIX}cls, {values})\n"
+
+    code = f"def from_call({_PREFIX}cls, {source.params}):\n" + body
+    try:
+        exec(code, namespace)  # noqa: S102
+    except SyntaxError:  # pragma: no cover
+        # positional only parameters can't be expressed before python 3.8
+        return _from_call
+
+    from_call = namespace["from_call"]
+    from_call.__qualname__ = func.__qualname__ + ".from_call"
+    return from_call
+
+
+def _find_key_type(module: str, qualname: str) -> Type[CallKey]:
+    """Find the key type of a function, by the names it was created for."""
+    func: Any = importlib.import_module(module)
+    for name in qualname.split("."):
+        func = getattr(func, name)
+
+    # the module holds the shifted function, otherwise build a new key type
+    key_type = getattr(func, "__key__", None) or make_key_type(func)
+    if isinstance(key_type, LazyKeyType):
+        key_type = key_type.resolve()
+    return key_type
+
+
+def _rebuild_key(module: str, qualname: str, values: Tuple[Any, ...]) -> CallKey:
+    """Rebuild a pickled key, by finding the function it was created for."""
+    key_type = _find_key_type(module, qualname)
+    values += (key_type.__func__,)  # type: ignore
+    return key_new(key_type)(key_type, values)
 
-def make_key_type(func: Callable[..., Any]) -> Type[CallKey]:
-    """Construct a type representing a functions signature."""
+
+def call_args(key: CallKey) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
+    """Unpack a key into arguments that repeat the call it represents.
+
+    Example:
+        >>> def f(a, *args, b, **kwargs):
+        ...     pass
+        >>> call_args(make_key_type(f).from_call(1, 2, 3, b=4, c=5))
+        ((1, 2, 3), {'b': 4, 'c': 5})
+
+    Args:
+        key: the key to unpack
+
+    Returns:
+        the positional and keyword arguments of the call
+    """
+    args: List[Any] = []
+    kwargs: Dict[str, Any] = {}
+    params = key.__signature__.parameters.values()  # type: ignore
+    for param, value in zip(params, key):  # type: ignore
+        if param.kind is param.VAR_POSITIONAL:
+            args.extend(value)
+        elif param.kind is param.KEYWORD_ONLY:
+            kwargs[param.name] = value
+        elif param.kind is param.VAR_KEYWORD:
+            kwargs.update(value)
+        else:
+            args.append(value)
+    return tuple(args), kwargs
+
+
+def make_key_type(func: Callable[..., Any], compact: bool = False) -> Type[CallKey]:
+    """Construct a type representing a functions signature.
+
+    Args:
+        func: the function to represent calls of
+        compact: subclass `CompactKey` rather than a namedtuple
+
+    Returns:
+        the key type
+    """
     sig = inspect.signature(func)
+    names = tuple(sig.parameters.keys()) + ("func__",)
 
     # make a format string that unpacks and names the parameters nicely
     repr_fmt = (
@@ -36,24 +290,117 @@ def make_key_type(func: Callable[..., Any]) -> Type[CallKey]:
     def _repr(self: Any) -> str:
         return repr_fmt.format(*self[:-1])
 
+    # pickle by reference to the function, as the key type is created here
+    def _reduce(self: Any) -> Tuple[Any, ...]:
+        return _rebuild_key, (func.__module__, func.__qualname__, self[:-1])
+
+    namespace: Dict[str, Any] = {
+        "__repr__": _repr,
+        "__reduce__": _reduce,
+        "__func__": func,
+        "__module__": func.__module__,
+        "__signature__": sig,
+        "from_call": classmethod(_compile_from_call(func, sig, compact)),
+    }
+
+    if compact:
+        namespace.update(
+            {
+                "__slots__": (),
+                "_fields": names,
+                # every key of the type calls the same function
+                "func__": staticmethod(func),
+            }
+        )
+        namespace.update(
+            {
+                name: property(operator.itemgetter(index), doc=f"Alias for {name}")
+                for index, name in enumerate(names[:-1])
+            }
+        )
+        # CallKey is a protocol, which keys match without subclassing it, and
+        # subclassing it would give every key a __dict__
+        return cast(Type[CallKey], type(func.__name__, (CompactKey,), namespace))
+
     key_type = type(
         func.__name__,
         (
             namedtuple(
                 func.__name__,
-                tuple(sig.parameters.keys()) + ("func__",),
+                names,
                 defaults=tuple(p.default for p in sig.parameters.values()) + (func,),
                 module=func.__module__,
             ),
             CallKey,
         ),
-        {
-            "__repr__": _repr,
-            "__func__": func,
-            "__module__": func.__module__,
-            "__signature__": sig,
-            "from_call": classmethod(_from_call),
-        },
+        namespace,
     )
 
     return key_type
+
+
+# key types are resolved once each, so share a lock between them all
+_lock = threading.Lock()
+
+
+class LazyKeyType:
+    """Stand in for the key type of a function, until it is first used.
+
+    Building a key type inspects the signature and creates two classes, so
+    it is put off until the first key is made, or the type is otherwise
+    looked at. Then `from_call` is replaced on the instance by that of the
+    key type, so later keys are made without going through `resolve`.
+
+    Example:
+        >>> def f(a, b=2):
+        ...     pass
+        >>> key_type = LazyKeyType(f)
+        >>> key_type
+        <lazy key type of f>
+        >>> key_type.from_call(1)[:2]
+        (1, 2)
+        >>> key_type._fields
+        ('a', 'b', 'func__')
+    """
+
+    def __init__(self, func: Callable[..., Any], compact: bool = False) -> None:
+        """Defer building the key type of a function.
+
+        Args:
+            func: the function to build the key type of
+            compact: build a `CompactKey` type rather than a namedtuple
+        """
+        self.__func__ = func
+        self._compact = compact
+        self._key_type: Optional[Type[CallKey]] = None
+
+    def resolve(self) -> Type[CallKey]:
+        """Build the key type, once, even when called from many threads.
+
+        Returns:
+            the key type
+        """
+        key_type = self._key_type
+        if key_type is None:
+            with _lock:
+                key_type = self._key_type
+                if key_type is None:
+                    key_type = make_key_type(self.__func__, self._compact)
+                    self.from_call = key_type.from_call  # type: ignore
+                    self._key_type = key_type
+        return key_type
+
+    def from_call(self, *args: Any, **kwargs: Any) -> CallKey:
+        """Build the key type, and a key for the call."""
+        return self.resolve().from_call(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        """Look up anything else on the key type."""
+        # the stand in's own attributes, before they are set by a copy
+        if name in ("_key_type", "_compact"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        """Show the function the key type is for."""
+        return f"<lazy key type of {self.__func__.__qualname__}>"
@@ -0,0 +1,191 @@
+"""Call the invalidated calls of a graph again, independent calls concurrently.
+
+After a bump, the children recorded for each invalidated call before it
+was invalidated say which calls it will need, so calls that don't depend
+on each other can be made at the same time by a `concurrent.futures`
+executor rather than one after another on the recursive Python stack.
+"""
+import threading
+from collections import defaultdict
+from concurrent.futures import Executor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from .context import Context
+from .graph import _MISSING
+from .graph import GraphHandler
+from .typing import CallKey
+from .wrapper import call
+
+# the values of calls, and the edges between them, made in another process
+Results = Tuple[List[Tuple[CallKey, Any]], List[Tuple[CallKey, CallKey]]]
+
+
+class _Worker(GraphHandler):
+    """A view of a graph with its own call stack, for use by one thread."""
+
+    def __init__(self, graph: GraphHandler, lock: threading.Lock) -> None:
+        """Share the values and edges of the graph, guarding edge updates."""
+        self.__dict__.update(graph.__dict__)
+        self._stack = []
+        self._lock = lock
+
+    def _link(self, parent: int, child: int) -> None:
+        """Record that a call was made by another, one thread at a time."""
+        with self._lock:
+            super()._link(parent, child)
+
+
+def _evaluate(graph: GraphHandler, lock: threading.Lock, key: CallKey) -> None:
+    """Make a call in a worker thread, storing the result in the graph."""
+    with Context(_Worker(graph, lock)):
+        try:
+            call(key)
+        except Exception:  # noqa: S110
+            # the failure has been stored in the graph
+            pass
+
+
+def _evaluate_remote(key: CallKey, inputs: Mapping[CallKey, Any]) -> Results:
+    """Make a call in a worker process, returning the calls it made."""
+    graph = GraphHandler().bump(inputs)
+    with Context(graph):
+        try:
+            call(key)
+        except Exception:  # noqa: S110
+            # the failure has been stored in the graph
+            pass
+
+    table = graph._table
+    values = [
+        (table.key(node), value)
+        for node, value in graph._values.items()
+        if table.key(node) not in inputs
+    ]
+    edges = [
+        (table.key(parent), table.key(child))
+        for parent, calls in graph._calls.items()
+        for child in calls
+    ]
+    return values, edges
+
+
+def _merge(graph: GraphHandler, results: Results) -> None:
+    """Store the calls made in another process in the graph."""
+    values, edges = results
+    for parent, child in edges:
+        graph._link(graph._table[parent], graph._table[child])
+    for key, value in values:
+        graph._store(graph._table[key], value)
+
+
+class _Schedule:
+    """Track which invalidated calls are ready to be made."""
+
+    def __init__(self, graph: GraphHandler, executor: Executor) -> None:
+        """Find the invalidated children each invalidated call waits for."""
+        self.graph = graph
+        self.executor = executor
+        self.remote = isinstance(executor, ProcessPoolExecutor)
+        self.lock = threading.Lock()
+        self.dirty = dict(graph._dirty)
+
+        self.waiting: Dict[int, Set[int]] = {
+            node: {child for child in children if child in self.dirty}
+            for node, children in self.dirty.items()
+        }
+        self.dependents: Dict[int, List[int]] = defaultdict(list)
+        for node, children in self.waiting.items():
+            for child in children:
+                self.dependents[child].append(node)
+
+        self.pending: Dict["Future[Any]", int] = {}
+
+    def submit(self, node: int) -> None:
+        """Submit a call to the executor."""
+        key = self.graph._table.key(node)
+        future: "Future[Any]"
+        if self.remote:
+            inputs = {}
+            # children are made before their parents, so all have values
+            for child in self.dirty[node]:
+                value = self.graph._value(child)
+                if value is not _MISSING:  # pragma: no branch
+                    inputs[self.graph._table.key(child)] = value
+            future = self.executor.submit(_evaluate_remote, key, inputs)
+        else:
+            future = self.executor.submit(_evaluate, self.graph, self.lock, key)
+        self.pending[future] = node
+
+    def complete(self, future: "Future[Any]") -> None:
+        """Collect a finished call, and submit the calls waiting only on it."""
+        node = self.pending.pop(future)
+        if self.remote:
+            _merge(self.graph, future.result())
+        else:
+            future.result()
+
+        for parent in self.dependents[node]:
+            self.waiting[parent].discard(node)
+            if not self.waiting[parent]:
+                self.submit(parent)
+
+    def run(self) -> None:
+        """Make all the calls, as soon as the calls they wait for are made."""
+        for node, children in self.waiting.items():
+            if not children:
+                self.submit(node)
+
+        while self.pending:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                self.complete(future)
+
+
+def recalculate(graph: GraphHandler, executor: Optional[Executor] = None) -> None:
+    """Call the invalidated calls of a graph again.
+
+    Each call is submitted once all of the invalidated calls it made last
+    time have been recalculated. With a thread pool the calls share the
+    graph, each thread with its own call stack. With a process pool each
+    call is made in a fresh graph seeded with the values of its children,
+    and the calls it makes are merged back, so the functions and arguments
+    must be picklable.
+
+    Example:
+        >>> from snake.shifter import Context, key, shift
+        >>> from snake.shifter.graph import GraphHandler
+        >>> from snake.shifter.parallel import recalculate
+        >>> @shift
+        ... def f(x):
+        ...     return x
+        >>> @shift
+        ... def g(x, y):
+        ...     return f(x) + f(y)
+        >>> with Context(GraphHandler()) as graph:
+        ...     g(1, 2)
+        3
+        >>> bumped = graph.bump({key(f, 1): 10})
+        >>> recalculate(bumped)
+        >>> bumped[key(g, 1, 2)]
+        12
+
+    Args:
+        graph: the graph to recalculate
+        executor: the executor to make calls with, by default a thread pool
+    """
+    if executor is None:
+        with ThreadPoolExecutor() as pool:
+            _Schedule(graph, pool).run()
+    else:
+        _Schedule(graph, executor).run()
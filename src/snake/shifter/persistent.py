@@ -0,0 +1,194 @@
+"""Persist the results of calls on disk, so they survive a restart."""
+import os
+import pickle  # noqa: S403
+import sqlite3
+from types import TracebackType
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from .digest import digest
+from .failure import Failure
+from .typing import CallKey
+
+_MISSING = object()
+
+# the number of digests looked up by each query, within sqlite's limits
+_CHUNK = 500
+
+
+def _serialise(key: CallKey) -> Tuple[str, str]:
+    """Return the digest of a key to look it up by, and its text to read."""
+    return digest(key), repr(key)
+
+
+class SQLiteHandler:
+    """Store the results of calls in a SQLite database.
+
+    Calls are looked up by their digest, so arguments need to be ones
+    `digest` supports, and values need to be picklable. The text of each
+    key is stored too, to read the database by, but isn't compared, since
+    the `repr` of equal keys can differ between processes. Results are
+    written in batches, so call `flush` or `close`, or use the handler as
+    a context manager, to make sure they are all written. Failed calls are
+    not stored by default, so they are made again after a restart.
+
+    Not safe to share between threads.
+
+    Example:
+        >>> from snake.shifter import key, shift
+        >>> @shift
+        ... def f(a):
+        ...     return a
+        >>> with SQLiteHandler(":memory:") as store:
+        ...     store[key(f, 1)] = 1
+        ...     key(f, 1) in store, store[key(f, 1)]
+        (True, 1)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        batch_size: int = 1000,
+        cache_exceptions: bool = False,
+    ) -> None:
+        """Open, or create, a database of results.
+
+        Args:
+            path: the database file
+            batch_size: the number of results to hold before writing them
+            cache_exceptions: store failed calls, rather than calling again
+        """
+        self.batch_size = batch_size
+        self.cache_exceptions = cache_exceptions
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "digest TEXT PRIMARY KEY, key TEXT NOT NULL, value BLOB NOT NULL)"
+        )
+
+        # results waiting to be written, by digest
+        self._pending: Dict[str, Tuple[str, Any]] = dict()
+        # the last result found by __contains__, for __getitem__ to return
+        self._found: Tuple[Any, Any] = (_MISSING, _MISSING)
+
+    def __enter__(self) -> "SQLiteHandler":
+        """Use the handler until the block exits."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Write any pending results, and close the database."""
+        self.close()
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Look for a stored result."""
+        value = self._load(key)
+        if value is _MISSING:
+            return False
+        self._found = (key, value)
+        return True
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return a stored result."""
+        found_key, value = self._found
+        self._found = (_MISSING, _MISSING)
+        if found_key is not key:
+            value = self._load(key)
+            if value is _MISSING:
+                raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store a result, writing a batch of results if enough are waiting."""
+        if type(value) is Failure and not self.cache_exceptions:
+            return
+
+        digest, text = _serialise(key)
+        self._pending[digest] = (text, value)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Return the calls with stored results."""
+        return set(self.get_many(keys))
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Return the stored results of many calls, with a query per chunk."""
+        values: Dict[CallKey, Any] = dict()
+        wanted: Dict[str, CallKey] = dict()
+        for key in keys:
+            name = digest(key)
+            pending = self._pending.get(name)
+            if pending is not None:
+                values[key] = pending[1]
+            else:
+                wanted[name] = key
+
+        digests: List[str] = list(wanted)
+        for start in range(0, len(digests), _CHUNK):
+            chunk = digests[start : start + _CHUNK]
+            rows = self._connection.execute(
+                "SELECT digest, value FROM calls WHERE digest IN "  # noqa: S608
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            for name, value in rows:
+                values[wanted[name]] = pickle.loads(value)  # noqa: S301
+        return values
+
+    def set_many(self, values: Mapping[CallKey, Any]) -> None:
+        """Store the results of many calls, writing them if enough are waiting."""
+        for key, value in values.items():
+            if type(value) is not Failure or self.cache_exceptions:
+                digest, text = _serialise(key)
+                self._pending[digest] = (text, value)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all the pending results to the database."""
+        if not self._pending:
+            return
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO calls VALUES (?, ?, ?)",
+                (
+                    (digest, text, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                    for digest, (text, value) in self._pending.items()
+                ),
+            )
+        self._pending.clear()
+
+    def close(self) -> None:
+        """Write all the pending results, and close the database."""
+        self.flush()
+        self._connection.close()
+
+    def _load(self, key: CallKey) -> Any:
+        """Find a pending or stored result for a key."""
+        name = digest(key)
+
+        pending = self._pending.get(name)
+        if pending is not None:
+            return pending[1]
+
+        row = self._connection.execute(
+            "SELECT value FROM calls WHERE digest = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return _MISSING
+        return pickle.loads(row[0])  # noqa: S301
@@ -0,0 +1,265 @@
+"""Time the calls made through a handler, by call and by function."""
+import marshal
+import os
+from time import perf_counter_ns
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from .typing import CallHandler
+from .typing import CallKey
+
+# calls, hits, self time and cumulative time in nanoseconds, of a key
+_Counts = List[int]
+
+# the file, line and name pstats identifies a function by
+_Label = Tuple[str, int, str]
+
+# positions in a node of the call tree, which are lists for speed
+_CALLS, _SELF, _CUMULATIVE, _CHILDREN, _FUNC = range(5)
+
+
+class CallStats(NamedTuple):
+    """The calls made to a function or with a key, and the time they took."""
+
+    # calls made, rather than found by the handler
+    calls: int
+    # calls found by the handler
+    hits: int
+    # nanoseconds spent in the calls, excluding the calls they made
+    self_ns: int
+    # nanoseconds spent in the calls, including the calls they made
+    cumulative_ns: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of calls that were found by the handler."""
+        total = self.calls + self.hits
+        return self.hits / total if total else 0.0
+
+
+def _label(func: Callable[..., Any]) -> _Label:
+    """Identify a function the way pstats does."""
+    code = func.__code__
+    return (code.co_filename, code.co_firstlineno, func.__qualname__)
+
+
+def _node(func: Optional[Callable[..., Any]]) -> List[Any]:
+    """Create a node of the call tree, for calls to a function."""
+    return [0, 0, 0, dict(), func]
+
+
+class ProfileHandler:
+    """Time the calls made through another handler.
+
+    A call is timed from when the handler is asked for it, to when its
+    value is stored, so time spent in the wrapped handler is included.
+    Calls found by the wrapped handler are counted as hits, and not timed.
+
+    While calls are made only a tree of calls by function, and counts by
+    key, are updated. Timings by function, for pstats, and for flamegraphs
+    are worked out from them when asked for. Functions calling themselves
+    are only timed once, by their outermost call, as pstats does.
+
+    Not safe to share between threads, and the stack of calls is left
+    inconsistent if a call is interrupted by something other than an
+    `Exception`.
+
+    Example:
+        >>> from snake.shifter import Context, shift
+        >>> @shift
+        ... def fib(x):
+        ...     return 1 if x <= 1 else fib(x - 1) + fib(x - 2)
+        >>> with Context(ProfileHandler(dict())) as profiler:
+        ...     fib(10)
+        89
+        >>> stats = profiler.by_function()[fib.__module__ + ".fib"]
+        >>> stats.calls, stats.hits
+        (11, 8)
+    """
+
+    def __init__(self, handler: Optional[CallHandler] = None) -> None:
+        """Wrap a handler.
+
+        Args:
+            handler: the handler to check and store calls with, or none to
+                make every call
+        """
+        self.handler = handler
+
+        self._keys: Dict[CallKey, _Counts] = dict()
+        self._root = _node(None)
+        # calls in progress, with their node, start time and time in children
+        self._stack: List[List[Any]] = []
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Count a hit, or start timing a call."""
+        if self.handler is not None and key in self.handler:
+            counts = self._keys.get(key)
+            if counts is None:
+                counts = self._keys[key] = [0, 0, 0, 0]
+            counts[1] += 1
+            return True
+
+        func = key.func__  # type: ignore
+        stack = self._stack
+        children = (stack[-1][0] if stack else self._root)[_CHILDREN]
+        node = children.get(func)
+        if node is None:
+            node = children[func] = _node(func)
+        stack.append([node, perf_counter_ns(), 0])
+        return False
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return the value from the wrapped handler."""
+        if self.handler is None:
+            raise KeyError(key)
+        return self.handler[key]
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store the value, and stop timing the call."""
+        end = perf_counter_ns()
+        if self.handler is not None:
+            self.handler[key] = value
+
+        stack = self._stack
+        node, start, child = stack.pop()
+        elapsed = end - start
+        if stack:
+            stack[-1][2] += elapsed
+
+        node[_CALLS] += 1
+        node[_SELF] += elapsed - child
+        node[_CUMULATIVE] += elapsed
+
+        counts = self._keys.get(key)
+        if counts is None:
+            counts = self._keys[key] = [0, 0, 0, 0]
+        counts[0] += 1
+        counts[2] += elapsed - child
+        counts[3] += elapsed
+
+    def by_key(self) -> Dict[CallKey, CallStats]:
+        """Return the calls made with each key, and the time they took."""
+        return {key: CallStats(*counts) for key, counts in self._keys.items()}
+
+    def by_function(self) -> Dict[str, CallStats]:
+        """Return the calls made to each function, by module and qualified name."""
+        totals: Dict[Callable[..., Any], List[int]] = dict()
+        for node, ancestors in self._walk():
+            counts = totals.setdefault(node[_FUNC], [0, 0, 0, 0])
+            counts[0] += node[_CALLS]
+            counts[2] += node[_SELF]
+            if node[_FUNC] not in ancestors:
+                counts[3] += node[_CUMULATIVE]
+
+        for key, (_, hits, _, _) in self._keys.items():
+            if hits:
+                totals.setdefault(key.func__, [0, 0, 0, 0])[1] += hits  # type: ignore
+
+        return {
+            f"{func.__module__}.{func.__qualname__}": CallStats(*counts)
+            for func, counts in totals.items()
+        }
+
+    def create_stats(self) -> None:
+        """Fill in `stats`, so the handler can be loaded by `pstats.Stats`.
+
+        Example:
+            >>> import pstats
+            >>> from snake.shifter import Context, shift
+            >>> @shift
+            ... def f(x):
+            ...     return x
+            >>> with Context(ProfileHandler()) as profiler:
+            ...     f(1)
+            1
+            >>> pstats.Stats(profiler).total_calls
+            1
+        """
+        # primitive calls, calls, self and cumulative time, and by caller
+        totals: Dict[Callable[..., Any], List[Any]] = dict()
+        for node, ancestors in self._walk():
+            func = node[_FUNC]
+            outermost = func not in ancestors
+            primitive = node[_CALLS] if outermost else 0
+            cumulative = node[_CUMULATIVE] if outermost else 0
+
+            counts = totals.setdefault(func, [0, 0, 0, 0, dict()])
+            edges = [counts]
+            if ancestors:
+                edges.append(counts[4].setdefault(ancestors[-1], [0, 0, 0, 0]))
+            for edge in edges:
+                edge[0] += primitive
+                edge[1] += node[_CALLS]
+                edge[2] += node[_SELF]
+                edge[3] += cumulative
+
+        self.stats = {
+            _label(func): (
+                primitive,
+                calls,
+                self_ns / 1e9,
+                cumulative / 1e9,
+                {
+                    _label(caller): (c[0], c[1], c[2] / 1e9, c[3] / 1e9)
+                    for caller, c in callers.items()
+                },
+            )
+            for func, (primitive, calls, self_ns, cumulative, callers) in totals.items()
+        }
+
+    def dump_stats(self, path: Union[str, "os.PathLike[str]"]) -> None:
+        """Write the timings in the format pstats reads from files.
+
+        Args:
+            path: the file to write
+        """
+        self.create_stats()
+        with open(path, "wb") as f:
+            marshal.dump(self.stats, f)
+
+    def collapsed(self) -> str:
+        """Return the self time of each stack of calls, as a flamegraph reads.
+
+        Example:
+            >>> from snake.shifter import Context, shift
+            >>> @shift
+            ... def f(x):
+            ...     return x
+            >>> @shift
+            ... def g(x):
+            ...     return f(x)
+            >>> with Context(ProfileHandler()) as profiler:
+            ...     g(1)
+            1
+            >>> [line.split(" ")[0] for line in profiler.collapsed().splitlines()]
+            ['g', 'g;f']
+
+        Returns:
+            lines of call stacks separated by semicolons, and nanoseconds
+        """
+        return "".join(
+            ";".join(func.__qualname__ for func in ancestors + (node[_FUNC],))
+            + f" {node[_SELF]}\n"
+            for node, ancestors in self._walk()
+        )
+
+    def _walk(self) -> Iterator[Tuple[List[Any], Tuple[Callable[..., Any], ...]]]:
+        """Iterate over the call tree depth first, with the functions above."""
+        pending: List[Tuple[List[Any], Tuple[Callable[..., Any], ...]]] = [
+            (node, ()) for node in reversed(list(self._root[_CHILDREN].values()))
+        ]
+        while pending:
+            node, ancestors = pending.pop()
+            yield node, ancestors
+            path = ancestors + (node[_FUNC],)
+            pending.extend(
+                (child, path) for child in reversed(list(node[_CHILDREN].values()))
+            )
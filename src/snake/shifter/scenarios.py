@@ -0,0 +1,133 @@
+"""Evaluate many what-if scenarios against one recorded graph.
+
+Each scenario overrides the values of some calls. The scenarios are forked
+from the graph together by `GraphHandler.bump_many`, so they share all the
+values none of their overrides affect, and each recalculates only the
+calls depending on its own overrides, as its outputs need them.
+"""
+import functools
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Sequence
+
+from .context import Context
+from .failure import Failure
+from .graph import GraphHandler
+from .snapshot import load
+from .snapshot import save
+from .typing import CallKey
+from .wrapper import call
+
+# a row of the values of the outputs of each scenario
+Table = List[List[Any]]
+
+
+def _outputs(graph: GraphHandler, outputs: Sequence[CallKey]) -> List[Any]:
+    """Make the output calls of a scenario, storing failures as values."""
+    row = []
+    with Context(graph):
+        for key in outputs:
+            try:
+                row.append(call(key))
+            except Exception as exc:
+                row.append(Failure.of(exc))
+    return row
+
+
+# the graph last loaded by a worker process, to share between scenarios
+_load = functools.lru_cache(maxsize=1)(load)
+
+
+def _evaluate_remote(
+    path: str,
+    bumps: Sequence[Mapping[CallKey, Any]],
+    outputs: Sequence[CallKey],
+    equal: Optional[Callable[[Any, Any], bool]] = None,
+) -> Table:
+    """Evaluate some of the scenarios in a worker process."""
+    graph = _load(path, equal)
+    return [_outputs(fork, outputs) for fork in graph.bump_many(bumps)]
+
+
+def scenarios(
+    graph: GraphHandler,
+    bumps: Sequence[Mapping[CallKey, Any]],
+    outputs: Sequence[CallKey],
+    executor: Optional[Executor] = None,
+) -> Table:
+    """Evaluate some output calls under each of many sets of overrides.
+
+    A call that fails in a scenario has the `Failure` stored for it as its
+    cell of the table. The graph itself isn't modified.
+
+    With a thread pool the scenarios are evaluated concurrently, with each
+    fork made only a few scenarios ahead of those finished. With a process
+    pool the graph is saved to a snapshot once, and loaded by each
+    worker to evaluate a share of the scenarios, so the functions,
+    arguments, values and any `equal` function must be picklable.
+
+    Example:
+        >>> from snake.shifter import Context, key, shift
+        >>> from snake.shifter.scenarios import scenarios
+        >>> @shift
+        ... def f(x):
+        ...     return x
+        >>> @shift
+        ... def g(x, y):
+        ...     return f(x) + f(y)
+        >>> with Context(GraphHandler()) as graph:
+        ...     g(1, 2)
+        3
+        >>> bumps = [{key(f, 1): 2}, {key(f, 2): 1}, {}]
+        >>> scenarios(graph, bumps, [key(g, 1, 2), key(f, 1)])
+        [[4, 2], [2, 1], [3, 1]]
+
+    Args:
+        graph: the recorded graph to bump
+        bumps: the values to override in each scenario, by call
+        outputs: the calls to evaluate in each scenario
+        executor: the executor to evaluate scenarios with, by default none
+
+    Returns:
+        a row for each scenario, of the values of the outputs
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        size = -(-len(bumps) // (os.cpu_count() or 1)) or 1
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "graph")
+            save(graph, path)
+            chunks = executor.map(
+                _evaluate_remote,
+                repeat(path),
+                [bumps[i : i + size] for i in range(0, len(bumps), size)],
+                repeat(outputs),
+                repeat(graph._equal),
+            )
+            return [row for chunk in chunks for row in chunk]
+
+    forks = graph.bump_many(bumps)
+    if executor is None:
+        return [_outputs(fork, outputs) for fork in forks]
+
+    # the forks are made as they are submitted, so submit a window of them
+    # at a time rather than holding every fork at once
+    window = 2 * (os.cpu_count() or 1)
+    table = []
+    pending: Deque["Future[List[Any]]"] = deque()
+    for fork in forks:
+        pending.append(executor.submit(_outputs, fork, outputs))
+        if len(pending) == window:
+            table.append(pending.popleft().result())
+    table.extend(future.result() for future in pending)
+    return table
@@ -0,0 +1,269 @@
+"""Share the results of calls between processes on the same host."""
+import fcntl
+import mmap
+import os
+import pickle  # noqa: S403
+import struct
+import sys
+from contextlib import contextmanager
+from types import TracebackType
+from typing import Any
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+from .digest import digest
+from .failure import Failure
+from .typing import CallKey
+
+_MISSING = object()
+
+_MAGIC = b"shifter1"
+# magic, number of slots, size of the arena, bytes of the arena used
+_HEADER = struct.Struct("<8sQQQ")
+# digest of the key, offset and length of the record
+_SLOT = struct.Struct("<16sQQ")
+# length of the pickle, and number of out of band buffers
+_RECORD = struct.Struct("<QQ")
+_EMPTY = bytes(16)
+# buffers are aligned so arrays read from them are aligned too
+_ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the next aligned position."""
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+if sys.version_info >= (3, 8):
+
+    def _dumps(value: Any) -> Tuple[bytes, List[memoryview]]:
+        """Pickle a value, keeping large buffers such as arrays out of band."""
+        if type(value) is bytes:
+            # bytes are always pickled in band, unless wrapped as a buffer
+            value = pickle.PickleBuffer(value)
+        buffers: List[pickle.PickleBuffer] = []
+        data = pickle.dumps(value, 5, buffer_callback=buffers.append)
+        return data, [buffer.raw() for buffer in buffers]
+
+    def _loads(data: memoryview, buffers: List[memoryview]) -> Any:
+        """Unpickle a value, reading its buffers in place."""
+        views = [buffer.toreadonly() for buffer in buffers]
+        return pickle.loads(data, buffers=views)  # noqa: S301
+
+else:  # pragma: no cover
+
+    def _dumps(value: Any) -> Tuple[bytes, List[memoryview]]:
+        """Pickle a value, protocol 5 buffers need python 3.8."""
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL), []
+
+    def _loads(data: memoryview, buffers: List[memoryview]) -> Any:
+        """Unpickle a value."""
+        return pickle.loads(data)  # noqa: S301
+
+
+class SharedMemoryHandler:
+    """Store the results of calls in a memory mapped file shared by processes.
+
+    The file holds a fixed size table of slots, looked up by key digest, and
+    an arena of pickled values that is only ever appended to. Writers take
+    a lock on the file, readers don't, as a slot is only filled in once its
+    value has been written. When the table or arena is full new results are
+    not stored, and calls are made as normal.
+
+    Values are pickled with protocol 5, so large buffers such as numpy
+    arrays are stored out of band, and read back as read only views of the
+    shared memory rather than being copied into each process. Results that
+    are `bytes` are stored as a buffer too, so are read back as a read only
+    `memoryview`.
+
+    Failed calls are not stored by default. The handler pickles by path, so
+    can be passed to worker processes, which open the same file.
+
+    Example:
+        >>> import tempfile
+        >>> from snake.shifter import key, shift
+        >>> @shift
+        ... def f(a):
+        ...     return a
+        >>> with tempfile.TemporaryDirectory() as path:
+        ...     with SharedMemoryHandler(path + "/calls") as handler:
+        ...         handler[key(f, 1)] = 1
+        ...     with SharedMemoryHandler(path + "/calls") as handler:
+        ...         key(f, 1) in handler, handler[key(f, 1)]
+        (True, 1)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        slots: int = 1 << 16,
+        size: int = 1 << 28,
+        cache_exceptions: bool = False,
+    ) -> None:
+        """Open, or create, a shared file of results.
+
+        Args:
+            path: the file to map, created if it doesn't exist
+            slots: the number of results the file can hold, if it is created
+            size: the bytes of values the file can hold, if it is created
+            cache_exceptions: store failed calls, rather than calling again
+
+        Raises:
+            ValueError: if the file exists, but isn't a file of shared results
+        """
+        self.path = path
+        self.cache_exceptions = cache_exceptions
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        with self._locked():
+            created = os.fstat(self._fd).st_size == 0
+            if created:
+                os.ftruncate(self._fd, _HEADER.size + _SLOT.size * slots + size)
+            self._mmap = mmap.mmap(self._fd, 0)
+            if created:
+                _HEADER.pack_into(self._mmap, 0, _MAGIC, slots, size, 0)
+
+        magic, self.slots, self.size, _ = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a file of shared results")
+        self._arena = _HEADER.size + _SLOT.size * self.slots
+
+        # the last result found by __contains__, for __getitem__ to return
+        self._found: Tuple[Any, Any] = (_MISSING, _MISSING)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """Pickle by path, so other processes map the same file."""
+        return type(self), (self.path, self.slots, self.size, self.cache_exceptions)
+
+    def __enter__(self) -> "SharedMemoryHandler":
+        """Use the handler until the block exits."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Unmap the file."""
+        self.close()
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Look for a stored result."""
+        value = self._load(key)
+        if value is _MISSING:
+            return False
+        self._found = (key, value)
+        return True
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return a stored result."""
+        found_key, value = self._found
+        self._found = (_MISSING, _MISSING)
+        if found_key is not key:
+            value = self._load(key)
+            if value is _MISSING:
+                raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store a result, unless it is already stored or there is no room."""
+        if type(value) is Failure and not self.cache_exceptions:
+            return
+
+        data, buffers = _dumps(value)
+        name = bytes.fromhex(digest(key))
+        with self._locked():
+            slot, found = self._find(name)
+            if slot is None or found:
+                return
+
+            offset, length = self._write(data, buffers)
+            if offset:
+                # the digest is written last, so readers only see whole slots
+                _SLOT.pack_into(self._mmap, slot, _EMPTY, offset, length)
+                self._mmap[slot : slot + len(name)] = name
+
+    def close(self) -> None:
+        """Unmap the file, values read from it must no longer be in use."""
+        self._mmap.close()
+        os.close(self._fd)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the lock that writers take on the file."""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(self, name: bytes) -> Tuple[Optional[int], bool]:
+        """Find the slot holding a digest, or the empty slot it would go in."""
+        start = int.from_bytes(name[:8], "little") % self.slots
+        for index in range(self.slots):
+            slot = _HEADER.size + _SLOT.size * ((start + index) % self.slots)
+            stored = self._mmap[slot : slot + len(name)]
+            if stored == name:
+                return slot, True
+            if stored == _EMPTY:
+                return slot, False
+        return None, False
+
+    def _write(self, data: bytes, buffers: List[memoryview]) -> Tuple[int, int]:
+        """Append a record to the arena, returning zero if there is no room."""
+        used = _HEADER.unpack_from(self._mmap)[3]
+        offset = self._arena + used
+        position = offset + _RECORD.size + 8 * len(buffers) + len(data)
+        for buffer in buffers:
+            position = _align(position) + buffer.nbytes
+        if position > self._arena + self.size:
+            return 0, 0
+
+        _RECORD.pack_into(self._mmap, offset, len(data), len(buffers))
+        position = offset + _RECORD.size
+        for buffer in buffers:
+            struct.pack_into("<Q", self._mmap, position, buffer.nbytes)
+            position += 8
+        self._mmap[position : position + len(data)] = data
+        position += len(data)
+        for buffer in buffers:
+            position = _align(position)
+            self._mmap[position : position + buffer.nbytes] = buffer
+            position += buffer.nbytes
+
+        _HEADER.pack_into(
+            self._mmap, 0, _MAGIC, self.slots, self.size, position - self._arena
+        )
+        return offset, position - offset
+
+    def _load(self, key: CallKey) -> Any:
+        """Find a stored result for a key."""
+        slot, found = self._find(bytes.fromhex(digest(key)))
+        if slot is None or not found:
+            return _MISSING
+
+        _, offset, _ = _SLOT.unpack_from(self._mmap, slot)
+        length, count = _RECORD.unpack_from(self._mmap, offset)
+        position = offset + _RECORD.size
+        sizes = struct.unpack_from(f"<{count}Q", self._mmap, position)
+        position += 8 * count
+
+        # unpickle from the map in place, rather than copying the pickle out
+        with memoryview(self._mmap) as view:
+            data = view[position : position + length]
+            position += length
+            buffers = []
+            for size in sizes:
+                position = _align(position)
+                buffers.append(view[position : position + size])
+                position += size
+            try:
+                return _loads(data, buffers)
+            finally:
+                data.release()
@@ -0,0 +1,102 @@
+"""Make each call once, when several threads make it at the same time."""
+import threading
+from concurrent.futures import Future
+from concurrent.futures import wait
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from .typing import CallHandler
+from .typing import CallKey
+
+_MISSING = object()
+
+
+class _Joined(threading.local):
+    """Results a thread has waited for, until it retrieves them."""
+
+    def __init__(self) -> None:
+        """Start each thread with no results."""
+        self.values: Dict[CallKey, Any] = dict()
+
+
+class SingleFlightHandler:
+    """Wrap a handler so that concurrent identical calls are made only once.
+
+    The first thread to miss a call makes it, any other thread that makes
+    the same call before it finishes waits for the result instead, which
+    includes a failure. The wrapped handler should be safe to use from many
+    threads, such as a dict or cache, rather than one with a call stack.
+
+    If the first thread is interrupted by something other than an
+    `Exception` it never stores a result. Making the call again from that
+    thread goes straight through to make it, as does a call it makes to
+    itself, and other threads wait at most `timeout` seconds before taking
+    over the call.
+
+    Example:
+        >>> handler = SingleFlightHandler(dict())
+        >>> "a" in handler
+        False
+        >>> handler["a"] = 1
+        >>> "a" in handler
+        True
+        >>> handler["a"]
+        1
+    """
+
+    def __init__(self, handler: CallHandler, timeout: Optional[float] = None) -> None:
+        """Wrap a handler.
+
+        Args:
+            handler: the handler to check and store calls with
+            timeout: the seconds to wait for a call in progress, by default
+                as long as it takes
+        """
+        self.handler = handler
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # the thread making each call, and the future of its result
+        self._in_flight: Dict[CallKey, Tuple[int, "Future[Any]"]] = dict()
+        self._joined = _Joined()
+
+    def __contains__(self, key: CallKey) -> bool:
+        """Check the handler, or wait for a call already in progress."""
+        with self._lock:
+            if key in self.handler:
+                return True
+
+            flight = self._in_flight.get(key)
+            if flight is None:
+                self._in_flight[key] = (threading.get_ident(), Future())
+                return False
+
+            owner, future = flight
+            if owner == threading.get_ident():
+                return False
+
+        wait([future], self.timeout)
+        with self._lock:
+            if not future.done():
+                # the thread making the call may have been interrupted
+                self._in_flight[key] = (threading.get_ident(), future)
+                return False
+
+        self._joined.values[key] = future.result()
+        return True
+
+    def __getitem__(self, key: CallKey) -> Any:
+        """Return the result waited for, or from the handler."""
+        value = self._joined.values.pop(key, _MISSING)
+        if value is _MISSING:
+            return self.handler[key]
+        return value
+
+    def __setitem__(self, key: CallKey, value: Any) -> None:
+        """Store the result, and pass it to any threads waiting for it."""
+        with self._lock:
+            self.handler[key] = value
+            flight = self._in_flight.pop(key, None)
+            if flight is not None:
+                flight[1].set_result(value)
@@ -0,0 +1,303 @@
+"""Save a recorded graph to a file, and load it back through `mmap`.
+
+The file holds the functions called once each, with an array of the
+function of each call and a pickle of the arguments of the calls. The edges
+between calls are arrays of offsets and call numbers, with the children of
+each call in the order it made them, and the values of calls a blob of
+pickles with an array of their offsets. Loading maps the
+file and builds the calls' keys to number them again, then reads edges and
+values from the map only when they are looked up, so a large graph is
+ready to bump at once.
+"""
+import mmap
+import os
+import pickle  # noqa: S403
+import struct
+import sys
+from array import array
+from typing import AbstractSet
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+from .graph import _ABSENT
+from .graph import _MISSING
+from .graph import _NO_EDGES
+from .graph import GraphHandler
+from .interning import KeyTable
+from .key_type import _find_key_type
+from .key_type import key_new
+from .typing import CallKey
+
+_MAGIC = b"snapshot"
+# magic, format version and the number of calls, followed by the offset
+# and length of each section
+_HEADER = struct.Struct("<8sQQ")
+_SECTION = struct.Struct("<QQ")
+_VERSION = 2
+
+# functions, the function and arguments of each call, children offsets
+# and calls, parents offsets and calls, dirty calls, value offsets and values
+_SECTIONS = 10
+
+# arrays are aligned to their item size, so can be cast from the map
+_ALIGN = 8
+
+
+def _offsets(edges: Sequence[Sequence[int]]) -> "array[int]":
+    """Return where each call's edges start, and where the last ends."""
+    offsets = array("Q", [0])
+    total = 0
+    for nodes in edges:
+        total += len(nodes)
+        offsets.append(total)
+    return offsets
+
+
+def _little(values: "array[int]") -> bytes:
+    """Return the bytes of an array, in little endian order."""
+    if sys.byteorder == "big":  # pragma: no cover
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def save(graph: GraphHandler, path: Union[str, "os.PathLike[str]"]) -> None:
+    """Write the calls recorded by a graph handler, through all its forks.
+
+    Functions are saved by name, to be imported again when the file is
+    loaded, so must be defined at the top level of a module.
+
+    Args:
+        graph: the graph handler to save
+        path: the file to write
+
+    Raises:
+        ValueError: if a call is of a function defined within another
+    """
+    table = graph._table
+    count = len(table)
+
+    dirty = sorted(graph._dirty)
+    children = [
+        graph._dirty[node] if node in graph._dirty else graph._ordered(node)
+        for node in range(count)
+    ]
+    parents = [sorted(graph._edges("_parents", node)) for node in range(count)]
+
+    blob = bytearray()
+    values = array("Q", [0])
+    for node in range(count):
+        value = graph._value(node)
+        if value is not _MISSING:
+            blob += pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        values.append(len(blob))
+
+    # keys are saved by their function, and the arguments of the call
+    functions: Dict[Tuple[str, str], int] = {}
+    calls = array("I")
+    arguments = []
+    for node in range(count):
+        key: Any = table.key(node)
+        func = key[-1]
+        if "<locals>" in func.__qualname__:
+            name = f"{func.__module__}.{func.__qualname__}"
+            raise ValueError(f"can't save a call of {name}, which isn't importable")
+        calls.append(
+            functions.setdefault((func.__module__, func.__qualname__), len(functions))
+        )
+        arguments.append(tuple(key[:-1]))
+
+    sections = [
+        pickle.dumps(list(functions), pickle.HIGHEST_PROTOCOL),
+        _little(calls),
+        pickle.dumps(arguments, pickle.HIGHEST_PROTOCOL),
+        _little(_offsets(children)),
+        _little(array("I", [child for nodes in children for child in nodes])),
+        _little(_offsets(parents)),
+        _little(array("I", [parent for nodes in parents for parent in nodes])),
+        _little(array("I", dirty)),
+        _little(values),
+        bytes(blob),
+    ]
+
+    header = _HEADER.pack(_MAGIC, _VERSION, count)
+    offset = len(header) + _SECTION.size * _SECTIONS
+    layout = []
+    for section in sections:
+        offset = -(-offset // _ALIGN) * _ALIGN
+        layout.append((offset, len(section)))
+        offset += len(section)
+
+    with open(path, "wb") as f:
+        f.write(header)
+        for position in layout:
+            f.write(_SECTION.pack(*position))
+        for (start, _), section in zip(layout, sections):
+            f.write(bytes(start - f.tell()))
+            f.write(section)
+
+
+class _Edges(Dict[int, Any]):
+    """Read the edges of calls from the map, when they are looked up."""
+
+    def __init__(
+        self,
+        offsets: memoryview,
+        nodes: memoryview,
+        dirty: AbstractSet[int],
+        collect: Callable[[Iterable[int]], Any],
+    ) -> None:
+        """Read edges from arrays of offsets and call numbers.
+
+        Args:
+            offsets: where the edges of each call start, and the last ends
+            nodes: the calls at the other end of the edges
+            dirty: the calls whose saved edges are only kept to invalidate
+            collect: make the edges of a call from the calls at their ends
+        """
+        super().__init__()
+        self._offsets = offsets
+        self._nodes = nodes
+        self._dirty = dirty
+        self._collect = collect
+
+    def saved(self, node: int) -> Any:
+        """Return the edges of a call saved in the map."""
+        return self._collect(self._nodes[self._offsets[node] : self._offsets[node + 1]])
+
+    def get(self, node: int, default: Any = None) -> Any:
+        """Return the edges of a call, or the default for a new call."""
+        edges = super().get(node)
+        if edges is None:
+            if node >= len(self._offsets) - 1:
+                return default
+            # dirty calls have no edges until they are called again
+            edges = self[node] = (
+                self._collect(()) if node in self._dirty else self.saved(node)
+            )
+        return edges
+
+
+class _Values(Dict[int, Any]):
+    """Unpickle the values of calls from the map, when they are looked up."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview) -> None:
+        """Read values from an array of offsets into a blob of pickles.
+
+        Args:
+            offsets: where the value of each call starts, and the last ends
+            blob: the pickled values, empty for calls without one
+        """
+        super().__init__()
+        self._offsets = offsets
+        self._blob = blob
+
+    def get(self, node: int, default: Any = None) -> Any:
+        """Return the value of a call, or the default if it has none."""
+        value = super().get(node, _ABSENT)
+        if value is not _ABSENT:
+            return value
+        if node >= len(self._offsets) - 1:
+            return default
+
+        start, end = self._offsets[node], self._offsets[node + 1]
+        if start == end:
+            return default
+        value = self[node] = pickle.loads(self._blob[start:end])  # noqa: S301
+        return value
+
+
+def _keys(
+    functions: List[Tuple[str, str]], calls: Sequence[int], arguments: List[Any]
+) -> Iterator[CallKey]:
+    """Build the keys of calls, finding each function once."""
+    key_types = [_find_key_type(*names) for names in functions]
+    news = [key_new(key_type) for key_type in key_types]
+    for call, values in zip(calls, arguments):
+        key_type = key_types[call]
+        yield news[call](key_type, values + (key_type.__func__,))  # type: ignore
+
+
+def _array(data: memoryview, typecode: str) -> memoryview:
+    """View little endian bytes of the map as an array."""
+    if sys.byteorder == "big":  # pragma: no cover
+        values = array(typecode, data)
+        values.byteswap()
+        return memoryview(values)
+    return data.cast("Q") if typecode == "Q" else data.cast("I")
+
+
+def load(
+    path: Union[str, "os.PathLike[str]"],
+    equal: Optional[Callable[[Any, Any], bool]] = None,
+) -> GraphHandler:
+    """Map a saved graph, and fork a handler from it to record and bump.
+
+    The functions of the saved calls are imported to unpickle their keys,
+    and values are only unpickled when they are first looked up. The map
+    stays open while any handler reads through to it.
+
+    Args:
+        path: the file written by `save`
+        equal: compare values to cut off recalculation, as `GraphHandler`
+
+    Returns:
+        a fork of the saved graph
+
+    Raises:
+        ValueError: if the file isn't a snapshot written by `save`
+    """
+    with open(path, "rb") as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    if data[: len(_MAGIC)] != _MAGIC or len(data) < _HEADER.size:
+        raise ValueError(f"{os.fspath(path)!r} is not a graph snapshot")
+    _, version, _ = _HEADER.unpack_from(data)
+    if version != _VERSION:
+        raise ValueError(f"{os.fspath(path)!r} is version {version} of snapshots")
+
+    sections: List[memoryview] = []
+    for index in range(_SECTIONS):
+        start, length = _SECTION.unpack_from(data, _HEADER.size + index * _SECTION.size)
+        sections.append(data[start : start + length])
+    (
+        functions,
+        calls,
+        arguments,
+        children,
+        child_nodes,
+        parents,
+        parent_nodes,
+        dirty,
+        offsets,
+        blob,
+    ) = sections
+
+    dirty_nodes = frozenset(_array(dirty, "I"))
+    child_offsets, child_nodes = _array(children, "Q"), _array(child_nodes, "I")
+    child_edges = _Edges(child_offsets, child_nodes, dirty_nodes, frozenset)
+    child_calls = _Edges(child_offsets, child_nodes, dirty_nodes, tuple)
+    parent_edges = _Edges(
+        _array(parents, "Q"), _array(parent_nodes, "I"), _NO_EDGES, frozenset
+    )
+
+    names = pickle.loads(functions)  # noqa: S301
+    args = pickle.loads(arguments)  # noqa: S301
+
+    # the saved graph is the base layer, read through to by its forks
+    graph = GraphHandler(equal=equal)
+    graph._table = KeyTable.from_keys(_keys(names, _array(calls, "I"), args))
+    graph._values = _Values(_array(offsets, "Q"), blob)
+    graph._children = child_edges
+    graph._parents = parent_edges
+    graph._calls = child_calls
+    graph._dirty = {node: child_calls.saved(node) for node in dirty_nodes}
+    return graph.fork()
@@ -0,0 +1,302 @@
+"""Implementation of call tracker by rewriting the function's syntax tree.
+
+The check and store of the handler are inlined into the function itself,
+with the body wrapped to store its value once it returns, so a shifted call
+doesn't add a frame to the stack. The function is compiled again from its source, with
+the same globals, defaults and closure, and with its body repeated
+unchanged for when no context is entered.
+"""
+import ast
+import copy
+import functools
+import inspect
+import textwrap
+import types
+from typing import Any
+from typing import Callable
+from typing import cast
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from .batch import batch
+from .context import _handlers
+from .context import _null_stack
+from .failure import Failure
+from .key_type import _PREFIX
+from .key_type import make_key_type
+from .key_type import signature_source
+from .typing import F
+
+_PROLOGUE = """\
+{p}stack = {p}get_stack()
+if {p}stack is not {p}null_stack:
+    {p}handler = {p}stack[0]
+    {p}key = {p}new({p}key_type, ({values}{p}func,))
+
+    if {p}key in {p}handler:
+        {p}value = {p}handler[{p}key]
+        if {p}type({p}value) is {p}Failure:
+            raise {p}value.error()
+
+        return {p}value
+
+    # the value is stored once, after any finally or with blocks it
+    # returns through have run, and only if none of them raised
+    {p}retval = {p}unset
+    try:
+        pass
+        {p}retval = None
+    except {p}Exception as {p}exc:
+        {p}retval = {p}unset
+        {p}handler[{p}key] = {p}failed({p}exc)
+        raise
+    except {p}BaseException:
+        {p}retval = {p}unset
+        raise
+    finally:
+        if {p}retval is not {p}unset:
+            {p}handler[{p}key] = {p}retval
+    return {p}retval
+"""
+
+_RETURN = """\
+{p}retval = None
+return {p}retval
+"""
+
+# the names the rewritten function refers to, as well as its own
+_NAMES = (
+    "get_stack",
+    "null_stack",
+    "new",
+    "key_type",
+    "func",
+    "type",
+    "Exception",
+    "BaseException",
+    "Failure",
+    "failed",
+    "unset",
+)
+
+# the value of a call that hasn't returned
+_UNSET = object()
+
+
+class _Returns(ast.NodeTransformer):
+    """Keep the value of each return of a function, to store in the handler."""
+
+    def visit_Return(self, node: ast.Return) -> Any:  # noqa: N802
+        """Replace a return with an assignment, and a return."""
+        statements = ast.parse(_RETURN.format(p=_PREFIX)).body
+        if node.value is not None:
+            statements[0].value = node.value  # type: ignore
+        for statement in statements:
+            for child in ast.walk(statement):
+                ast.copy_location(child, node)
+        return statements
+
+    def _skip(self, node: ast.AST) -> ast.AST:
+        """Leave the returns of nested functions and classes alone."""
+        return node
+
+    visit_FunctionDef = _skip  # noqa: N815
+    visit_AsyncFunctionDef = _skip  # noqa: N815
+    visit_ClassDef = _skip  # noqa: N815
+
+
+class _Declarations(ast.NodeTransformer):
+    """Collect the global and nonlocal declarations of a function.
+
+    The body of the function is repeated, and a name can't be declared
+    after it is used, so the declarations are moved to the start.
+    """
+
+    def __init__(self) -> None:
+        """Start with no declarations."""
+        self.declarations: List[ast.stmt] = []
+
+    def _collect(self, node: ast.stmt) -> ast.AST:
+        """Replace a declaration with a pass, so no block is left empty."""
+        self.declarations.append(node)
+        return ast.copy_location(ast.Pass(), node)
+
+    def _skip(self, node: ast.AST) -> ast.AST:
+        """Leave the declarations of nested functions and classes alone."""
+        return node
+
+    visit_Global = _collect  # noqa: N815
+    visit_Nonlocal = _collect  # noqa: N815
+    visit_FunctionDef = _skip  # noqa: N815
+    visit_AsyncFunctionDef = _skip  # noqa: N815
+    visit_ClassDef = _skip  # noqa: N815
+
+
+def _mangled(tree: ast.AST) -> bool:
+    """Check for private names, which a class body would have mangled."""
+    for node in ast.walk(tree):
+        name = getattr(node, "id", None) or getattr(node, "attr", None)
+        if isinstance(name, str) and name.startswith("__") and not name.endswith("__"):
+            return True
+    return False
+
+
+def _parse(func: Callable[..., Any]) -> Optional[ast.Module]:
+    """Parse the definition of a function, if it can be rewritten."""
+    if (
+        inspect.iscoroutinefunction(func)
+        or inspect.isgeneratorfunction(func)
+        or inspect.isasyncgenfunction(func)
+        # zero argument super needs the class cell the compiler makes
+        or "__class__" in func.__code__.co_freevars
+    ):
+        return None
+
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+
+    if len(tree.body) != 1:
+        return None
+    node = tree.body[0]
+    if not isinstance(node, ast.FunctionDef) or node.name != func.__name__:
+        return None
+
+    # functions defined in a class body refer to private names mangled
+    parts = func.__qualname__.split(".")
+    if len(parts) > 1 and parts[-2] != "<locals>" and _mangled(node):
+        return None
+
+    ast.increment_lineno(tree, func.__code__.co_firstlineno - 1)
+    return tree
+
+
+def _strip(node: ast.FunctionDef) -> None:
+    """Remove the decorators, and the defaults and annotations to evaluate.
+
+    The defaults and annotations of the original function are used instead.
+
+    Args:
+        node: the definition of the function, modified in place
+    """
+    args = node.args
+    args.defaults = [ast.Constant(None) for _ in args.defaults]
+    args.kw_defaults = [
+        None if default is None else ast.Constant(None) for default in args.kw_defaults
+    ]
+    params = args.args + args.kwonlyargs + getattr(args, "posonlyargs", [])
+    for arg in params + [args.vararg, args.kwarg]:
+        if arg is not None:
+            arg.annotation = None
+    node.returns = None
+    node.decorator_list = []
+
+
+def _rewrite(tree: ast.Module, values: str, freevars: Sequence[str]) -> ast.Module:
+    """Rewrite a function, and define it in a factory that binds its names."""
+    node = cast(ast.FunctionDef, tree.body[0])
+    _strip(node)
+
+    body = node.body
+    docstring: List[ast.stmt] = []
+    if ast.get_docstring(node, clean=False) is not None:
+        docstring, body = body[:1], body[1:]
+
+    declarations = _Declarations()
+    body = declarations.visit(ast.Module(body=body, type_ignores=[])).body
+
+    prologue = ast.parse(_PROLOGUE.format(p=_PREFIX, values=values)).body
+    for statement in prologue:
+        ast.increment_lineno(statement, node.lineno)
+    tracked = _Returns().visit(ast.Module(body=copy.deepcopy(body), type_ignores=[]))
+    handled = prologue[1].body[-2]  # type: ignore
+    handled.body[:1] = tracked.body
+    node.body = docstring + declarations.declarations + prologue + body
+
+    names = [_PREFIX + name for name in _NAMES] + list(freevars)
+    factory = ast.parse(f"def {_PREFIX}factory({', '.join(names)}):\n    pass\n")
+    factory.body[0].body = [  # type: ignore
+        node,
+        ast.Return(ast.Name(node.name, ast.Load())),
+    ]
+    return ast.fix_missing_locations(factory)
+
+
+def shift(func: F) -> F:
+    """Rewrite a function to make calls to a handler, without wrapping it.
+
+    Functions without source, generator and coroutine functions, methods
+    using zero argument `super` or private names, are wrapped by
+    `snake.shifter.wrapper.shift` instead.
+
+    Example:
+        >>> from snake.shifter import Context, key
+        >>> from snake.shifter.transform import shift
+        >>> def make():
+        ...     calls = []
+        ...     @shift
+        ...     def f(a, b=2):
+        ...         calls.append(a)
+        ...         return a + b
+        ...     return f, calls
+        >>> f, calls = make()
+        >>> with Context(dict()) as d:
+        ...     f(1), f(1)
+        (3, 3)
+        >>> calls, d[key(f, 1)]
+        ([1], 3)
+
+    Args:
+        func: the function to modify
+
+    Returns:
+        the modified function
+    """
+    from .wrapper import shift as shift_wrapper
+
+    tree = _parse(func)
+    if tree is None:
+        return shift_wrapper(func)
+
+    key_type = make_key_type(func)
+    source = signature_source(inspect.signature(func))
+    freevars = func.__code__.co_freevars
+
+    code = compile(
+        _rewrite(tree, source.values, freevars), func.__code__.co_filename, "exec"
+    )
+    (factory_code,) = (c for c in code.co_consts if isinstance(c, types.CodeType))
+    factory = types.FunctionType(factory_code, func.__globals__)
+    rewritten = factory(
+        _handlers.get,
+        _null_stack,
+        tuple.__new__,
+        key_type,
+        func,
+        type,
+        Exception,
+        BaseException,
+        Failure,
+        Failure.of,
+        _UNSET,
+        *[None] * len(freevars),
+    )
+
+    # share the cells of the original function, so nonlocal names are shared
+    cells = dict(zip(freevars, func.__closure__ or ()))
+    closure = tuple(
+        cells.get(name, cell)
+        for name, cell in zip(rewritten.__code__.co_freevars, rewritten.__closure__)
+    )
+    _func = types.FunctionType(
+        rewritten.__code__, func.__globals__, func.__name__, func.__defaults__, closure
+    )
+    _func.__kwdefaults__ = func.__kwdefaults__
+    functools.update_wrapper(_func, func)
+
+    _func.__key__ = key_type  # type: ignore
+    _func.batch = functools.partial(batch, _func)  # type: ignore
+
+    return cast(F, _func)
@@ -1,6 +1,10 @@
 """Base classes for core abstractions, typing."""
 from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Mapping
+from typing import Set
 from typing import TypeVar
 
 from typing_extensions import Protocol
@@ -34,6 +38,23 @@ class CallHandler(Protocol):
         ...
 
 
+@runtime_checkable
+class BulkCallHandler(CallHandler, Protocol):
+    """Handler that can also check, retrieve and store many calls at once."""
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Return the calls that have stored values."""
+        ...
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Return the stored values of the calls that have them."""
+        ...
+
+    def set_many(self, values: Mapping[CallKey, Any]) -> None:
+        """Set the returned values for many calls made together."""
+        ...
+
+
 F = TypeVar("F", bound=Callable[..., Any])
 
 
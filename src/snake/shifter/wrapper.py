@@ -4,41 +4,95 @@ This a reference implementation to make it clear how the
 handler interacts with the function and to provide a
 benchmark implementation to test the other approaches against.
 """
+import asyncio
 import functools
+import inspect
 from typing import Any
 from typing import Callable
 from typing import cast
+from typing import Dict
+from typing import Optional
+from typing import overload
+from typing import Tuple
 from typing import TypeVar
+from weakref import WeakKeyDictionary
 
-from .key_type import make_key_type
+from .batch import batch
+from .context import get_handler
+from .failure import Failure
+from .key_type import call_args
+from .key_type import LazyKeyType
+from .typing import CallKey
 
 F = TypeVar("F", bound=Callable[..., Any])
 
+# coroutine calls in progress in each event loop, by handler identity and key
+_in_flight: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[int, CallKey], asyncio.Future[Any]]]" = (  # noqa: B950
+    WeakKeyDictionary()
+)
 
-def shift(func: F) -> F:
+
+@overload
+def shift(func: F, *, compact: bool = False) -> F:
+    ...  # pragma: no cover
+
+
+@overload
+def shift(*, compact: bool = False) -> Callable[[F], F]:
+    ...  # pragma: no cover
+
+
+def shift(func: Optional[F] = None, *, compact: bool = False) -> Any:
     """Wrap a function with calls to a handler to modify it's behaviour.
 
+    The key type of the function is built when the first key is made.
+
+    Example:
+        >>> from snake.shifter import key
+        >>> @shift(compact=True)
+        ... def f(a, b=2):
+        ...     return a + b
+        >>> key(f, 1).b, key(f, 1).__slots__
+        (2, ())
+
     Args:
-        func: the function to modify
+        func: the function to modify, or none to return a decorator
+        compact: make keys with a cached hash, that subclass `CompactKey`
 
     Returns:
         the modified function
     """
-    key_type = make_key_type(func)
+    if func is None:
+        return functools.partial(shift, compact=compact)
+
+    key_type = LazyKeyType(func, compact)
+
+    if inspect.iscoroutinefunction(func):
+        return cast(F, _shift_coroutine(func, key_type))
 
-    # import the global context handler stack here, which we bind into the wrapper
-    from .context import Context
+    # bind the lookup of the context local handler stack into the wrapper
+    from .context import _handlers
+    from .context import _null_stack
+
+    get_stack = _handlers.get
 
     @functools.wraps(func)
     def _func(*args: Any, **kwargs: Any) -> Any:
-        handler = Context._handlers[-1]
+        stack = get_stack()
+
+        # with no context entered the null handler would ignore the call,
+        # so skip building a key and call straight through.
+        if stack is _null_stack:
+            return func(*args, **kwargs)
+
+        handler = stack[0]
 
         key = key_type.from_call(*args, **kwargs)
 
         if key in handler:
             value = handler[key]
-            if type(value) is Exception:
-                raise value.args[0] from value.args[0]
+            if type(value) is Failure:
+                raise value.error()
 
             return value
         try:
@@ -46,9 +100,146 @@ def shift(func: F) -> F:
             handler[key] = retval
             return retval
         except Exception as exc:
-            handler[key] = Exception(exc)
+            handler[key] = Failure.of(exc)
             raise
 
     _func.__key__ = key_type  # type: ignore
+    _func.batch = functools.partial(batch, _func)  # type: ignore
 
     return cast(F, _func)
+
+
+async def _join(handler: Any, key: CallKey, future: "asyncio.Future[Any]") -> Any:
+    """Wait for a call in progress in another task, and store its result.
+
+    Args:
+        handler: the handler to store the result on
+        key: the call in progress
+        future: resolved with the result of the call when it finishes
+
+    Returns:
+        the result of the call, or the future itself if the call was cancelled
+
+    Raises:
+        asyncio.CancelledError: if this task is cancelled while waiting
+        Exception: the exception raised by the call
+
+    # noqa: DAR402 Exception
+    """
+    try:
+        retval = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if future.cancelled():
+            return future
+        raise
+    except Exception as exc:
+        handler[key] = Failure.of(exc)
+        raise
+
+    handler[key] = retval
+    return retval
+
+
+def _shift_coroutine(func: Callable[..., Any], key_type: LazyKeyType) -> Any:
+    """Wrap a coroutine function, caching the awaited result.
+
+    Tasks that make the same call while it is in progress wait for it to
+    finish rather than making it again. Each still completes the call on
+    the handler, storing the shared result.
+
+    Args:
+        func: the coroutine function to wrap
+        key_type: builds the keys of calls to the function
+
+    Returns:
+        the wrapped coroutine function
+    """
+    from .context import _handlers
+    from .context import _null_stack
+
+    get_stack = _handlers.get
+
+    @functools.wraps(func)
+    async def _func(*args: Any, **kwargs: Any) -> Any:
+        stack = get_stack()
+        if stack is _null_stack:
+            return await func(*args, **kwargs)
+
+        handler = stack[0]
+
+        key = key_type.from_call(*args, **kwargs)
+
+        if key in handler:
+            value = handler[key]
+            if type(value) is Failure:
+                raise value.error()
+
+            return value
+
+        loop = asyncio.get_running_loop()
+        in_flight = _in_flight.setdefault(loop, {})
+        flight = (id(handler), key)
+
+        # join a call in progress, unless it is cancelled before it finishes
+        future: Optional["asyncio.Future[Any]"] = in_flight.get(flight)
+        while future is not None:
+            retval = await _join(handler, key, future)
+            if retval is not future:
+                return retval
+            future = in_flight.get(flight)
+
+        future = in_flight[flight] = loop.create_future()
+        try:
+            retval = await func(*args, **kwargs)
+            handler[key] = retval
+            future.set_result(retval)
+            return retval
+        except asyncio.CancelledError:
+            # an Exception before python 3.8, but cancelling isn't a result
+            raise
+        except Exception as exc:
+            handler[key] = Failure.of(exc)
+            future.set_exception(exc)
+            # there may be nobody waiting, so mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            del in_flight[flight]
+            future.cancel()
+
+    _func.__key__ = key_type  # type: ignore
+
+    return _func
+
+
+def call(key: CallKey) -> Any:
+    """Make the call a key represents, through the active handler.
+
+    Args:
+        key: the call to make
+
+    Returns:
+        the value returned by the handler or the function
+
+    Raises:
+        Exception: the exception raised by the function, or cached by the handler
+
+    # noqa: DAR401 error
+    """
+    handler = get_handler()
+
+    if key in handler:
+        value = handler[key]
+        if type(value) is Failure:
+            raise value.error()
+
+        return value
+
+    args, kwargs = call_args(key)
+    try:
+        retval = key.func__(*args, **kwargs)  # type: ignore
+        handler[key] = retval
+        return retval
+    except Exception as exc:
+        handler[key] = Failure.of(exc)
+        raise
@@ -9,13 +9,20 @@ from rich.console import Console  # type: ignore
 
 def pytest_generate_tests(metafunc: Metafunc) -> None:
     """Map decorator fixture to list of decorators to test."""
+    import snake.shifter.codegen
+    import snake.shifter.transform
     import snake.shifter.wrapper
 
-    decorators = [snake.shifter.wrapper.shift]
+    decorators = {
+        "snake.shifter.wrapper": snake.shifter.wrapper.shift,
+        "snake.shifter.wrapper-compact": snake.shifter.wrapper.shift(compact=True),
+        "snake.shifter.codegen": snake.shifter.codegen.shift,
+        "snake.shifter.transform": snake.shifter.transform.shift,
+    }
 
     if "decorator" in metafunc.fixturenames:
         metafunc.parametrize(
-            "decorator", decorators, ids=[d.__module__ for d in decorators]
+            "decorator", list(decorators.values()), ids=list(decorators)
         )
 
 
@@ -0,0 +1,170 @@
+"""Check coroutine functions are shifted on their awaited results."""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Awaitable
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.failure import Failure
+from snake.shifter.typing import Decorator
+
+
+def _run_apart(main: Awaitable[Any]) -> Any:
+    """Run a coroutine in another thread, with the handlers of this one.
+
+    Cancelling a task throws into the coroutines it awaits, and python 3.11
+    resumes the outer ones without a call event, so coverage loses its place
+    in the frames running the loop. Those frames are kept to another thread.
+
+    Args:
+        main: the coroutine to run
+
+    Returns:
+        the result of the coroutine
+    """
+    with ThreadPoolExecutor(1) as pool:
+        run = contextvars.copy_context().run
+        return pool.submit(run, asyncio.run, main).result()
+
+
+def test_async_func(decorator: Decorator) -> None:
+    """Check the awaited value is cached, rather than the coroutine."""
+    calls = 0
+
+    @decorator
+    async def f(a: int, b: int) -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return a + b
+
+    assert asyncio.iscoroutinefunction(f)
+
+    async def main() -> List[int]:
+        return [await f(1, 2), await f(1, 2)]
+
+    assert asyncio.run(main()) == [3, 3]
+    assert calls == 2
+
+    with Context(dict()) as d:
+        assert asyncio.run(main()) == [3, 3]
+
+    assert calls == 3
+    assert d[key(f, 1, 2)] == 3
+
+
+def test_async_failing_func(decorator: Decorator) -> None:
+    """Check a failure is cached, and raised again."""
+    exception = RuntimeError("failure")
+    calls = 0
+
+    @decorator
+    async def f(a: int) -> int:
+        nonlocal calls
+        calls += 1
+        raise exception
+
+    async def main() -> None:
+        for _ in range(2):
+            with pytest.raises(RuntimeError) as info:
+                await f(1)
+            assert info.value is exception
+
+    with Context(dict()) as d:
+        asyncio.run(main())
+
+    assert calls == 1
+    assert type(d[key(f, 1)]) is Failure
+    assert d[key(f, 1)].exception is exception
+
+
+def test_async_in_flight(decorator: Decorator) -> None:
+    """Check concurrent tasks making the same call share one execution."""
+    calls = 0
+
+    @decorator
+    async def fetch(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    @decorator
+    async def total(x: int) -> int:
+        values = await asyncio.gather(fetch(x), fetch(x), fetch(x + 1))
+        return sum(values)
+
+    with Context(dict()) as d:
+        assert asyncio.run(total(1)) == 8
+
+    assert calls == 2
+    assert d == {key(fetch, 1): 2, key(fetch, 2): 4, key(total, 1): 8}
+
+    async def fail(x: int) -> Any:
+        await asyncio.sleep(0.01)
+        raise RuntimeError(x)
+
+    @decorator
+    async def failing(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        return await fail(x)  # type: ignore
+
+    async def main() -> List[Any]:
+        return await asyncio.gather(failing(1), failing(1), return_exceptions=True)
+
+    with Context(dict()):
+        first, second = asyncio.run(main())
+
+    assert calls == 3
+    assert type(first) is RuntimeError
+    assert first is second
+
+
+def test_async_in_flight_cancelled(decorator: Decorator) -> None:
+    """Check a waiting task makes the call itself if the first is cancelled."""
+    calls = 0
+
+    @decorator
+    async def fetch(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def main() -> int:
+        first = asyncio.ensure_future(fetch(1))
+        second = asyncio.ensure_future(fetch(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    async def cancel_waiter() -> int:
+        first = asyncio.ensure_future(fetch(2))
+        second = asyncio.ensure_future(fetch(2))
+        await asyncio.sleep(0)
+        second.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        return await first
+
+    async def cancel_alone() -> None:
+        only = asyncio.ensure_future(fetch(3))
+        await asyncio.sleep(0)
+        only.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await only
+
+    with Context(dict()) as handler:
+        assert _run_apart(main()) == 2
+        assert _run_apart(cancel_waiter()) == 4
+        _run_apart(cancel_alone())
+
+    # cancelled calls store nothing, to be made again by later callers
+    assert list(handler.values()) == [2, 4]
+    assert calls == 4
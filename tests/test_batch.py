@@ -0,0 +1,134 @@
+"""Check calls can be made for columns of arguments at once."""
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Sequence
+from typing import Set
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.batch import vectorize
+from snake.shifter.typing import CallKey
+
+
+class BulkDict(Dict[CallKey, Any]):
+    """A dict with bulk methods, that records how it is used."""
+
+    def __init__(self) -> None:
+        """Start with no lookups."""
+        self.lookups: List[List[CallKey]] = []
+
+    def contains_many(self, keys: Iterable[CallKey]) -> Set[CallKey]:
+        """Check many keys at once."""
+        return set(self.get_many(keys))
+
+    def get_many(self, keys: Iterable[CallKey]) -> Dict[CallKey, Any]:
+        """Look up many keys at once."""
+        keys = list(keys)
+        self.lookups.append(keys)
+        return {key: self[key] for key in keys if key in self}
+
+    def set_many(self, values: Dict[CallKey, Any]) -> None:
+        """Store many values at once."""
+        self.update(values)
+
+
+def test_batch() -> None:
+    """Check a batch is the same as making each call."""
+    calls = []
+
+    @shift
+    def f(a: int, b: int = 0) -> int:
+        calls.append(a)
+        return a + b
+
+    assert f.batch([1, 2], [3, 4]) == [4, 6]  # type: ignore
+    assert f.batch([1, 2], b=[3, 4]) == [4, 6]  # type: ignore
+    assert f.batch(a=[1, 2]) == [1, 2]  # type: ignore
+
+    with Context(dict()) as d:
+        assert f.batch([1, 2, 1]) == [1, 2, 1]  # type: ignore
+    assert d == {key(f, 1): 1, key(f, 2): 2}
+
+    with pytest.raises(ValueError):
+        f.batch([1, 2], [3])  # type: ignore
+
+
+def test_batch_bulk() -> None:
+    """Check a handler with bulk methods is asked for all the keys at once."""
+    calls = []
+
+    @shift
+    def f(a: int, b: int = 0) -> int:
+        if a < 0:
+            raise ValueError(a)
+        calls.append(a)
+        return a + b
+
+    with Context(BulkDict()) as d:
+        assert f(1) == 1
+        assert f.batch([1, 2, 2, 3]) == [1, 2, 2, 3]  # type: ignore
+        with pytest.raises(ValueError):
+            f.batch([-1])  # type: ignore
+        with pytest.raises(ValueError):
+            f.batch([-1])  # type: ignore
+
+    assert calls == [1, 2, 3]
+    assert d.lookups[0] == [key(f, 1), key(f, 2), key(f, 2), key(f, 3)]
+    assert d.contains_many([key(f, 1), key(f, 4)]) == {key(f, 1)}
+
+
+def test_batch_vectorized() -> None:
+    """Check the missing calls are made at once by a vectorized implementation."""
+    calls = []
+
+    @shift
+    def f(a: int, b: int = 0) -> int:
+        return a + b
+
+    @vectorize(f)
+    def f_many(a: Sequence[int], b: Sequence[int] = (0,)) -> List[int]:
+        calls.append(list(a))
+        return [x + y for x, y in zip(a, b * len(a) if len(b) == 1 else b)]
+
+    assert f.batch([1, 2], [3, 4]) == [4, 6]  # type: ignore
+    assert calls == [[1, 2]]
+
+    with Context(BulkDict()) as d:
+        d[key(f, 2, 0)] = 2
+        assert f.batch([1, 2, 3, 3], b=[0, 0, 0, 0]) == [1, 2, 3, 3]  # type: ignore
+        assert f.batch([1, 2], b=[0, 0]) == [1, 2]  # type: ignore
+
+    assert d[key(f, 3)] == 3
+
+    # single calls are made by the function, not the vectorized implementation
+    assert f(1, b=2) == 3
+    assert calls == [[1, 2], [1, 3]]
+
+
+def test_batch_dict() -> None:
+    """Check the missing calls of a batch on a dict are made at once."""
+    calls = []
+
+    @shift
+    def f(a: int) -> int:
+        calls.append(("single", a))
+        return a
+
+    @vectorize(f)
+    def f_many(a: Sequence[int]) -> List[int]:
+        calls.append(("many", list(a)))
+        return list(a)
+
+    with Context(dict()) as d:
+        d[key(f, 2)] = 2
+        assert f.batch([1, 2, 3]) == [1, 2, 3]  # type: ignore
+        assert f(4) == 4
+
+    # single calls are still made by the function itself
+    assert calls == [("many", [1, 3]), ("single", 4)]
+    assert d == {key(f, x): x for x in range(1, 5)}
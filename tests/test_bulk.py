@@ -0,0 +1,40 @@
+"""Check many calls can be checked, retrieved and stored on any handler."""
+from typing import Any
+from typing import Dict
+
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.bulk import contains_many
+from snake.shifter.bulk import get_many
+from snake.shifter.bulk import set_many
+from snake.shifter.cache import CacheHandler
+from snake.shifter.typing import BulkCallHandler
+from snake.shifter.typing import CallKey
+
+
+@shift
+def f(x: int) -> int:  # pragma: no cover
+    """Identity, for keys."""
+    return x
+
+
+def test_bulk_fallback() -> None:
+    """Check handlers without bulk methods have each call handled in turn."""
+    handler: Dict[CallKey, Any] = dict()
+    assert not isinstance(handler, BulkCallHandler)
+
+    set_many(handler, {key(f, 1): 1, key(f, 2): 2})
+    assert handler == {key(f, 1): 1, key(f, 2): 2}
+    assert contains_many(handler, [key(f, 1), key(f, 3)]) == {key(f, 1)}
+    assert get_many(handler, [key(f, 2), key(f, 3)]) == {key(f, 2): 2}
+
+
+def test_bulk_handler() -> None:
+    """Check handlers with bulk methods are used directly."""
+    handler = CacheHandler()
+    assert isinstance(handler, BulkCallHandler)
+
+    set_many(handler, {key(f, 1): 1, key(f, 2): 2})
+    assert contains_many(handler, [key(f, 1), key(f, 3)]) == {key(f, 1)}
+    assert get_many(handler, [key(f, 2), key(f, 3)]) == {key(f, 2): 2}
+    assert (handler.hits, handler.misses) == (2, 2)
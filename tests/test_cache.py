@@ -0,0 +1,161 @@
+"""Check the bounded caching handlers."""
+from typing import Type
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.cache import CacheHandler
+from snake.shifter.cache import LFUCacheHandler
+from snake.shifter.failure import Failure
+from snake.shifter.typing import Decorator
+
+
+@pytest.mark.parametrize(
+    "cache_type, expected_calls", [(CacheHandler, 11), (LFUCacheHandler, 57)]
+)
+def test_cache_fib(
+    decorator: Decorator, cache_type: Type[CacheHandler], expected_calls: int
+) -> None:
+    """Check a bounded cache still memoizes recursive calls."""
+    calls = 0
+
+    @decorator
+    def fib(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(cache_type(max_entries=3)) as cache:
+        assert fib(10) == 89
+        assert calls == expected_calls
+        assert len(cache) == 3
+        assert cache.misses == expected_calls
+        assert cache.evictions == expected_calls - 3
+
+        # the most recent call is always kept
+        assert fib(10) == 89
+        assert calls == expected_calls
+        assert key(fib, 10) in cache
+
+
+def test_lru_eviction() -> None:
+    """Check the least recently used entry is evicted first."""
+    cache = CacheHandler(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert "a" in cache
+    cache["c"] = 3
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+
+    # replacing an entry counts as a use, and doesn't evict
+    cache["a"] = 4
+    cache["d"] = 5
+    assert "c" not in cache
+    assert cache["a"] == 4
+
+
+def test_lfu_eviction() -> None:
+    """Check the least frequently used entry is evicted first."""
+    cache = LFUCacheHandler(max_entries=3)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache["c"] = 3
+    for _ in range(3):
+        assert "a" in cache
+    assert "b" in cache
+    assert "c" in cache
+    assert "c" in cache
+
+    cache["d"] = 4
+    assert "b" not in cache
+    assert "a" in cache
+    assert "c" in cache
+    assert "d" in cache
+
+    # equally used entries are evicted least recently used first
+    cache["e"] = 5
+    cache["f"] = 6
+    assert "d" not in cache
+    assert "e" not in cache
+    assert cache["f"] == 6
+
+    cache["f"] = 7
+    assert cache["f"] == 7
+    assert len(cache) == 3
+
+    # replacing the only entry leaves no buckets to take the minimum of
+    cache = LFUCacheHandler(max_entries=1)
+    cache["a"] = 1
+    cache["a"] = 2
+    assert cache["a"] == 2
+    assert len(cache) == 1
+
+
+@pytest.mark.parametrize("cache_type", [CacheHandler, LFUCacheHandler])
+def test_max_bytes(cache_type: Type[CacheHandler]) -> None:
+    """Check the cache evicts entries to stay within its size estimate."""
+    cache = cache_type(max_bytes=10, sizeof=len)
+    cache["a"] = "x" * 4
+    cache["b"] = "x" * 4
+    assert cache.nbytes == 8
+
+    cache["c"] = "x" * 4
+    assert cache.nbytes == 8
+    assert "a" not in cache
+    assert cache.evictions == 1
+
+    # an entry larger than the whole cache is never stored
+    cache["d"] = "x" * 20
+    assert "d" not in cache
+    assert len(cache) == 2
+    assert cache.nbytes == 8
+
+
+def test_cache_exceptions(decorator: Decorator) -> None:
+    """Check failed calls are cached, or not, as configured."""
+    calls = 0
+
+    @decorator
+    def f(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("failure")
+
+    with Context(CacheHandler(max_bytes=1000)) as cache:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                f(1)
+        assert calls == 1
+        assert type(cache[key(f, 1)]) is Failure
+        assert cache.nbytes > 0
+
+    with Context(CacheHandler(cache_exceptions=False)) as cache:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                f(1)
+        assert calls == 3
+        assert len(cache) == 0
+
+
+def test_cache_bulk(decorator: Decorator) -> None:
+    """Check many calls can be cached and retrieved at once."""
+
+    @decorator
+    def f(x: int) -> int:  # pragma: no cover
+        return x
+
+    cache = CacheHandler(max_entries=2)
+    cache.set_many({key(f, 1): 1, key(f, 2): 2, key(f, 3): 3})
+    assert cache.contains_many([key(f, 1), key(f, 2), key(f, 3)]) == {
+        key(f, 2),
+        key(f, 3),
+    }
+    assert cache.get_many([key(f, 2), key(f, 4)]) == {key(f, 2): 2}
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 2, 1)
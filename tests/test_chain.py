@@ -0,0 +1,191 @@
+"""Check handlers can be combined into layers."""
+import pickle  # noqa: S403
+from pathlib import Path
+from typing import Type
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.cache import CacheHandler
+from snake.shifter.chain import chain
+from snake.shifter.chain import ChainHandler
+from snake.shifter.context import NullHandler
+from snake.shifter.failure import Failure
+from snake.shifter.graph import GraphHandler
+from snake.shifter.persistent import SQLiteHandler
+from snake.shifter.typing import BulkCallHandler
+from snake.shifter.typing import Decorator
+
+
+def test_chain(decorator: Decorator, tmp_path: Path) -> None:
+    """Check a cache in front of a persistent handler fills from it."""
+    calls = []
+
+    @decorator
+    def f(x: int) -> int:
+        calls.append(x)
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + f(x + 1)
+
+    with SQLiteHandler(tmp_path / "calls.db") as store:
+        with Context(ChainHandler(CacheHandler(), store)):
+            assert g(1) == 3
+
+    assert calls == [1, 2]
+
+    cache = CacheHandler()
+    with SQLiteHandler(tmp_path / "calls.db") as store:
+        with Context(ChainHandler(cache, store)) as handler:
+            assert g(1) == 3
+            assert f(2) == 2
+            assert g(2) == 5
+
+            assert handler[key(f, 3)] == 3
+            assert handler[key(g, 1)] == 3
+            with pytest.raises(KeyError):
+                handler[key(f, 4)]
+
+    assert calls == [1, 2, 3]
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert len(cache) == 4
+
+
+def test_chain_graph(decorator: Decorator) -> None:
+    """Check a graph records calls found by the layers after it."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + f(x + 1)
+
+    graph = GraphHandler()
+    with Context(ChainHandler(graph, {key(f, 1): 10})):
+        assert g(1) == 12
+        assert g(1) == 12
+
+    assert graph.children(key(g, 1)) == {key(f, 1), key(f, 2)}
+    assert graph[key(f, 1)] == 10
+
+
+def test_chain_exceptions(decorator: Decorator) -> None:
+    """Check failures are stored in each layer, and raised again."""
+    calls = 0
+
+    @decorator
+    def f(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        raise RuntimeError(x)
+
+    front, back = CacheHandler(cache_exceptions=False), CacheHandler()
+    with Context(ChainHandler(front, back)):
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                f(1)
+
+    assert calls == 1
+    assert len(front) == 0
+    assert type(back[key(f, 1)]) is Failure
+
+
+def test_chain_bulk() -> None:
+    """Check many calls are looked up and stored in each layer at once."""
+    calls = []
+
+    @shift
+    def f(x: int) -> int:
+        calls.append(x)
+        return x
+
+    a, b, c, d, e = (key(f, x) for x in range(5))
+    front, back = CacheHandler(), dict()
+    handler = ChainHandler(front, NullHandler(), back)
+    assert isinstance(handler, BulkCallHandler)
+
+    back.update({a: 0, b: 1})
+    front[c] = 2
+    assert handler.contains_many([a, c, d]) == {a, c}
+    assert handler.contains_many([c]) == {c}
+    assert handler.get_many([a, c, d]) == {a: 0, c: 2}
+    assert handler.get_many([b]) == {b: 1}
+    assert handler.get_many([c]) == {c: 2}
+    assert set(front.get_many([a, b, c])) == {a, b, c}
+
+    handler.set_many({e: 4})
+    assert front[e] == back[e] == 4
+
+    with Context(ChainHandler(dict(), CacheHandler())) as chained:
+        chained.set_many({b: 1})  # type: ignore
+        assert f.batch([1, 2, 2]) == [1, 2, 2]  # type: ignore
+    assert calls == [2]
+
+
+def test_chain_layers() -> None:
+    """Check chains are flattened, and layers with no effect are skipped."""
+    a, b, c = dict(), dict(), dict()
+    handler = ChainHandler(a, ChainHandler(NullHandler(), b), c)
+    assert [id(layer) for layer in handler.layers] == [
+        id(a),
+        id(handler.layers[1]),
+        id(b),
+        id(c),
+    ]
+    assert type(handler.layers[1]) is NullHandler
+    assert (handler._finds, handler._stores) == ((0, 2, 3), (3, 2, 0))
+
+    layers = chain(a, chain(b, c)).layers  # type: ignore
+    assert [id(layer) for layer in layers] == [id(a), id(b), id(c)]
+    assert chain(NullHandler(), a) is a
+    assert type(chain(NullHandler(), chain())) is NullHandler
+
+
+class _Loops(ChainHandler):
+    """A chain subclass, which keeps the loops over the layers."""
+
+
+@pytest.mark.parametrize("chain_type", [ChainHandler, _Loops])
+def test_chain_dispatch(chain_type: Type[ChainHandler]) -> None:
+    """Check generated and looping methods give values to earlier layers."""
+    a, b, c = CacheHandler(), dict(), dict()
+    handler = chain_type(a, NullHandler(), b, c)
+    assert isinstance(handler, ChainHandler)
+    assert (type(handler) is _Loops) == (chain_type is _Loops)
+
+    c["x"] = 1
+    assert "x" in handler
+    assert handler["x"] == 1
+    assert "x" in a and "x" in b
+
+    b["y"] = 2
+    assert "y" in handler
+    assert handler["y"] == 2
+    assert "y" in a and "y" not in c
+
+    c["z"] = 3
+    assert handler["z"] == 3
+    assert "z" not in a
+    assert handler["x"] == 1
+
+    assert "w" not in handler
+    with pytest.raises(KeyError):
+        handler["w"]
+    handler["w"] = 4
+    assert a["w"] == b["w"] == c["w"] == 4
+
+    copy = pickle.loads(pickle.dumps(handler))  # noqa: S301
+    assert type(copy) is type(handler)
+    assert copy["w"] == 4
+
+    empty = ChainHandler(NullHandler(), NullHandler())
+    assert "w" not in empty
+    empty["w"] = 4
+    with pytest.raises(KeyError):
+        empty["w"]
@@ -0,0 +1,65 @@
+"""Compare a chain of handlers with a hand written delegating handler."""
+from typing import Any
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+
+class _Delegate:
+    """Look in a front dict, then a back dict, the way a chain does."""
+
+    def __init__(self) -> None:
+        self.front: Any = dict()
+        self.back: Any = dict()
+
+    def __contains__(self, key: Any) -> bool:
+        if key in self.front:
+            return True
+        # each run starts with both dicts empty, so this isn't timed
+        if key in self.back:  # pragma: no cover
+            self.front[key] = self.back[key]
+            return True
+        return False
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.front[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self.back[key] = value
+        self.front[key] = value
+
+
+def _fib() -> Any:
+    from snake.shifter import shift
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    return fib
+
+
+def _run(handler: Any) -> None:
+    from snake.shifter import Context
+
+    fib = _fib()
+    for _ in range(10):
+        with Context(handler()):
+            fib(50)
+
+
+def test_benchmark_delegate(benchmark):  # type: ignore
+    """Memoize through a hand written delegating handler."""
+    benchmark(_run, _Delegate)
+
+
+def test_benchmark_chain(benchmark):  # type: ignore
+    """Memoize through a chain of two dicts, with a null handler skipped."""
+    from snake.shifter.chain import ChainHandler
+    from snake.shifter.context import NullHandler
+
+    benchmark(_run, lambda: ChainHandler(NullHandler(), dict(), dict()))
@@ -0,0 +1,88 @@
+"""Test the cost of hashing keys, in a graph of calls with several arguments."""
+from typing import Any
+from typing import Callable
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+# an argument cheap to hash, as its strings cache their hashes
+_FLAT = tuple(f"segment{i}" for i in range(8))
+
+# an argument whose hash is worked out again each time a tuple key is hashed
+_NESTED = tuple((f"tenor{i}", (i, float(i))) for i in range(32))
+
+
+def _node(compact: bool) -> Any:
+    """Shift a function making a lattice of calls."""
+    from snake.shifter import shift
+
+    @shift(compact=compact)
+    def node(name: str, curve: Any, x: int, y: int) -> int:
+        if x == 0 or y == 0:
+            return 1
+        return node(name, curve, x - 1, y) + node(name, curve, x, y - 1)
+
+    return node
+
+
+def _record(compact: bool, curve: Any) -> Callable[[], Any]:
+    """Record the lattice of calls from scratch with a graph handler."""
+    from snake.shifter import Context
+    from snake.shifter.graph import GraphHandler
+
+    node = _node(compact)
+
+    def run() -> Any:
+        with Context(GraphHandler()):
+            return node("curve", curve, 12, 12)
+
+    return run
+
+
+def _bump(compact: bool, curve: Any) -> Callable[[], Any]:
+    """Record the lattice of calls, then bump one and recalculate the rest."""
+    from snake.shifter import Context
+    from snake.shifter import key
+    from snake.shifter.graph import GraphHandler
+
+    node = _node(compact)
+    with Context(GraphHandler()) as graph:
+        node("curve", curve, 12, 12)
+
+    def run() -> Any:
+        with Context(graph.bump({key(node, "curve", curve, 0, 1): 2})):
+            return node("curve", curve, 12, 12)
+
+    return run
+
+
+def test_benchmark_record_flat_tuple_keys(benchmark):  # type: ignore
+    """Record a graph with namedtuple keys of cheap arguments."""
+    benchmark(_record(False, _FLAT))
+
+
+def test_benchmark_record_flat_compact_keys(benchmark):  # type: ignore
+    """Record a graph with compact keys of cheap arguments."""
+    benchmark(_record(True, _FLAT))
+
+
+def test_benchmark_record_nested_tuple_keys(benchmark):  # type: ignore
+    """Record a graph with namedtuple keys, hashing nested tuples each time."""
+    benchmark(_record(False, _NESTED))
+
+
+def test_benchmark_record_nested_compact_keys(benchmark):  # type: ignore
+    """Record a graph with compact keys, hashing nested tuples once a key."""
+    benchmark(_record(True, _NESTED))
+
+
+def test_benchmark_bump_nested_tuple_keys(benchmark):  # type: ignore
+    """Recalculate a bumped graph with namedtuple keys."""
+    benchmark(_bump(False, _NESTED))
+
+
+def test_benchmark_bump_nested_compact_keys(benchmark):  # type: ignore
+    """Recalculate a bumped graph with compact keys."""
+    benchmark(_bump(True, _NESTED))
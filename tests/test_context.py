@@ -1,4 +1,9 @@
 """Test simple handler and context combinations."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import pytest
 
 from snake.shifter.context import Context
@@ -29,3 +34,47 @@ def test_context_push() -> None:
         assert get_handler() is handler
 
     assert get_handler() is not handler
+
+
+def test_context_nested() -> None:
+    """Check that exiting a context restores the enclosing handler."""
+    outer = NullHandler()
+    inner = NullHandler()
+
+    with Context(outer):
+        with Context(inner):
+            assert get_handler() is inner
+        assert get_handler() is outer
+
+
+def test_context_threads() -> None:
+    """Check that handlers pushed in one thread are not seen by others."""
+    handlers = [NullHandler() for _ in range(8)]
+    barrier = threading.Barrier(len(handlers))
+
+    def worker(handler: NullHandler) -> bool:
+        with Context(handler):
+            # make sure every thread has pushed before any checks or pops
+            barrier.wait()
+            active = get_handler() is handler
+            barrier.wait()
+        return active
+
+    with ThreadPoolExecutor(len(handlers)) as executor:
+        assert all(executor.map(worker, handlers))
+
+    assert get_handler() not in handlers
+
+
+def test_context_tasks() -> None:
+    """Check that concurrent asyncio tasks each see their own handler."""
+
+    async def worker(handler: NullHandler) -> bool:
+        with Context(handler):
+            await asyncio.sleep(0)
+            return get_handler() is handler
+
+    async def main() -> List[bool]:
+        return await asyncio.gather(*(worker(NullHandler()) for _ in range(8)))
+
+    assert all(asyncio.run(main()))
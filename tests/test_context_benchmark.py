@@ -0,0 +1,55 @@
+"""Measure the per-call cost of looking up the active handler."""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import shift
+from snake.shifter.context import _handlers
+from snake.shifter.context import NullHandler
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+CALLS = 1000
+THREADS = 8
+
+
+@shift
+def f(x: int) -> int:
+    """Trivial node so the handler lookup dominates."""
+    return x
+
+
+def _calls(_: int) -> None:
+    with Context(dict()):
+        for i in range(CALLS):
+            f(i)
+
+
+def test_benchmark_context_single_thread(benchmark):  # type: ignore
+    """Make calls under a handler from a single thread."""
+    benchmark(_calls, 0)
+
+
+def test_benchmark_context_many_threads(benchmark):  # type: ignore
+    """Make the same calls under a handler in each of many threads."""
+    with ThreadPoolExecutor(THREADS) as executor:
+
+        def run() -> None:
+            list(executor.map(_calls, range(THREADS)))
+
+        benchmark(run)
+
+
+def test_benchmark_lookup_list(benchmark):  # type: ignore
+    """Look up the tail of a global list, as the stack used to."""
+    handlers = [NullHandler()]
+
+    benchmark(lambda: handlers[-1])
+
+
+def test_benchmark_lookup_context_var(benchmark):  # type: ignore
+    """Look up the head of the context local stack, as shift does."""
+    get_stack = _handlers.get
+
+    benchmark(lambda: get_stack()[0])
@@ -0,0 +1,60 @@
+"""Test recalculating a deep graph, with and without early cutoff."""
+from typing import Any
+from typing import Callable
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.graph import equal
+from snake.shifter.graph import GraphHandler
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+_WORK = 100
+
+
+@shift
+def quote(tenor: int) -> float:
+    """Look up a market quote."""
+    return tenor / 1000
+
+
+@shift
+def rounded(tenor: int) -> float:
+    """Round a quote, so small bumps don't change it."""
+    return round(quote(tenor), 2)
+
+
+@shift
+def level(depth: int, tenor: int) -> float:
+    """Build a deep chain of calls on top of the rounded quotes."""
+    if depth == 0:
+        return sum(rounded(t) for t in range(tenor))
+    # work that a pricing function would do at each level
+    work = sum(i * i for i in range(_WORK)) % 7
+    return level(depth - 1, tenor) + depth + work
+
+
+def _bump(cutoff: bool) -> Callable[[], Any]:
+    """Record the chains, then bump a quote without changing its rounding."""
+    with Context(GraphHandler(equal=equal if cutoff else None)) as graph:
+        for tenor in range(20):
+            level(50, tenor)
+
+    def run() -> Any:
+        with Context(graph.bump({key(quote, 5): 0.0051})):
+            return [level(50, tenor) for tenor in range(20)]
+
+    return run
+
+
+def test_benchmark_bump_full(benchmark):  # type: ignore
+    """Recalculate every call depending on the bumped quote."""
+    benchmark(_bump(False))
+
+
+def test_benchmark_bump_cutoff(benchmark):  # type: ignore
+    """Stop recalculating where the rounded quote is unchanged."""
+    benchmark(_bump(True))
@@ -0,0 +1,100 @@
+"""Check call keys have stable digests."""
+import subprocess  # noqa: S404
+import sys
+from typing import Any
+
+import pytest
+
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.digest import digest
+from snake.shifter.digest import shard
+
+
+@shift
+def f(*args: Any, **kwargs: Any) -> Any:  # pragma: no cover
+    """Take any arguments, to digest."""
+    return args, kwargs
+
+
+class Point:
+    """An argument that describes how to digest itself."""
+
+    def __init__(self, x: int, y: int) -> None:
+        """Set the coordinates."""
+        self.x = x
+        self.y = y
+
+    def __digest__(self) -> Any:
+        """Digest the coordinates."""
+        return (self.x, self.y)
+
+
+def test_digest_stable() -> None:
+    """Check digests are the same in another process, despite hash seeds."""
+    values = (None, True, 1, 1.5, "a", b"b", (1,), [2], {"c": 3}, {4, 5})
+    code = (
+        "from tests.test_digest import f\n"
+        "from snake.shifter import key\n"
+        "from snake.shifter.digest import digest\n"
+        f"print(digest(key(f, *{values!r}, d={{'e', 'f', 'g'}})))\n"
+    )
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        env={"PYTHONHASHSEED": "1", "PYTHONPATH": ":".join(sys.path)},
+    ).stdout
+    assert output.decode().strip() == digest(key(f, *values, d={"e", "f", "g"}))
+
+
+def test_digest_values() -> None:
+    """Check digests tell apart values that aren't equal."""
+    digests = {
+        digest(key(f, *args))
+        for args in [(), (1,), (1.5,), ("1",), (b"1",), ([1],), ((1,),), (None,)]
+    }
+    assert len(digests) == 8
+
+    assert digest(key(f, "ab", "c")) != digest(key(f, "a", "bc"))
+    assert digest(key(f, {1: 2, 3: 4})) == digest(key(f, {3: 4, 1: 2}))
+    assert digest(key(f, frozenset([1, 2]))) == digest(key(f, {2, 1}))
+    assert digest(key(f, key(f, 1))) != digest(key(f, 1))
+    assert digest(key(f, Point(1, 2))) == digest(key(f, Point(1, 2)))
+    assert digest(key(f, Point(1, 2))) != digest(key(f, (1, 2)))
+
+    with pytest.raises(TypeError):
+        digest(key(f, object()))
+
+
+def test_digest_numbers() -> None:
+    """Check keys with equal numbers of different types have equal digests."""
+    for values in [(1, True, 1.0), (0, False, 0.0, -0.0), (2**70, float(2**70))]:
+        assert all(key(f, v) == key(f, values[0]) for v in values)
+        assert len({digest(key(f, v)) for v in values}) == 1
+
+    assert digest(key(f, {1: "a"})) == digest(key(f, {True: "a"}))
+    assert digest(key(f, 0.5)) != digest(key(f, 0))
+    assert digest(key(f, float("inf"))) != digest(key(f, float("-inf")))
+
+
+def test_digest_memoized() -> None:
+    """Check the digest is computed once per key."""
+    calls = 0
+
+    class Counted:
+        def __digest__(self) -> int:
+            nonlocal calls
+            calls += 1
+            return 1
+
+    k = key(f, Counted())
+    assert digest(k) == digest(k)
+    assert calls == 1
+
+
+def test_shard() -> None:
+    """Check keys are spread over the shards."""
+    shards = [shard(key(f, x), 4) for x in range(100)]
+    assert set(shards) == {0, 1, 2, 3}
+    assert shards == [shard(key(f, x), 4) for x in range(100)]
@@ -0,0 +1,147 @@
+"""Test the failures stored by handlers for calls that raise."""
+import gc
+import pickle  # noqa: S403
+import traceback
+import weakref
+from typing import Any
+from typing import Iterator
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.failure import CLEAR
+from snake.shifter.failure import Failure
+from snake.shifter.failure import KEEP
+from snake.shifter.failure import set_traceback_policy
+from snake.shifter.failure import StoredTraceback
+from snake.shifter.failure import SUMMARY
+from snake.shifter.typing import Decorator
+
+
+@pytest.fixture
+def policy(request: Any) -> Iterator[str]:
+    """Set the traceback policy for a test, and restore it afterwards."""
+    previous = set_traceback_policy(request.param)
+    yield request.param
+    set_traceback_policy(previous)
+
+
+class Payload:
+    """An object held by the frame of a failing call."""
+
+
+def _failing(decorator: Decorator) -> Any:
+    """Shift a function that fails, and one that calls it."""
+
+    @decorator
+    def f(x: int) -> int:
+        payload = Payload()
+        raise RuntimeError(x, weakref.ref(payload))
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x)
+
+    return f, g
+
+
+@pytest.mark.parametrize("policy", [KEEP], indirect=True)
+def test_keep(decorator: Decorator, policy: str) -> None:
+    """The exception is stored and raised again, with its traceback."""
+    f, g = _failing(decorator)
+    with Context(dict()) as d:
+        with pytest.raises(RuntimeError) as first:
+            g(1)
+        with pytest.raises(RuntimeError) as second:
+            g(1)
+
+    failure = d[key(f, 1)]
+    assert type(failure) is Failure and d[key(g, 1)] is failure
+    assert first.value is second.value is failure.exception
+    assert failure.exception.__traceback__ is not None
+
+    gc.collect()
+    assert first.value.args[1]() is not None
+
+
+@pytest.mark.parametrize("policy", [KEEP], indirect=True)
+def test_keep_traceback(decorator: Decorator, policy: str) -> None:
+    """The traceback of a kept exception doesn't grow as it is raised again."""
+    f, g = _failing(decorator)
+    depths = []
+    with Context(dict()):
+        for _ in range(3):
+            with pytest.raises(RuntimeError) as raised:
+                g(1)
+            depths.append(len(traceback.extract_tb(raised.tb)))
+
+    assert depths[0] >= depths[1] == depths[2]
+    assert traceback.extract_tb(raised.tb)[-1].name == "f"
+
+
+@pytest.mark.parametrize("policy", [CLEAR, SUMMARY], indirect=True)
+def test_clear(decorator: Decorator, policy: str) -> None:
+    """A copy without a traceback is stored, and copies of it raised."""
+    f, g = _failing(decorator)
+    with Context(dict()) as d:
+        with pytest.raises(RuntimeError) as first:
+            g(1)
+        with pytest.raises(RuntimeError) as second:
+            g(1)
+
+    failure = d[key(f, 1)]
+    assert type(failure) is Failure and d[key(g, 1)] is failure
+    assert failure.exception.__traceback__ is None
+    assert first.value is not failure.exception
+    assert second.value is not failure.exception
+    assert second.value.args == first.value.args
+
+    # the frames of the failed call are only held by the first exception
+    ref = first.value.args[1]
+    del first
+    gc.collect()
+    assert ref() is None
+
+    cause = second.value.__cause__
+    if policy == SUMMARY:
+        assert type(cause) is StoredTraceback
+        assert "raise RuntimeError(x, weakref.ref(payload))" in str(cause)
+    else:
+        assert cause is None
+
+
+class KeywordError(Exception):
+    """An exception that can't be rebuilt from its arguments."""
+
+    def __init__(self, *, code: int) -> None:
+        """Store the code, without passing it to the base class."""
+        super().__init__()
+        self.code = code
+
+
+@pytest.mark.parametrize("policy", [CLEAR], indirect=True)
+def test_uncopyable(policy: str) -> None:
+    """Exceptions that can't be copied are kept."""
+    exception = KeywordError(code=1)
+    failure = Failure.of(exception)
+    assert failure.exception is exception and failure.error() is exception
+
+
+def test_pickle() -> None:
+    """Failures lose their traceback when pickled, and raise copies."""
+    try:
+        raise RuntimeError(1)
+    except RuntimeError as exc:
+        failure = Failure.of(exc)
+
+    restored = pickle.loads(pickle.dumps(failure))  # noqa: S301
+    assert restored.exception.__traceback__ is None
+    assert restored.error() is not restored.error()
+    assert restored.error().args == (1,)
+
+
+def test_policy() -> None:
+    """Only the known policies can be set."""
+    with pytest.raises(ValueError):
+        set_traceback_policy("discard")
@@ -0,0 +1,428 @@
+"""Check the dependency graph handler records and invalidates calls."""
+from typing import Any
+from typing import Callable
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.batch import vectorize
+from snake.shifter.failure import Failure
+from snake.shifter.graph import equal
+from snake.shifter.graph import GraphHandler
+from snake.shifter.typing import Decorator
+
+
+def test_graph(decorator: Decorator) -> None:
+    """Verify we construct an accurate call graph."""
+
+    @decorator
+    def f(a: int, b: int) -> int:
+        return a + b
+
+    @decorator
+    def g(a: int, b: int) -> int:
+        return f(a, b) + f(a, b) - f(a, b)
+
+    with Context(GraphHandler()) as handler:
+        assert g(1, 2) == 3
+        assert g(1, 2) == 3
+
+    assert handler.parents(key(g, 1, 2)) == set()
+    assert handler.parents(key(f, 1, 2)) == {key(g, 1, 2)}
+    assert handler.children(key(f, 1, 2)) == set()
+    assert handler.children(key(g, 1, 2)) == {key(f, 1, 2)}
+
+    assert dict(handler.items()) == {key(f, 1, 2): 3, key(g, 1, 2): 3}
+    assert handler[key(g, 1, 2)] == 3
+    with pytest.raises(KeyError):
+        handler[key(g, 2, 1)]
+
+
+def test_graph_exception(decorator: Decorator) -> None:
+    """Check failures are cached against each call they pass through."""
+    exception = RuntimeError("failure")
+
+    @decorator
+    def f(a: int, b: int) -> int:
+        raise exception
+
+    @decorator
+    def g(a: int, b: int) -> int:
+        return f(a, b)
+
+    with Context(GraphHandler()) as handler:
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                g(1, 2)
+
+    assert type(handler[key(f, 1, 2)]) is Failure
+    assert handler[key(f, 1, 2)].exception is exception
+    assert handler[key(g, 1, 2)] is handler[key(f, 1, 2)]
+    assert handler.parents(key(f, 1, 2)) == {key(g, 1, 2)}
+
+
+def test_graph_bump(print: Callable[..., Any], decorator: Decorator) -> None:
+    """Bump a value, and check only its dependents are invalidated."""
+    calls = []
+
+    @decorator
+    def f(x: int) -> int:
+        calls.append(x)
+        return x
+
+    @decorator
+    def g(x: int, y: int) -> int:
+        return f(x) + f(y)
+
+    with Context(GraphHandler()) as handler:
+        assert g(1, 2) == 3
+        assert g(1, 3) == 4
+        assert g(2, 3) == 5
+
+    bumped = handler.bump({key(f, 1): 10})
+    print(dict(bumped.items()))
+
+    assert dict(bumped.items()) == {
+        key(f, 1): 10,
+        key(f, 2): 2,
+        key(f, 3): 3,
+        key(g, 2, 3): 5,
+    }
+    assert bumped.parents(key(f, 1)) == set()
+    assert bumped.parents(key(f, 2)) == {key(g, 2, 3)}
+    assert bumped.children(key(g, 1, 2)) == set()
+
+    with Context(bumped):
+        assert g(1, 2) == 12
+        assert g(1, 3) == 13
+
+    assert calls == [1, 2, 3]
+    assert bumped.children(key(g, 1, 2)) == {key(f, 1), key(f, 2)}
+    assert bumped.parents(key(f, 2)) == {key(g, 1, 2), key(g, 2, 3)}
+
+    # the base handler is untouched by the fork
+    assert handler[key(g, 1, 2)] == 3
+    assert handler.parents(key(f, 2)) == {key(g, 1, 2), key(g, 2, 3)}
+    assert handler.parents(key(f, 1)) == {key(g, 1, 2), key(g, 1, 3)}
+
+
+def test_graph_forks(decorator: Decorator) -> None:
+    """Check many forks, and forks of forks, are independent."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def total(n: int) -> int:
+        return sum(f(x) for x in range(n))
+
+    with Context(GraphHandler()) as handler:
+        assert total(10) == 45
+
+    forks = [handler.bump({key(f, x): 100}) for x in range(10)]
+    for x, fork in enumerate(forks):
+        with Context(fork):
+            assert total(10) == 145 - x
+
+    twice = forks[0].bump({key(f, 1): 100})
+    with Context(twice):
+        assert total(10) == 244
+    with Context(forks[0]):
+        assert total(10) == 145
+
+    handler.invalidate([key(f, 9)])
+    with pytest.raises(KeyError):
+        handler[key(total, 10)]
+    assert handler[key(f, 8)] == 8
+
+
+def test_graph_bump_many(decorator: Decorator) -> None:
+    """Check forks bumped together invalidate only their own dependents."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(x: int, y: int) -> int:
+        return f(x) + f(y)
+
+    with Context(GraphHandler()) as handler:
+        assert g(1, 2) == 3
+        assert g(3, 4) == 7
+
+    forks = list(
+        handler.bump_many(
+            [
+                {key(f, 1): 10, key(f, 2): 20},
+                {key(f, 3): 30, key(f, 4): 40},
+                {},
+                {key(f, 5): 50},
+            ]
+        )
+    )
+    assert [fork.dirty() for fork in forks] == [
+        {key(g, 1, 2)},
+        {key(g, 3, 4)},
+        set(),
+        set(),
+    ]
+    assert [fork.bump({}).dirty() for fork in forks] == [fork.dirty() for fork in forks]
+    for fork, expected in zip(forks, [(30, 7), (3, 70), (3, 7), (3, 7)]):
+        with Context(fork):
+            assert (g(1, 2), g(3, 4)) == expected
+    assert forks[3][key(f, 5)] == 50
+    assert handler[key(g, 1, 2)] == 3
+    assert list(handler.bump_many([])) == []
+
+
+def test_graph_bulk(decorator: Decorator) -> None:
+    """Check calls looked up and stored together are children of the caller."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(n: int) -> int:
+        return sum(f.batch(list(range(n))))  # type: ignore
+
+    with Context(GraphHandler()) as handler:
+        assert f(0) == 0
+        assert g(3) == 3
+
+    assert handler.children(key(g, 3)) == {key(f, 0), key(f, 1), key(f, 2)}
+    assert handler.contains_many([key(f, 1), key(f, 5), key(g, 3)]) == {
+        key(f, 1),
+        key(g, 3),
+    }
+    assert handler.get_many([key(f, 1), key(f, 5)]) == {key(f, 1): 1}
+
+    handler.set_many({key(f, 5): 6})
+    assert handler.parents(key(f, 5)) == set()
+    bumped = handler.bump({key(f, 2): 20})
+    assert bumped.dirty() == {key(g, 3)}
+
+    @vectorize(f)
+    def f_many(x: List[int]) -> List[int]:
+        return x
+
+    with Context(handler):
+        assert g(5) == 10
+
+    assert handler.children(key(g, 5)) == {key(f, x) for x in range(5)}
+    assert handler.parents(key(f, 4)) == {key(g, 5)}
+
+
+def test_graph_cutoff(decorator: Decorator) -> None:
+    """Check callers of calls recalculated to the same value are kept."""
+    calls = []
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def tens(x: int) -> int:
+        calls.append("tens")
+        return f(x) // 10
+
+    @decorator
+    def g(x: int) -> int:
+        calls.append("g")
+        return tens(x) + f(0)
+
+    @decorator
+    def top(x: int) -> int:
+        calls.append("top")
+        return g(x) * 2
+
+    with Context(GraphHandler(equal=equal)) as handler:
+        assert top(1) == 0
+
+    calls.clear()
+    same = handler.bump({key(f, 1): 2})
+    assert same.dirty() == {key(tens, 1), key(g, 1), key(top, 1)}
+    with Context(same):
+        assert top(1) == 0
+    assert calls == ["tens"]
+    assert same.dirty() == set()
+    assert same.children(key(g, 1)) == {key(tens, 1), key(f, 0)}
+    assert same.parents(key(tens, 1)) == {key(g, 1)}
+
+    calls.clear()
+    changed = same.bump({key(f, 1): 15})
+    with Context(changed):
+        assert top(1) == 2
+    assert calls == ["tens", "g", "top"]
+
+    # changes back to values calls were worked out from aren't missed
+    calls.clear()
+    back = changed.bump({key(f, 1): 1})
+    with Context(back):
+        assert top(1) == 0
+    assert calls == ["tens", "g", "top"]
+
+    # a bump to the same value invalidates nothing that needs calling
+    calls.clear()
+    with Context(back.bump({key(f, 0): 0})):
+        assert top(1) == 0
+    assert calls == []
+
+
+def test_graph_cutoff_failure(decorator: Decorator) -> None:
+    """Check failures of recalculated children are compared as values."""
+    calls = []
+
+    @decorator
+    def base(x: int) -> Any:
+        return x
+
+    @decorator
+    def f(x: int) -> int:
+        calls.append(x)
+        if base(x) < 0:
+            raise ValueError(x)
+        return base(x)  # type: ignore
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + 1
+
+    with Context(GraphHandler(equal=equal)) as handler:
+        assert g(1) == 2
+
+    bumped = handler.bump({key(base, 1): -1})
+    with Context(bumped):
+        with pytest.raises(ValueError):
+            g(1)
+    assert type(bumped[key(f, 1)]) is Failure
+    assert bumped[key(g, 1)] is bumped[key(f, 1)]
+
+    # calls invalidated themselves are called again, whatever they call
+    calls.clear()
+    forced = handler.bump({key(base, 1): 1})
+    forced.invalidate([key(f, 1)])
+    with Context(forced):
+        assert g(1) == 2
+    assert calls == [1]
+
+
+class _Array:
+    """Values compared elementwise, as numpy's arrays are."""
+
+    def __init__(self, *values: Any) -> None:
+        self.values = values
+        self.shape = (len(values),)
+
+    def __eq__(self, other: Any) -> Any:  # type: ignore
+        if self.shape != other.shape:
+            raise ValueError("operands could not be broadcast together")
+        return _Array(*(a == b for a, b in zip(self.values, other.values)))
+
+    def __bool__(self) -> bool:
+        raise ValueError("the truth value of an array is ambiguous")
+
+    def all(self) -> bool:
+        return all(self.values)
+
+
+def test_graph_equal() -> None:
+    """Check values are compared elementwise, when they are arrays."""
+    assert equal(_Array(1, 2), _Array(1, 2))
+    assert not equal(_Array(1, 2), _Array(1, 3))
+    assert not equal(_Array(1, 2), _Array(1))
+    with pytest.raises(ValueError):
+        _Array(1, 2) == _Array(1)
+    with pytest.raises(ValueError):
+        bool(_Array(1, 2) == _Array(1, 2))
+    assert not equal(_Array(1), [1])
+    assert not equal(Failure.of(ValueError(1)), Failure.of(ValueError(1)))
+
+
+def test_graph_equal_containers() -> None:
+    """Check containers of arrays are compared item by item."""
+    assert equal((_Array(1, 2), 3), (_Array(1, 2), 3))
+    assert not equal((_Array(1, 2), 3), (_Array(1, 2), 4))
+    assert not equal([_Array(1, 2)], [_Array(1, 3)])
+    assert not equal([_Array(1, 2)], [_Array(1, 2), _Array(1, 2)])
+    assert not equal([_Array(1, 2)], [_Array(1)])
+    assert equal({"a": [_Array(1)]}, {"a": [_Array(1)]})
+    assert not equal({"a": _Array(1)}, {"b": _Array(1)})
+    assert not equal({"a": _Array(1)}, {"a": _Array(2)})
+
+
+class _Interrupt(BaseException):
+    """Stop storing a value part way."""
+
+
+def test_graph_cutoff_order(decorator: Decorator) -> None:
+    """Check children are checked in the order they were called."""
+    calls = []
+
+    @decorator
+    def flag(x: int) -> int:
+        return x
+
+    @decorator
+    def risky(x: int) -> int:
+        calls.append(x)
+        if not flag(x):
+            raise ValueError(x)
+        return x
+
+    @decorator
+    def top(x: int) -> int:
+        return risky(x) if flag(x) else 0
+
+    # risky is numbered before the flag that guards it
+    with Context(GraphHandler(equal=equal)) as handler:
+        assert risky(1) == 1
+        assert top(1) == 1
+
+    calls.clear()
+    with Context(handler.bump({key(flag, 1): 0})):
+        assert top(1) == 0
+    assert calls == []
+
+
+def test_graph_cutoff_uncomparable(decorator: Decorator) -> None:
+    """Check values that can't be compared are taken to have changed."""
+    calls = []
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def tens(x: int) -> int:
+        calls.append("tens")
+        return f(x) // 10
+
+    @decorator
+    def top(x: int) -> int:
+        calls.append("top")
+        return tens(x) * 2
+
+    def uncomparable(a: Any, b: Any) -> bool:
+        if b == 3:
+            raise _Interrupt()
+        raise TypeError("can't compare")
+
+    with Context(GraphHandler(equal=uncomparable)) as handler:
+        assert top(1) == 0
+
+    calls.clear()
+    with Context(handler.bump({key(f, 1): 2})):
+        assert top(1) == 0
+    assert calls == ["tens", "top"]
+
+    # the call is popped from the stack, even though storing its value fails
+    interrupted = handler.bump({key(f, 1): 30})
+    with Context(interrupted):
+        with pytest.raises(_Interrupt):
+            top(1)
+    assert interrupted._stack == []
@@ -0,0 +1,155 @@
+"""Test shifting modules as they are imported."""
+import importlib
+import sys
+from importlib.machinery import ModuleSpec
+from pathlib import Path
+from typing import Any
+from typing import Iterator
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.importer import install
+from snake.shifter.importer import uninstall
+from snake.shifter.key_type import LazyKeyType
+from snake.shifter.typing import Decorator
+
+_SOURCE = """\
+import json
+
+calls = []
+
+
+def f(x):
+    calls.append(x)
+    return g(x) + 1
+
+
+def g(x):
+    calls.append(-x)
+    return x
+
+
+async def h(x):
+    return x
+
+
+def gen(n):
+    yield from range(n)
+
+
+async def agen(n):
+    yield n
+
+
+def private(_unused):
+    return 1
+
+
+def keyed(*, func__):
+    return func__
+
+
+class C:
+    def method(self):
+        return 1
+
+
+dumps = json.dumps
+"""
+
+
+@pytest.fixture
+def package(tmp_path: Path) -> Iterator[str]:
+    """Write a package of modules to import, and forget them afterwards."""
+    root = tmp_path / "shifted_pkg"
+    root.mkdir()
+    (root / "__init__.py").write_text("")
+    (root / "mod.py").write_text(_SOURCE)
+    (tmp_path / "unshifted_mod.py").write_text(_SOURCE)
+
+    sys.path.insert(0, str(tmp_path))
+    yield "shifted_pkg"
+    sys.path.remove(str(tmp_path))
+    for name in ["shifted_pkg", "shifted_pkg.mod", "unshifted_mod"]:
+        sys.modules.pop(name, None)
+
+
+def test_import(package: str, decorator: Decorator) -> None:
+    """Functions of selected modules are shifted when first called."""
+    finder = install([package], decorator)
+    try:
+        mod = importlib.import_module(package + ".mod")
+        other = importlib.import_module("unshifted_mod")
+    finally:
+        uninstall(finder)
+
+    f, g = mod.f, mod.g  # type: ignore
+    assert f.__name__ == "f" and f.__wrapped__.__module__ == mod.__name__
+    assert "def f" in mod.__loader__.get_source(mod.__name__)  # type: ignore
+
+    with Context(dict()) as d:
+        assert f(1) == 2
+        assert f(1) == 2
+    assert mod.calls == [1, -1]  # type: ignore
+    assert d == {key(f, 1): 2, key(g, 1): 1}
+
+    assert not hasattr(mod.C.method, "__key__")  # type: ignore
+    assert not hasattr(mod.dumps, "__key__")  # type: ignore
+    assert hasattr(mod.h, "__key__")  # type: ignore
+    assert not hasattr(other.f, "__key__")  # type: ignore
+
+    # generators, and parameters a key type can't have, are left as they are
+    for name in ["gen", "agen", "private", "keyed"]:
+        assert not hasattr(getattr(mod, name), "__key__")
+    with Context(dict()) as d:
+        assert list(mod.gen(3)) == list(mod.gen(3)) == [0, 1, 2]  # type: ignore
+        assert mod.private(None) == 1  # type: ignore
+    assert d == {}
+
+
+def test_lazy(package: str) -> None:
+    """Key types are built when first used, rather than on import."""
+    finder = install([package])
+    try:
+        mod = importlib.import_module(package + ".mod")
+    finally:
+        uninstall(finder)
+
+    assert isinstance(mod.f.__key__, LazyKeyType)  # type: ignore
+    assert "from_call" not in vars(mod.f.__key__)  # type: ignore
+    assert key(mod.f, 1).x == 1  # type: ignore
+    assert "from_call" in vars(mod.f.__key__)  # type: ignore
+    assert mod.calls == []  # type: ignore
+
+
+def test_not_found(package: str) -> None:
+    """Selected modules that don't exist still fail to import."""
+    finder = install([package])
+    try:
+        with pytest.raises(ModuleNotFoundError):
+            importlib.import_module(package + ".missing")
+        assert finder.find_spec("sys", None) is None
+    finally:
+        uninstall(finder)
+
+
+class _NoLoader:
+    """Find a spec without a loader, as for some namespace packages."""
+
+    def find_spec(self, fullname: str, *args: Any) -> ModuleSpec:
+        """Find any module."""
+        return ModuleSpec(fullname, None)
+
+
+def test_no_loader() -> None:
+    """Specs without a loader are returned unchanged."""
+    finder = install(["anything"])
+    sys.meta_path.insert(1, _NoLoader())  # type: ignore
+    try:
+        spec = finder.find_spec("anything", None)
+        assert spec is not None and spec.loader is None
+    finally:
+        del sys.meta_path[1]
+        uninstall(finder)
@@ -0,0 +1,53 @@
+"""Check call keys are numbered consistently."""
+from concurrent.futures import ThreadPoolExecutor
+
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.interning import KeyTable
+
+
+@shift
+def f(x: int) -> int:  # pragma: no cover
+    """Node function to generate keys for."""
+    return x
+
+
+def test_key_table() -> None:
+    """Check keys are numbered densely, and can be looked up by number."""
+    table = KeyTable()
+
+    assert [table[key(f, x)] for x in range(3)] == [0, 1, 2]
+    assert table[key(f, 1)] == 1
+    assert len(table) == 3
+
+    assert table.key(2) == key(f, 2)
+    assert list(table) == [key(f, x) for x in range(3)]
+
+    assert key(f, 3) not in table
+    assert table.get(key(f, 3)) is None
+    assert len(table) == 3
+
+    # a key numbered by another thread while waiting keeps its number
+    assert table.__missing__(key(f, 1)) == 1
+    assert len(table) == 3
+
+    assert repr(table) == (
+        "KeyTable([tests.test_interning.f(x=0), "
+        "tests.test_interning.f(x=1), tests.test_interning.f(x=2)])"
+    )
+
+
+def test_key_table_threads() -> None:
+    """Check concurrent numbering gives each key a single number."""
+    table = KeyTable()
+
+    def number(offset: int) -> None:
+        for x in range(1000):
+            table[key(f, (x + offset) % 1000)]
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(number, range(0, 1000, 125)))
+
+    assert len(table) == 1000
+    assert sorted(table.values()) == list(range(1000))
+    assert all(table.key(node) == k for k, node in table.items())
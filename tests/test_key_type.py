@@ -1,9 +1,15 @@
 """Check that constructed key types work correctly."""
+import inspect
 from typing import Any
 from typing import Dict
 from typing import Optional
 from typing import Tuple
 
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import shift
+from snake.shifter.key_type import _from_call
 from snake.shifter.key_type import make_key_type
 
 
@@ -103,3 +109,136 @@ def test_kwargs() -> None:
     key_type = make_key_type(f)
 
     assert repr(key_type.from_call(a=1, b=2)) == "f(kwargs={'a': 1, 'b': 2})"
+
+
+def test_from_call_matches_bind() -> None:
+    """Check the generated from_call builds the same keys as Signature.bind."""
+
+    def f(
+        a: int, b: int, c: int = 3, *args: int, d: int, e: int = 5, **kwargs: int
+    ) -> int:
+        ...
+
+    # make the first parameter positional only, without needing python 3.8
+    sig = inspect.signature(f)
+    a, *params = sig.parameters.values()
+    f.__signature__ = sig.replace(  # type: ignore
+        parameters=[a.replace(kind=a.POSITIONAL_ONLY), *params]
+    )
+
+    key_type = make_key_type(f)
+
+    calls = [
+        ((1, 2), dict(d=4)),
+        ((1, 2, 6), dict(d=4)),
+        ((1, 2, 6, 7, 8), dict(d=4, e=9)),
+        ((1,), dict(b=2, d=4, x=10)),
+    ]
+    for args, kwargs in calls:
+        key = key_type.from_call(*args, **kwargs)
+        assert type(key) is key_type
+        assert tuple(key) == tuple(_from_call(key_type, *args, **kwargs))
+
+    with pytest.raises(TypeError):
+        key_type.from_call(a=1, b=2, d=4)
+
+    with pytest.raises(TypeError):
+        key_type.from_call(1, 2)
+
+    def g(a: int, *, b: int = 2) -> int:
+        ...
+
+    key_type = make_key_type(g)
+    assert key_type.from_call(1) == _from_call(key_type, 1)
+    assert key_type.from_call(1, b=3) == _from_call(key_type, 1, b=3)
+    with pytest.raises(TypeError):
+        key_type.from_call(1, 3)
+
+
+def test_lazy() -> None:
+    """A lazy key type is built once, by its first use."""
+    import copy
+    import pickle  # noqa: S403
+
+    from snake.shifter import key
+    from snake.shifter.key_type import LazyKeyType
+
+    shifted = shift(f)
+    key_type = shifted.__key__  # type: ignore
+    assert isinstance(key_type, LazyKeyType)
+    assert "from_call" not in vars(key_type)
+
+    assert repr(key(shifted, 1, 2)) == "tests.test_key_type.f(a=1, b=2, c=3, d=None)"
+    assert vars(key_type)["from_call"] == key_type.resolve().from_call
+    assert key_type.resolve() is key_type.resolve()
+    assert key_type.__signature__ == inspect.signature(f)
+
+    unresolved = copy.copy(LazyKeyType(f))
+    assert unresolved.from_call(1, 2) == make_key_type(f).from_call(1, 2)
+
+    # keys of a module function, pickled with the shifted function's key type
+    restored = pickle.loads(pickle.dumps(key(shifted, 1, 2)))  # noqa: S301
+    assert restored == key(shifted, 1, 2)
+
+
+def test_lazy_race(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A key type built by another thread while waiting for it is used."""
+    import snake.shifter.key_type
+    from snake.shifter.key_type import LazyKeyType
+
+    key_type = LazyKeyType(f)
+    built = make_key_type(f)
+
+    class Lock:
+        def __enter__(self) -> None:
+            key_type._key_type = built
+
+        def __exit__(self, *args: Any) -> None:
+            pass
+
+    monkeypatch.setattr(snake.shifter.key_type, "_lock", Lock())
+    assert key_type.resolve() is built
+    assert "from_call" not in vars(key_type)
+
+
+@shift(compact=True)
+def compact(a: int, b: int = 2) -> int:
+    """Test function with compact keys, to pickle them by reference."""
+    return a + b
+
+
+def test_compact() -> None:
+    """Compact keys behave as namedtuple keys do, with a cached hash."""
+    import pickle  # noqa: S403
+
+    from snake.shifter.digest import digest
+    from snake.shifter.key_type import CompactKey
+    from snake.shifter.typing import CallKey
+
+    key_type = make_key_type(f, compact=True)
+    key = key_type.from_call(1, 2)
+    tuple_key = make_key_type(f).from_call(1, 2)
+
+    assert isinstance(key, CompactKey) and not hasattr(key, "__dict__")
+    assert isinstance(key, CallKey)
+    assert repr(key) == repr(tuple_key)
+    assert (key.a, key.b, key.c, key.d) == (1, 2, 3, None)  # type: ignore
+    assert key.func__ is f  # type: ignore
+    assert key[:-1] == (1, 2, 3, None) and key[-1] is f  # type: ignore
+    assert len(key) == 5 and tuple(key) == tuple(tuple_key)  # type: ignore
+    assert key_type._fields == ("a", "b", "c", "d", "func__")  # type: ignore
+
+    assert key == key and key == key_type.from_call(1, b=2)
+    assert key != key_type.from_call(2, 1)
+    assert hash(key) == hash(tuple(tuple_key))
+    assert key != tuple_key and tuple_key != key
+
+    compact_key = compact.__key__.from_call(1)  # type: ignore
+    with Context(dict()) as d:
+        assert compact(1) == 3
+    assert d == {compact_key: 3}
+    assert pickle.loads(pickle.dumps(compact_key)) == compact_key  # noqa: S301
+    assert digest(key) == digest(tuple_key) == key.digest__  # type: ignore
+
+    fallback = _from_call(key_type, 1, 2)
+    assert type(fallback) is key_type and fallback == key
@@ -0,0 +1,175 @@
+"""Check invalidated calls are recalculated concurrently."""
+import pickle  # noqa: S403
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.failure import Failure
+from snake.shifter.graph import GraphHandler
+from snake.shifter.parallel import _evaluate_remote
+from snake.shifter.parallel import recalculate
+from snake.shifter.typing import Decorator
+from snake.shifter.wrapper import call
+
+
+@shift
+def leaf(x: int) -> int:
+    """Input to the module level graph."""
+    return x
+
+
+@shift
+def branch(x: int) -> int:
+    """Intermediate node, independent of its siblings."""
+    return leaf(x) * 2
+
+
+@shift
+def root(n: int) -> int:
+    """Sum over the branches."""
+    return sum(branch(x) for x in range(n))
+
+
+def test_pickle_key() -> None:
+    """Check keys pickle by reference to the function they were created for."""
+    assert pickle.loads(pickle.dumps(key(branch, 1))) == key(branch, 1)  # noqa: S301
+
+
+def test_recalculate(decorator: Decorator) -> None:
+    """Check only the invalidated calls are made again, and give new values."""
+    calls = []
+
+    @decorator
+    def f(x: int) -> int:
+        calls.append(x)
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + f(x + 1)
+
+    @decorator
+    def h(n: int) -> int:
+        return sum(g(x) for x in range(n))
+
+    with Context(GraphHandler()) as graph:
+        assert h(10) == 100
+    calls.clear()
+
+    bumped = graph.bump({key(f, 3): 103})
+    assert bumped.dirty() == {key(g, 2), key(g, 3), key(h, 10)}
+
+    with ThreadPoolExecutor(4) as executor:
+        recalculate(bumped, executor)
+
+    assert not bumped.dirty()
+    assert calls == []
+    assert bumped[key(g, 2)] == 105
+    assert bumped[key(h, 10)] == 300
+    assert bumped.children(key(g, 3)) == {key(f, 3), key(f, 4)}
+    assert bumped.parents(key(f, 3)) == {key(g, 2), key(g, 3)}
+
+
+def test_recalculate_concurrently(decorator: Decorator) -> None:
+    """Check independent calls are in progress at the same time."""
+    barrier = threading.Barrier(4, timeout=10)
+    wait = False
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        # each call waits for all its siblings to be running
+        if wait:
+            barrier.wait()
+        return f(x) * 2
+
+    @decorator
+    def h(n: int) -> int:
+        return sum(g(x) for x in range(n))
+
+    with Context(GraphHandler()) as graph:
+        assert h(4) == 12
+
+    wait = True
+    bumped = graph.bump({key(f, x): x + 1 for x in range(4)})
+    with ThreadPoolExecutor(4) as executor:
+        recalculate(bumped, executor)
+
+    assert bumped[key(h, 4)] == 20
+
+
+def test_recalculate_failure(decorator: Decorator) -> None:
+    """Check a failed call is stored, and fails the calls that depend on it."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return 1 // f(x)
+
+    @decorator
+    def h(x: int) -> int:
+        return g(x) + 1
+
+    with Context(GraphHandler()) as graph:
+        assert h(1) == 2
+
+    bumped = graph.bump({key(f, 1): 0})
+    recalculate(bumped)
+
+    assert type(bumped[key(g, 1)]) is Failure
+    assert type(bumped[key(h, 1)]) is Failure
+    with Context(bumped):
+        with pytest.raises(ZeroDivisionError):
+            h(1)
+
+
+def test_recalculate_processes() -> None:
+    """Check calls made in worker processes are merged back into the graph."""
+    with Context(GraphHandler()) as graph:
+        assert root(4) == 12
+
+    bumped = graph.bump({key(leaf, 1): 11})
+    with ProcessPoolExecutor(2) as executor:
+        recalculate(bumped, executor)
+
+    assert not bumped.dirty()
+    assert bumped[key(branch, 1)] == 22
+    assert bumped[key(root, 4)] == 32
+    assert bumped.parents(key(branch, 1)) == {key(root, 4)}
+    assert bumped.children(key(branch, 1)) == {key(leaf, 1)}
+
+
+def test_evaluate_remote() -> None:
+    """Check a call made for another process returns the calls it made."""
+    values, edges = _evaluate_remote(key(branch, 1), {key(leaf, 1): 11})
+    assert values == [(key(branch, 1), 22)]
+    assert edges == [(key(branch, 1), key(leaf, 1))]
+
+    values, edges = _evaluate_remote(key(branch, 1), {key(leaf, 1): None})
+    assert [k for k, _ in values] == [key(branch, 1)]
+    assert type(values[0][1]) is Failure
+
+
+def test_call_key() -> None:
+    """Check making the call a key represents goes through the handler."""
+    with Context(dict()) as d:
+        assert call(key(branch, 2)) == 4
+        d[key(branch, 3)] = -1
+        assert call(key(branch, 3)) == -1
+
+        d[key(branch, 4)] = Failure(RuntimeError("failure"))
+        with pytest.raises(RuntimeError):
+            call(key(branch, 4))
+
+    assert d[key(leaf, 2)] == 2
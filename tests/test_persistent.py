@@ -0,0 +1,152 @@
+"""Check results persist on disk between handlers."""
+import sqlite3
+import subprocess  # noqa: S404
+import sys
+from pathlib import Path
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.failure import Failure
+from snake.shifter.persistent import SQLiteHandler
+
+
+@shift
+def fib(x: int) -> int:
+    """Count calls to check which results are loaded from disk."""
+    global calls
+    calls += 1
+    if x <= 1:
+        return 1
+    return fib(x - 1) + fib(x - 2)
+
+
+@shift
+def fail(x: int) -> int:
+    """Fail, to check failures are not stored by default."""
+    global calls
+    calls += 1
+    raise RuntimeError(x)
+
+
+calls = 0
+
+
+def _stored(path: Path) -> int:
+    """Count the results written to a database."""
+    with sqlite3.connect(path) as connection:
+        return int(connection.execute("SELECT COUNT(*) FROM calls").fetchone()[0])
+
+
+def test_persistent(tmp_path: Path) -> None:
+    """Check results are served after the database is opened again."""
+    global calls
+    path = tmp_path / "calls.db"
+
+    calls = 0
+    with SQLiteHandler(path) as store, Context(store):
+        assert fib(10) == 89
+        assert fib(10) == 89
+    assert calls == 11
+    assert _stored(path) == 11
+
+    calls = 0
+    with SQLiteHandler(path) as store, Context(store):
+        assert fib(10) == 89
+        assert fib(11) == 144
+        assert store[key(fib, 5)] == 8
+        with pytest.raises(KeyError):
+            store[key(fib, 20)]
+    assert calls == 1
+
+
+def test_persistent_batches(tmp_path: Path) -> None:
+    """Check results are written in batches, and served while pending."""
+    global calls
+    path = tmp_path / "calls.db"
+
+    calls = 0
+    store = SQLiteHandler(path, batch_size=4)
+    with Context(store):
+        assert fib(5) == 8
+        assert _stored(path) == 4
+        assert fib(5) == 8
+        assert store[key(fib, 5)] == 8
+    assert calls == 6
+
+    store.flush()
+    assert _stored(path) == 6
+    store.close()
+
+
+def test_persistent_bulk(tmp_path: Path) -> None:
+    """Check many results are stored and found at once."""
+    path = tmp_path / "calls.db"
+
+    with SQLiteHandler(path, batch_size=3) as store:
+        store.set_many({key(fib, x): x for x in range(2)})
+        store.set_many({key(fail, 1): Failure(RuntimeError(1))})
+        assert _stored(path) == 0
+        store.set_many({key(fib, 2): 2})
+        assert _stored(path) == 3
+        store[key(fib, 3)] = 3
+
+        keys = [key(fib, x) for x in range(1000)] + [key(fail, 1)]
+        assert store.get_many(keys) == {key(fib, x): x for x in range(4)}
+        assert store.contains_many(keys) == {key(fib, x) for x in range(4)}
+
+    # the text of keys is only stored to read, and may differ between processes
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE calls SET key = 'other'")
+    with SQLiteHandler(path) as store:
+        assert store.get_many([key(fib, 1)]) == {key(fib, 1): 1}
+        assert key(fib, 2) in store
+
+
+def test_persistent_equal_keys(tmp_path: Path) -> None:
+    """Check results are found by keys equal to, but written unlike, the key."""
+    path = tmp_path / "calls.db"
+
+    with SQLiteHandler(path) as store:
+        store[key(fib, 1)] = 1
+    with SQLiteHandler(path) as store:
+        assert store[key(fib, 1.0)] == 1
+        assert store.get_many([key(fib, True)]) == {key(fib, True): 1}
+
+
+def test_persistent_restart(tmp_path: Path) -> None:
+    """Check results are found after a restart with another hash seed."""
+    path = tmp_path / "calls.db"
+    words = frozenset(["a", "b", "c", "d", "e", "f", "g", "h"])
+    code = (
+        "from tests.test_persistent import fib\n"
+        "from snake.shifter import key\n"
+        "from snake.shifter.persistent import SQLiteHandler\n"
+        f"with SQLiteHandler({str(path)!r}) as store:\n"
+        f"    store[key(fib, {words!r})] = 1\n"
+    )
+    for seed in ["1", "2", "3"]:
+        subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code],
+            check=True,
+            env={"PYTHONHASHSEED": seed, "PYTHONPATH": ":".join(sys.path)},
+        )
+    assert _stored(path) == 1
+    with SQLiteHandler(path) as store:
+        assert store[key(fib, words)] == 1
+
+
+def test_persistent_exceptions(tmp_path: Path) -> None:
+    """Check failures are only stored when asked to be."""
+    global calls
+    path = tmp_path / "calls.db"
+
+    calls = 0
+    for cache_exceptions, expected in [(False, 2), (True, 3)]:
+        for _ in range(2):
+            with SQLiteHandler(path, cache_exceptions=cache_exceptions) as store:
+                with Context(store), pytest.raises(RuntimeError):
+                    fail(1)
+        assert calls == expected
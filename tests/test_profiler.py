@@ -0,0 +1,136 @@
+"""Check calls are profiled by function and by key."""
+import pstats
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.cache import CacheHandler
+from snake.shifter.profiler import CallStats
+from snake.shifter.profiler import ProfileHandler
+from snake.shifter.typing import Decorator
+
+
+def test_profile(decorator: Decorator) -> None:
+    """Check calls, hits and times add up."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + f(x) + f(x + 1)
+
+    with Context(ProfileHandler(dict())) as profiler:
+        assert g(1) == 4
+        assert g(1) == 4
+
+    functions = profiler.by_function()
+    assert functions[f"{__name__}.test_profile.<locals>.f"][:2] == (2, 1)
+    assert functions[f"{__name__}.test_profile.<locals>.g"][:2] == (1, 1)
+    assert functions[f"{__name__}.test_profile.<locals>.g"].hit_rate == 0.5
+    assert CallStats(0, 0, 0, 0).hit_rate == 0.0
+
+    keys = profiler.by_key()
+    assert keys[key(f, 1)][:2] == (1, 1)
+    assert keys[key(f, 2)][:2] == (1, 0)
+
+    g_stats = keys[key(g, 1)]
+    children = keys[key(f, 1)].cumulative_ns + keys[key(f, 2)].cumulative_ns
+    assert g_stats.cumulative_ns == g_stats.self_ns + children
+
+    lines = profiler.collapsed().splitlines()
+    assert [line.split(" ")[0] for line in lines] == [
+        "test_profile.<locals>.g",
+        "test_profile.<locals>.g;test_profile.<locals>.f",
+    ]
+
+
+def test_profile_recursion(decorator: Decorator) -> None:
+    """Check recursive calls are only timed once by their function."""
+
+    @decorator
+    def fib(x: int) -> int:
+        return 1 if x <= 1 else fib(x - 1) + fib(x - 2)
+
+    with Context(ProfileHandler()) as profiler:
+        assert fib(5) == 8
+
+    stats = profiler.by_function()[f"{__name__}.test_profile_recursion.<locals>.fib"]
+    assert stats.calls == 15
+    assert stats.cumulative_ns == profiler.by_key()[key(fib, 5)].cumulative_ns
+
+    profiler.create_stats()
+    ((primitive, calls, _, _, callers),) = profiler.stats.values()
+    assert (primitive, calls) == (1, 15)
+    assert list(callers.values())[0][:2] == (0, 14)
+
+
+def test_profile_pstats(decorator: Decorator, tmp_path: Path) -> None:
+    """Check the timings can be read by pstats, from a file."""
+
+    @decorator
+    def f(x: int) -> int:
+        if x < 0:
+            raise ValueError(x)
+        return x
+
+    @decorator
+    def g(x: int) -> int:
+        return f(x) + f(-x)
+
+    with Context(ProfileHandler(CacheHandler())) as profiler:
+        assert g(0) == 0
+        with pytest.raises(ValueError):
+            g(1)
+
+    profiler.dump_stats(tmp_path / "calls.prof")
+    stats = pstats.Stats(str(tmp_path / "calls.prof"))
+    assert stats.total_calls == 5  # type: ignore
+    assert stats.prim_calls == 5  # type: ignore
+
+
+def test_profile_hits(decorator: Decorator) -> None:
+    """Check calls found by the handler are counted, but not timed."""
+
+    @decorator
+    def f(x: int) -> int:
+        return x
+
+    with Context(ProfileHandler({key(f, 1): 2})) as profiler:
+        assert f(1) == 2
+
+    assert profiler.by_key() == {key(f, 1): CallStats(0, 1, 0, 0)}
+    assert (
+        profiler.by_function()[f"{__name__}.test_profile_hits.<locals>.f"].hit_rate
+        == 1.0
+    )
+
+    with pytest.raises(KeyError):
+        ProfileHandler()[key(f, 1)]
+
+
+def _same_name(module: str) -> Any:
+    """Make a function with the same qualified name in another module."""
+
+    def f(x: int) -> int:
+        return x
+
+    f.__module__ = module
+    return f
+
+
+def test_profile_modules(decorator: Decorator) -> None:
+    """Check functions with the same qualified name are told apart."""
+    f, g = decorator(_same_name("one")), decorator(_same_name("two"))
+    with Context(ProfileHandler()) as profiler:
+        f(1)
+        g(1)
+        g(2)
+
+    functions = profiler.by_function()
+    assert functions["one._same_name.<locals>.f"].calls == 1
+    assert functions["two._same_name.<locals>.f"].calls == 2
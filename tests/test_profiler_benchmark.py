@@ -0,0 +1,56 @@
+"""Compare the overhead of profiling calls through a handler with cProfile."""
+import cProfile
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+
+def test_benchmark_null_handler_fib(benchmark):  # type: ignore
+    """Intercept the calls without profiling them, for comparison."""
+    from snake.shifter import Context
+    from snake.shifter import shift
+    from snake.shifter.context import NullHandler
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(NullHandler()):
+        benchmark(fib, 9)
+
+
+def test_benchmark_profile_handler_fib(benchmark):  # type: ignore
+    """Profile the calls with a profiling handler."""
+    from snake.shifter import Context
+    from snake.shifter import shift
+    from snake.shifter.profiler import ProfileHandler
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(ProfileHandler()):
+        benchmark(fib, 9)
+
+
+def test_benchmark_cprofile_fib(benchmark):  # type: ignore
+    """Profile the same calls with cProfile."""
+    from snake.shifter import Context
+    from snake.shifter import shift
+    from snake.shifter.context import NullHandler
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    profile = cProfile.Profile()
+    with Context(NullHandler()):
+        benchmark(profile.runcall, fib, 9)
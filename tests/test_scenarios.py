@@ -0,0 +1,138 @@
+"""Check many scenarios are evaluated against one recorded graph."""
+import os
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.failure import Failure
+from snake.shifter.graph import GraphHandler
+from snake.shifter.scenarios import _evaluate_remote
+from snake.shifter.scenarios import scenarios
+from snake.shifter.snapshot import save
+
+_calls: List[Any] = []
+
+
+@shift
+def rate(tenor: int) -> float:
+    """Look up a rate, counting the calls made."""
+    _calls.append(tenor)
+    return tenor / 100
+
+
+@shift
+def price(tenor: int) -> float:
+    """Price from a rate, failing for negative rates."""
+    if rate(tenor) < 0:
+        raise ValueError(tenor)
+    return 100 * (1 - rate(tenor))
+
+
+@shift
+def book(n: int) -> float:
+    """Sum prices over some tenors."""
+    return sum(price(tenor) for tenor in range(1, n + 1))
+
+
+def _record() -> GraphHandler:
+    """Record a small book."""
+    with Context(GraphHandler()) as graph:
+        book(3)
+    return graph
+
+
+_BUMPS = [{key(rate, 1): 0.0}, {key(rate, 3): -1.0}, {}]
+_OUTPUTS = [key(book, 3), key(price, 1)]
+
+
+def _check(table: List[List[Any]]) -> None:
+    """Check the values and failures of the scenarios."""
+    assert table[0] == [pytest.approx(295.0), 100.0]
+    assert type(table[1][0]) is Failure
+    assert table[1][0].exception.args == (3,)
+    assert table[1][1] == 99.0
+    assert table[2] == [pytest.approx(294.0), 99.0]
+
+
+def test_scenarios() -> None:
+    """Check only the calls affected by each scenario are made again."""
+    graph = _record()
+    _calls.clear()
+    _check(scenarios(graph, _BUMPS, _OUTPUTS))
+    assert _calls == []
+
+    # outputs not recorded before are made in each scenario
+    table = scenarios(graph, _BUMPS, [key(rate, 4)])
+    assert table == [[0.04]] * 3
+    assert _calls == [4, 4, 4]
+
+    assert graph[key(book, 3)] == pytest.approx(294.0)
+    assert scenarios(graph, [], _OUTPUTS) == []
+
+
+@pytest.mark.parametrize("pool", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_scenarios_executor(pool: Any) -> None:
+    """Check scenarios are evaluated on an executor."""
+    with pool(2) as executor:
+        _check(scenarios(_record(), _BUMPS, _OUTPUTS, executor))
+
+
+class _Deferred(Future):  # type: ignore
+    """A call made only once its result is asked for."""
+
+    def __init__(self, executor: "_Lazy", fn: Callable[..., Any], *args: Any) -> None:
+        """Hold on to the call, and its arguments, until it is made."""
+        super().__init__()
+        self.executor = executor
+        self.call = fn, args
+
+    def result(self, timeout: Any = None) -> Any:
+        """Make the call, which is only asked for once."""
+        self.executor.waiting -= 1
+        fn, args = self.call
+        self.set_result(fn(*args))
+        return super().result(timeout)
+
+
+class _Lazy(Executor):
+    """Defer calls until their results are asked for, counting those waiting."""
+
+    def __init__(self) -> None:
+        """Start with no calls waiting."""
+        self.waiting = 0
+        self.most = 0
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Any:  # type: ignore
+        """Defer a call."""
+        self.waiting += 1
+        self.most = max(self.most, self.waiting)
+        return _Deferred(self, fn, *args)
+
+
+def test_scenarios_window(monkeypatch: Any) -> None:
+    """Check only a window of forks is held, waiting to be evaluated."""
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    bumps = [{key(rate, 1): tenor / 10} for tenor in range(10)]
+    executor = _Lazy()
+
+    graph = _record()
+    table = scenarios(graph, bumps, _OUTPUTS, executor)
+    assert table == scenarios(graph, bumps, _OUTPUTS)
+    assert executor.most == 4
+    assert executor.waiting == 0
+
+
+def test_scenarios_remote(tmp_path: Path) -> None:
+    """Check a worker process evaluates scenarios from a snapshot."""
+    save(_record(), tmp_path / "graph")
+    _check(_evaluate_remote(str(tmp_path / "graph"), _BUMPS, _OUTPUTS))
@@ -0,0 +1,66 @@
+"""Test the cost of evaluating many scenarios bumped from one graph."""
+from typing import Any
+from typing import Callable
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.graph import GraphHandler
+from snake.shifter.scenarios import scenarios
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+_TENORS = 200
+
+
+@shift
+def rate(tenor: int) -> float:
+    """Look up a rate."""
+    return tenor / 1000
+
+
+@shift
+def price(tenor: int) -> float:
+    """Price from a rate."""
+    return 100 * (1 - rate(tenor))
+
+
+@shift
+def book(n: int) -> float:
+    """Sum prices over some tenors."""
+    return sum(price(tenor) for tenor in range(n))
+
+
+def _setup() -> Any:
+    """Record the book, and bump each rate in its own scenario."""
+    with Context(GraphHandler()) as graph:
+        book(_TENORS)
+    bumps = [{key(rate, tenor): 0.0} for tenor in range(_TENORS)]
+    return graph, bumps, [key(book, _TENORS)]
+
+
+def _bump_each() -> Callable[[], List[Any]]:
+    """Bump and evaluate each scenario in turn."""
+    graph, bumps, outputs = _setup()
+
+    def run() -> List[Any]:
+        table = []
+        for bump in bumps:
+            with Context(graph.bump(bump)):
+                table.append([book(_TENORS)])
+        return table
+
+    return run
+
+
+def test_benchmark_bump_each(benchmark):  # type: ignore
+    """Fork and evaluate one scenario at a time."""
+    benchmark(_bump_each())
+
+
+def test_benchmark_scenarios(benchmark):  # type: ignore
+    """Fork all the scenarios together, and evaluate them."""
+    benchmark(scenarios, *_setup())
@@ -0,0 +1,97 @@
+"""Check results are shared between processes through a mapped file."""
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.failure import Failure
+from snake.shifter.shared import SharedMemoryHandler
+
+_buffers = pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="out of band buffers need python 3.8"
+)
+
+
+@shift
+def square(x: int) -> int:
+    """Square a number, to share between processes."""
+    return x * x
+
+
+@shift
+def total(n: int) -> int:
+    """Sum squares, so many results are shared."""
+    return sum(square(x) for x in range(n))
+
+
+def _worker(handler: SharedMemoryHandler, n: int) -> int:  # pragma: no cover
+    """Compute a total in another process."""
+    with Context(handler):
+        return total(n)
+
+
+def test_shared_processes(tmp_path: Path) -> None:
+    """Check results computed by one process are found by another."""
+    with SharedMemoryHandler(tmp_path / "calls", slots=64, size=4096) as handler:
+        with ProcessPoolExecutor(1) as executor:
+            assert executor.submit(_worker, handler, 10).result() == 285
+
+        k = key(total, 10)
+        assert k in handler
+        assert handler[k] == 285
+        assert handler[key(square, 9)] == 81
+        assert key(square, 10) not in handler
+        with pytest.raises(KeyError):
+            handler[key(square, 10)]
+
+
+@_buffers
+def test_shared_buffers(tmp_path: Path) -> None:
+    """Check bytes are read in place, rather than copied."""
+    value = bytes(range(100))
+    with SharedMemoryHandler(tmp_path / "calls") as handler:
+        handler[key(square, 1)] = value
+        handler[key(square, 1)] = None
+
+        view = handler[key(square, 1)]
+        assert type(view) is memoryview
+        assert view.readonly
+        assert view.obj is handler._mmap
+        assert view == value
+        del view
+
+
+def test_shared_full(tmp_path: Path) -> None:
+    """Check results are not stored once the file is full."""
+    with SharedMemoryHandler(tmp_path / "calls", slots=2, size=1024) as handler:
+        with Context(handler):
+            assert total(4) == 14
+        assert key(square, 0) in handler
+        assert key(total, 4) not in handler
+
+    with SharedMemoryHandler(tmp_path / "large", slots=8, size=1024) as handler:
+        handler[key(total, 5)] = bytes(2048)
+        assert key(total, 5) not in handler
+
+
+def test_shared_exceptions(tmp_path: Path) -> None:
+    """Check failures are only stored when asked to be."""
+    failure = Failure(RuntimeError("failure"))
+    with SharedMemoryHandler(tmp_path / "calls") as handler:
+        handler[key(square, 1)] = failure
+        assert key(square, 1) not in handler
+    with SharedMemoryHandler(tmp_path / "calls", cache_exceptions=True) as handler:
+        handler[key(square, 1)] = failure
+        assert type(handler[key(square, 1)].exception) is RuntimeError
+
+
+def test_shared_invalid(tmp_path: Path) -> None:
+    """Check a file that isn't a file of results is rejected."""
+    path = tmp_path / "calls"
+    path.write_bytes(bytes(1024))
+    with pytest.raises(ValueError):
+        SharedMemoryHandler(path)
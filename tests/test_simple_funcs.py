@@ -5,6 +5,8 @@ import pytest
 
 from snake.shifter import Context
 from snake.shifter import key
+from snake.shifter.context import NullHandler
+from snake.shifter.failure import Failure
 from snake.shifter.typing import Decorator
 
 
@@ -48,8 +50,8 @@ def test_simple_failing_func(decorator: Decorator) -> None:
         with pytest.raises(RuntimeError):
             f(1, 2)
 
-    assert type(d[key(f, 1, 2)]) is Exception
-    assert d[key(f, 1, 2)].args[0] is exception
+    assert type(d[key(f, 1, 2)]) is Failure
+    assert d[key(f, 1, 2)].exception is exception
 
 
 def test_mock_null_handler(decorator: Decorator) -> None:
@@ -92,3 +94,26 @@ def test_mock_cached_handler(decorator: Decorator) -> None:
     handler.__contains__.assert_called_once_with(key(f, 1, 2))
     handler.__getitem__.assert_called_once_with(key(f, 1, 2))
     handler.__setitem__.assert_not_called()
+
+
+def test_null_handler_bypass(
+    decorator: Decorator, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Check the default null handler is skipped, but a pushed one is not."""
+    handler = MagicMock()
+    monkeypatch.setattr(NullHandler, "__contains__", handler.__contains__)
+    monkeypatch.setattr(NullHandler, "__setitem__", handler.__setitem__)
+
+    @decorator
+    def f(a: int, b: int) -> int:
+        return a + b
+
+    assert f(1, 2) == 3
+    handler.__contains__.assert_not_called()
+    handler.__setitem__.assert_not_called()
+
+    with Context(NullHandler()):
+        assert f(1, 2) == 3
+
+    handler.__contains__.assert_called_once()
+    handler.__setitem__.assert_called_once()
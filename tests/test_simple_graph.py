@@ -11,6 +11,7 @@ import pytest
 
 from snake.shifter import Context
 from snake.shifter import key
+from snake.shifter.failure import Failure
 from snake.shifter.typing import CallKey
 from snake.shifter.typing import Decorator
 
@@ -153,17 +154,65 @@ def test_simple_graph_exception(decorator: Decorator) -> None:
         with pytest.raises(RuntimeError):
             g(a, b)
 
-    # exceptions get cached twice - should this be the case, or do
-    # we re-call an throw from source?
-    assert type(handler.retvals[key(f, a, b)]) is Exception
-    assert type(handler.retvals[key(g, a, b)]) is Exception
-    assert handler.retvals[key(f, a, b)].args[0] is exception
-    assert handler.retvals[key(g, a, b)].args[0] is exception
+    # the failure is made once, and stored again by each caller
+    assert type(handler.retvals[key(f, a, b)]) is Failure
+    assert handler.retvals[key(g, a, b)] is handler.retvals[key(f, a, b)]
+    assert handler.retvals[key(f, a, b)].exception is exception
+    assert handler.retvals[key(g, a, b)].exception is exception
 
     assert handler.parents[key(g, a, b)] == set()
     assert handler.parents[key(f, a, b)] == {key(g, a, b)}
 
 
+class _Closing:
+    """Make a call as a with block exits."""
+
+    def __init__(self, call: Callable[[], Any]) -> None:
+        """Set the call to make."""
+        self.call = call
+
+    def __enter__(self) -> None:
+        """Enter the block."""
+
+    def __exit__(self, *args: Any) -> None:
+        """Make the call."""
+        self.call()
+
+
+def test_simple_graph_finally(decorator: Decorator) -> None:
+    """Check calls made by finally and with blocks are children of the call."""
+
+    @decorator
+    def leaf(x: int) -> int:
+        return x
+
+    @decorator
+    def f(x: int) -> int:
+        try:
+            return leaf(x)
+        finally:
+            leaf(x + 1)
+            if x:
+                return leaf(x + 2)  # noqa: B012
+
+    @decorator
+    def g(x: int) -> int:
+        with _Closing(lambda: leaf(x + 1)):
+            return leaf(x)
+
+    handler = GraphCallHandler()
+    with Context(handler):
+        assert f(0) == 0
+        assert f(1) == 3
+        assert g(4) == 4
+
+    assert handler.stack == []
+    assert handler.retvals[key(f, 1)] == 3
+    assert handler.children[key(f, 0)] == {key(leaf, 0), key(leaf, 1)}
+    assert handler.children[key(f, 1)] == {key(leaf, x) for x in [1, 2, 3]}
+    assert handler.children[key(g, 4)] == {key(leaf, 4), key(leaf, 5)}
+
+
 def test_simple_graph_bump(print: Callable[..., Any], decorator: Decorator) -> None:
     """Try bumping some functions and check that the graph is consistent."""
 
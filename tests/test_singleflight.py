@@ -0,0 +1,105 @@
+"""Check concurrent identical calls are made once."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.cache import CacheHandler
+from snake.shifter.singleflight import SingleFlightHandler
+from snake.shifter.typing import CallHandler
+from snake.shifter.typing import Decorator
+
+THREADS = 8
+
+
+def _run_concurrently(handler: CallHandler, func: Any, *args: Any) -> List[Any]:
+    """Make the same call from many threads, returning results or failures."""
+    barrier = threading.Barrier(THREADS)
+
+    def worker(_: int) -> Any:
+        with Context(handler):
+            barrier.wait()
+            try:
+                return func(*args)
+            except Exception as exc:
+                return exc
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        return list(executor.map(worker, range(THREADS)))
+
+
+def test_single_flight(decorator: Decorator) -> None:
+    """Check threads wait for the call in progress rather than repeating it."""
+    calls = 0
+
+    @decorator
+    def slow(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        # give the other threads time to miss the cache
+        threading.Event().wait(0.05)
+        return x * 2
+
+    handler = SingleFlightHandler(dict())
+    assert _run_concurrently(handler, slow, 2) == [4] * THREADS
+    assert calls == 1
+    assert handler[key(slow, 2)] == 4
+
+    # without single flight every thread that missed makes the call
+    calls = 0
+    _run_concurrently(dict(), slow, 3)
+    assert calls > 1
+
+
+def test_single_flight_failure(decorator: Decorator) -> None:
+    """Check threads waiting for a failed call all see the failure."""
+    calls = 0
+    exception = RuntimeError("failure")
+
+    @decorator
+    def slow(x: int) -> int:
+        nonlocal calls
+        calls += 1
+        threading.Event().wait(0.05)
+        raise exception
+
+    results = _run_concurrently(SingleFlightHandler(CacheHandler()), slow, 1)
+    assert calls == 1
+    assert all(result is exception for result in results)
+
+
+class Interrupt(BaseException):
+    """Stop a call part way, without storing a failure."""
+
+
+def test_single_flight_interrupted(decorator: Decorator) -> None:
+    """Check an interrupted call can be made again, by any thread."""
+    interrupt = True
+
+    @decorator
+    def f(x: int) -> int:
+        nonlocal interrupt
+        if interrupt:
+            interrupt = False
+            raise Interrupt()
+        return x
+
+    # the thread making the call makes it again, rather than waiting for itself
+    handler = SingleFlightHandler(dict())
+    with Context(handler):
+        with pytest.raises(Interrupt):
+            f(1)
+        assert f(1) == 1
+
+    # other threads take over the call, once they have waited long enough
+    handler = SingleFlightHandler(dict(), timeout=0.01)
+    assert key(f, 2) not in handler
+    assert _run_concurrently(handler, f, 2) == [2] * THREADS
+    assert handler[key(f, 2)] == 2
+
+    handler[key(f, 3)] = 3
+    assert handler[key(f, 3)] == 3
@@ -0,0 +1,179 @@
+"""Check recorded graphs are saved, and loaded again to bump."""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.failure import Failure
+from snake.shifter.graph import equal
+from snake.shifter.graph import GraphHandler
+from snake.shifter.snapshot import load
+from snake.shifter.snapshot import save
+
+_calls: Dict[Any, int] = {}
+
+
+@shift
+def square(x: int) -> int:
+    """Square a number, counting the calls made."""
+    _calls[x] = _calls.get(x, 0) + 1
+    if x < 0:
+        raise ValueError(x)
+    return x * x
+
+
+@shift
+def total(n: int) -> int:
+    """Sum squares, so the graph has edges to save."""
+    return sum(square(x) for x in range(n))
+
+
+def _record() -> GraphHandler:
+    """Record a graph of totals, with a failed call."""
+    with Context(GraphHandler()) as graph:
+        total(3)
+        total(4)
+        with pytest.raises(ValueError):
+            square(-1)
+    return graph
+
+
+def _bump(path: Path) -> int:  # pragma: no cover
+    """Load a graph in another process, and bump it."""
+    graph = load(path)
+    with Context(graph.bump({key(square, 1): 10})):
+        return total(4)
+
+
+def test_snapshot(tmp_path: Path) -> None:
+    """Check the loaded graph has the values and edges that were saved."""
+    graph = _record()
+    save(graph, tmp_path / "graph")
+    loaded = load(tmp_path / "graph")
+
+    values = dict(graph.items())
+    values[key(square, -1)] = loaded[key(square, -1)]
+    assert dict(loaded.items()) == values
+    assert loaded.children(key(total, 4)) == {key(square, x) for x in range(4)}
+    assert loaded.parents(key(square, 2)) == {key(total, 3), key(total, 4)}
+    assert loaded.dirty() == set()
+
+    failure = loaded[key(square, -1)]
+    assert type(failure) is Failure
+    with Context(loaded):
+        with pytest.raises(ValueError):
+            square(-1)
+
+    # values are read from the file, without calling again
+    _calls.clear()
+    with Context(loaded):
+        assert total(4) == 14
+    assert _calls == {}
+
+
+def test_snapshot_bump(tmp_path: Path) -> None:
+    """Check a loaded graph is bumped like the graph saved."""
+    save(_record(), tmp_path / "graph")
+    loaded = load(tmp_path / "graph")
+
+    _calls.clear()
+    bumped = loaded.bump({key(square, 2): 0})
+    assert bumped.dirty() == {key(total, 3), key(total, 4)}
+    with Context(bumped):
+        assert total(3) == 1
+        assert total(5) == 26
+    assert _calls == {4: 1}
+
+    # the graph loaded is unchanged by its forks
+    with Context(loaded.fork()):
+        assert total(3) == 5
+    assert bumped.parents(key(square, 4)) == {key(total, 5)}
+
+
+def test_snapshot_dirty(tmp_path: Path) -> None:
+    """Check invalidated calls are saved, and invalidate their children."""
+    bumped = _record().bump({key(square, 1): 10})
+    save(bumped, tmp_path / "graph")
+    loaded = load(tmp_path / "graph")
+
+    assert loaded.dirty() == {key(total, 3), key(total, 4)}
+    assert key(total, 3) not in dict(loaded.items())
+    assert loaded.children(key(total, 3)) == set()
+    assert loaded.parents(key(square, 1)) == set()
+
+    with Context(loaded.bump({key(square, 1): 1})):
+        assert total(4) == 14
+
+    with Context(loaded):
+        assert total(3) == 14
+    assert loaded.children(key(total, 3)) == {key(square, x) for x in range(3)}
+
+
+def test_snapshot_cutoff(tmp_path: Path) -> None:
+    """Check a graph loaded to cut off recalculation keeps unchanged calls."""
+    save(_record(), tmp_path / "graph")
+    loaded = load(tmp_path / "graph", equal)
+
+    _calls.clear()
+    with Context(loaded.bump({key(total, 3): 5})):
+        assert total(4) == 14
+    with Context(loaded.bump({key(square, 1): 1})):
+        assert total(4) == 14
+    assert _calls == {}
+
+
+def test_snapshot_order(tmp_path: Path) -> None:
+    """Check the children of calls are saved in the order they were made."""
+    with Context(GraphHandler()) as graph:
+        square(2)
+        total(3)
+    save(graph, tmp_path / "graph")
+    save(graph.bump({key(square, 1): 10}), tmp_path / "dirty")
+
+    order = [key(square, x) for x in range(3)]
+    for path in (tmp_path / "graph", tmp_path / "dirty"):
+        loaded = load(path)
+        table = loaded._table
+        node = table[key(total, 3)]
+        calls = loaded._dirty.get(node, loaded._ordered(node))
+        assert [table.key(child) for child in calls] == order
+
+
+def test_snapshot_processes(tmp_path: Path) -> None:
+    """Check another process can load a graph and bump it."""
+    save(_record(), tmp_path / "graph")
+    with ProcessPoolExecutor(1) as executor:
+        assert executor.submit(_bump, tmp_path / "graph").result() == 23
+
+
+def test_snapshot_local(tmp_path: Path) -> None:
+    """Check calls of functions that can't be imported are refused."""
+
+    @shift
+    def local(x: int) -> int:
+        return square(x)
+
+    with Context(GraphHandler()) as graph:
+        assert local(2) == 4
+    with pytest.raises(ValueError, match="<locals>.local"):
+        save(graph, tmp_path / "graph")
+    assert not (tmp_path / "graph").exists()
+
+
+def test_snapshot_invalid(tmp_path: Path) -> None:
+    """Check files that aren't snapshots are refused."""
+    (tmp_path / "other").write_bytes(b"not a snapshot of a graph")
+    with pytest.raises(ValueError, match="not a graph snapshot"):
+        load(tmp_path / "other")
+
+    save(GraphHandler(), tmp_path / "graph")
+    data = bytearray((tmp_path / "graph").read_bytes())
+    data[8] = 99
+    (tmp_path / "graph").write_bytes(data)
+    with pytest.raises(ValueError, match="version 99"):
+        load(tmp_path / "graph")
@@ -0,0 +1,45 @@
+"""Test the time to load a saved graph, against recording it again."""
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter import shift
+from snake.shifter.graph import GraphHandler
+from snake.shifter.snapshot import load
+from snake.shifter.snapshot import save
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+
+@shift
+def node(x: int, y: int) -> int:
+    """Make a lattice of calls, with many edges."""
+    if x == 0 or y == 0:
+        return 1
+    return node(x - 1, y) + node(x, y - 1)
+
+
+def _record() -> GraphHandler:
+    """Record the lattice of calls from scratch."""
+    with Context(GraphHandler()) as graph:
+        node(40, 40)
+    return graph
+
+
+def _load_and_bump(path: Path) -> Any:
+    """Load the lattice, and bump a call near the top of it."""
+    return load(path).bump({key(node, 40, 39): 3})
+
+
+def test_benchmark_record(benchmark):  # type: ignore
+    """Record the graph of calls again."""
+    benchmark(_record)
+
+
+def test_benchmark_load(benchmark, tmp_path):  # type: ignore
+    """Load the graph of calls from a snapshot, ready to bump."""
+    save(_record(), tmp_path / "graph")
+    benchmark(_load_and_bump, tmp_path / "graph")
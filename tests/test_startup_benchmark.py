@@ -0,0 +1,59 @@
+"""Test the time to import a module with many shifted functions."""
+import importlib
+import sys
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Iterator
+
+import pytest
+
+
+pytestmark = pytest.mark.benchmark(group=__name__)
+
+_COUNT = 1000
+
+_HEADER = "from snake.shifter import shift\n"
+
+_FUNCTION = """
+@shift
+def f_{index}(a: int, b: int = 1, *args: int, c: int = 2) -> int:
+    return a + b + c
+"""
+
+
+@pytest.fixture
+def module(tmp_path: Path) -> Iterator[Callable[[str], Any]]:
+    """Write a module of shifted functions, and import it afresh each time."""
+    source = _HEADER + "".join(_FUNCTION.format(index=i) for i in range(_COUNT))
+    (tmp_path / "startup_mod.py").write_text(source)
+    sys.path.insert(0, str(tmp_path))
+
+    def _import(footer: str) -> Any:
+        sys.modules.pop("startup_mod", None)
+        mod = importlib.import_module("startup_mod")
+        exec(footer, vars(mod))  # noqa: S102
+        return mod
+
+    # compile the module once, so only executing it is timed
+    _import("")
+    yield _import
+
+    sys.path.remove(str(tmp_path))
+    sys.modules.pop("startup_mod", None)
+
+
+def test_benchmark_import_lazy(benchmark, module):  # type: ignore
+    """Import the module, leaving the key types to be built when used."""
+    mod = benchmark(module, "")
+    assert mod.f_0(1) == 4
+
+
+def test_benchmark_import_eager(benchmark, module):  # type: ignore
+    """Import the module, and build every key type, as shift used to."""
+    footer = (
+        "for _index in range({}):\n"
+        "    globals()[f'f_{{_index}}'].__key__.resolve()\n".format(_COUNT)
+    )
+    mod = benchmark(module, footer)
+    assert "from_call" in vars(mod.f_999.__key__)
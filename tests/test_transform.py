@@ -0,0 +1,207 @@
+"""Test the rewriting of functions that can't be checked through the fixture."""
+import inspect
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+import pytest
+
+from snake.shifter import Context
+from snake.shifter import key
+from snake.shifter.failure import Failure
+from snake.shifter.transform import shift
+
+counter = 0
+
+
+def test_no_extra_frame() -> None:
+    """A rewritten function is called without a wrapper frame."""
+
+    @shift
+    def depth() -> int:
+        return len(inspect.stack(0))
+
+    with Context(dict()):
+        assert depth() == len(inspect.stack(0)) + 1
+    assert depth() == len(inspect.stack(0)) + 1
+
+
+def test_bare_return() -> None:
+    """A return without a value stores none."""
+    calls: List[int] = []
+
+    @shift
+    def f(x: int) -> None:
+        """Record the call."""
+        calls.append(x)
+        if x:
+            return
+        calls.append(x)
+
+    with Context(dict()) as d:
+        assert f(1) is None
+        assert f(1) is None
+        assert f(0) is None
+    assert d == {key(f, 1): None, key(f, 0): None}
+    assert calls == [1, 0, 0]
+    assert f.__doc__ == "Record the call."
+
+
+def test_nested_returns() -> None:
+    """The returns of nested functions and classes are left alone."""
+
+    @shift
+    def f(x: int) -> int:
+        def g() -> int:
+            return x + 1
+
+        class C:
+            def h(self) -> int:
+                return x + 2
+
+        return g() + C().h()
+
+    with Context(dict()) as d:
+        assert f(1) == 5
+    assert d == {key(f, 1): 5}
+
+
+def test_declarations() -> None:
+    """Global and nonlocal names are shared with the original function."""
+    total = 0
+
+    @shift
+    def f(x: int) -> int:
+        global counter
+        if x:
+            nonlocal total
+        total += x
+        counter += 1
+
+        def g() -> None:
+            global counter
+            counter += 1
+
+        g()
+        return total
+
+    with Context(dict()):
+        assert f(1) == 1
+        assert f(1) == 1
+    assert f(2) == 3
+    assert total == 3
+    assert counter == 4
+
+
+def test_exception_after_return() -> None:
+    """A return followed by an exception stores the failure, not the value."""
+
+    @shift
+    def f(x: int) -> int:
+        try:
+            return x
+        finally:
+            if x == 1:
+                raise ValueError(x)
+            if x == 2:
+                raise KeyboardInterrupt()
+
+    with Context(dict()) as d:
+        with pytest.raises(ValueError):
+            f(1)
+        with pytest.raises(KeyboardInterrupt):
+            f(2)
+        assert f(0) == 0
+    assert type(d[key(f, 1)]) is Failure
+    assert d[key(f, 0)] == 0
+    assert key(f, 2) not in d
+
+
+def test_defaults() -> None:
+    """Defaults are those of the original function, not evaluated again."""
+    default = object()
+
+    @shift
+    def f(x: object = default, *, y: object = default) -> bool:
+        return x is default and y is default
+
+    with Context(dict()):
+        assert f()
+
+
+class Private:
+    """A class with methods that can't be rewritten."""
+
+    __value = 1
+
+    @shift
+    def private(self) -> int:
+        """Refer to a private name, mangled by the class body."""
+        return self.__value
+
+    @shift
+    def zero_super(self) -> str:
+        """Refer to the class cell."""
+        return super().__repr__()
+
+    @shift
+    def public(self) -> int:
+        """Refer to no private names."""
+        return 2
+
+
+def _rewritten(func: Any) -> bool:
+    """Check whether a function was rewritten, rather than wrapped."""
+    return func.__code__.co_filename == __file__  # type: ignore
+
+
+def test_fallback() -> None:
+    """Functions that can't be rewritten are wrapped instead."""
+
+    @shift
+    def generator() -> Iterator[int]:
+        yield 1
+
+    namespace: Dict[str, Any] = {"__name__": __name__}
+    exec("def built(x):\n    return x", namespace)  # noqa: S102
+    built = shift(namespace["built"])
+
+    def renamed(x: int) -> int:
+        return x
+
+    renamed.__name__ = "other"
+    renamed = shift(renamed)
+
+    obj = Private()
+    with Context(dict()) as d:
+        assert obj.private() == 1
+        assert obj.zero_super().startswith("<")
+        assert obj.public() == 2
+        assert list(generator()) == [1]
+        assert built(1) == 1
+        assert renamed(1) == 1
+    assert len(d) == 6
+
+    for func in [Private.private, Private.zero_super, generator, built, renamed]:
+        assert not _rewritten(func)
+    assert _rewritten(Private.public)
+
+
+def test_line_numbers() -> None:
+    """Tracebacks point at the lines of the original function."""
+
+    @shift
+    def f(x: int) -> int:
+        if x:
+            return x
+        raise ValueError(x)
+
+    line = inspect.getsourcelines(f)[1] + 4
+    with Context(dict()):
+        with pytest.raises(ValueError) as tracked:
+            f(0)
+    with pytest.raises(ValueError) as untracked:
+        f(0)
+    assert tracked.traceback[-1].lineno + 1 == line
+    assert untracked.traceback[-1].lineno + 1 == line
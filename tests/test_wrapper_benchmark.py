@@ -27,3 +27,134 @@ def test_benchmark_wrapper_fib(benchmark):  # type: ignore
         return fib(x - 1) + fib(x - 2)
 
     benchmark(fib, 9)
+
+
+def test_benchmark_wrapper_fib_null_context(benchmark):  # type: ignore
+    """Apply the wrapper with a pushed null handler, so calls are intercepted."""
+    from snake.shifter import Context
+    from snake.shifter.context import NullHandler
+    from snake.shifter.wrapper import shift
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(NullHandler()):
+        benchmark(fib, 9)
+
+
+def test_benchmark_codegen_fib(benchmark):  # type: ignore
+    """Apply the generated wrapper with no context."""
+    from snake.shifter.codegen import shift
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    benchmark(fib, 9)
+
+
+def test_benchmark_codegen_fib_null_context(benchmark):  # type: ignore
+    """Apply the generated wrapper with a pushed null handler."""
+    from snake.shifter import Context
+    from snake.shifter.codegen import shift
+    from snake.shifter.context import NullHandler
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(NullHandler()):
+        benchmark(fib, 9)
+
+
+def test_benchmark_transform_fib(benchmark):  # type: ignore
+    """Apply the rewritten function with no context."""
+    from snake.shifter.transform import shift
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    benchmark(fib, 9)
+
+
+def test_benchmark_transform_fib_null_context(benchmark):  # type: ignore
+    """Apply the rewritten function with a pushed null handler."""
+    from snake.shifter import Context
+    from snake.shifter.context import NullHandler
+    from snake.shifter.transform import shift
+
+    @shift
+    def fib(x: int) -> int:
+        if x <= 1:
+            return 1
+        return fib(x - 1) + fib(x - 2)
+
+    with Context(NullHandler()):
+        benchmark(fib, 9)
+
+
+def _node(a: int, b: int, c: int = 3, *args: int, d: int = 4) -> int:
+    """Small node function with a mix of parameter kinds."""
+    return a + b + c + d
+
+
+def test_benchmark_key_bind(benchmark):  # type: ignore
+    """Build keys with Signature.bind, the reference implementation."""
+    from snake.shifter.key_type import _from_call
+    from snake.shifter.key_type import make_key_type
+
+    key_type = make_key_type(_node)
+
+    benchmark(_from_call, key_type, 1, 2, d=5)
+
+
+def test_benchmark_key_compiled(benchmark):  # type: ignore
+    """Build keys with the from_call generated for the signature."""
+    from snake.shifter.key_type import make_key_type
+
+    key_type = make_key_type(_node)
+
+    benchmark(key_type.from_call, 1, 2, d=5)
+
+
+def _node_calls(node):  # type: ignore
+    """Call a node many times, intercepted by a dict handler."""
+    from snake.shifter import Context
+
+    def run() -> None:
+        with Context(dict()):
+            for a in range(100):
+                node(a, 2, d=5)
+
+    return run
+
+
+def test_benchmark_node_wrapper(benchmark):  # type: ignore
+    """Call a node with a mix of parameter kinds through the wrapper."""
+    from snake.shifter.wrapper import shift
+
+    benchmark(_node_calls(shift(_node)))
+
+
+def test_benchmark_node_codegen(benchmark):  # type: ignore
+    """Call a node with a mix of parameter kinds through the generated wrapper."""
+    from snake.shifter.codegen import shift
+
+    benchmark(_node_calls(shift(_node)))
+
+
+def test_benchmark_node_transform(benchmark):  # type: ignore
+    """Call a node with a mix of parameter kinds through the rewritten function."""
+    from snake.shifter.transform import shift
+
+    benchmark(_node_calls(shift(_node)))